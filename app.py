@@ -1,8 +1,10 @@
 # app.py - Version v1.2 avec PostgreSQL
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session, Response, stream_with_context
 import os
 import csv
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from werkzeug.security import safe_join
+from urllib.parse import quote as url_quote
 import PyPDF2
 #import pikepdf
 import smtplib
@@ -14,6 +16,7 @@ from email_config import GMAIL_CONFIG
 from datetime import datetime, timedelta
 import threading
 import time
+import socket
 import json
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -22,16 +25,44 @@ import secrets
 import logging
 from logging.handlers import RotatingFileHandler
 import glob
+import shutil
+import io
+from collections import namedtuple
 from flask_migrate import Migrate
 
 # Import des modèles et configuration
 #from config import Config
 from config import get_config
-from models import db, Employee, Traitement, TraitementEmploye, DownloadLink
-
-# Variable pour empêcher les traitements multiples
-processing_lock = threading.Lock()
-is_processing = False
+from models import db, Employee, Traitement, TraitementEmploye, DownloadLink, EmailOutbox, StatistiqueJournaliere, FichierGenere, MetriquesTraitement
+from pdf_extraction import extract_pages_text
+from pdf_streaming import count_pages, iter_employee_blocks
+from page_parser import parse_page
+from employee_directory import EmployeeDirectory
+from employee_search import search_condition, keyset_page, employee_counts
+from employee_import import import_employees_csv, insert_new_employees, NewEmployeesResult
+from smtp_pool import SMTPConnectionPool
+from job_slots import JobSlots
+from zip_stream import stream_zip
+from csv_export import EXPORTS, stream_csv, export_rows, parse_date_range
+from stats_cache import TTLCache
+from processing_metrics import ProcessingMetrics
+import daily_stats
+from daily_stats import record_daily_stats, daily_totals, record_treatment_transition, treatment_state
+
+# Pool de workers de traitement (démarré à la première requête, ou par payflow_worker.py)
+processing_workers = []
+processing_workers_lock = threading.Lock()
+processing_wakeup = threading.Event()
+processing_stop = threading.Event()  # arrêt propre : les workers finissent leur traitement en cours
+last_stale_jobs_check = 0.0
+
+# Expéditeurs d'emails (vident la table email_outbox), démarrés avec les workers
+outbox_senders = []
+outbox_senders_lock = threading.Lock()
+outbox_wakeup = threading.Event()
+
+# Annuaire des employés en mémoire (matricule / nom normalisé), partagé par le processus
+employee_directory = EmployeeDirectory()
 
 
 
@@ -104,7 +135,13 @@ def create_app(config_name='default'):
     # Configuration
     #app.config.from_object(config[config_name])
     app.config.from_object(get_config(config_name))
-    
+
+    # connect_timeout est propre à psycopg2 : retiré pour les autres bases (SQLite en développement, benchmarks)
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        engine_options.pop('connect_args', None)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
     # Initialisation des extensions
     db.init_app(app)
     migrate = Migrate(app, db)
@@ -129,10 +166,49 @@ ALLOWED_EXTENSIONS = {'pdf'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 
+# Statistiques des tableaux de bord : cache court par processus, vidé par les écritures
+dashboard_cache = TTLCache(ttl_seconds=app.config.get('DASHBOARD_CACHE_TTL_SEC', 30))
+
+# Traitements simultanés, tous processus et machines confondus (verrous consultatifs PostgreSQL)
+job_slots = JobSlots(app.config.get('MAX_CONCURRENT_JOBS', 2), logger=app.logger)
+
+TIMESTAMP_FOLDER_FORMAT = '%Y%m%d%H%M%S'
+TIMESTAMP_FOLDER_SUFFIX_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+
 def generate_timestamp_folder():
-    """Génère un nom de dossier avec timestamp au format aaaammjjhhmmss"""
+    """Génère un nom de dossier aaaammjjhhmmss_xxxxx (suffixe aléatoire : deux envois
+    dans la même seconde, sur deux processus ou deux machines, ne se télescopent pas)"""
     now = datetime.now()
-    return now.strftime('%Y%m%d%H%M%S')
+    suffix = ''.join(secrets.choice(TIMESTAMP_FOLDER_SUFFIX_CHARS) for _ in range(5))
+    return f"{now.strftime(TIMESTAMP_FOLDER_FORMAT)}_{suffix}"
+
+
+def parse_timestamp_folder(folder_name):
+    """Date d'un dossier de traitement (aaaammjjhhmmss ou aaaammjjhhmmss_xxxxx), None sinon"""
+    stamp, separator, suffix = folder_name.partition('_')
+    if len(stamp) != 14 or not stamp.isdigit() or (separator and not suffix.isalnum()):
+        return None
+    try:
+        return datetime.strptime(stamp, TIMESTAMP_FOLDER_FORMAT)
+    except ValueError:
+        return None
+
+
+def reserve_timestamp_folder(attempts=5):
+    """Crée le dossier d'upload d'un nouveau traitement sous un nom inutilisé et retourne ce nom.
+    
+    os.makedirs sans exist_ok est atomique : sur un stockage partagé, un seul
+    processus peut obtenir un nom donné.
+    """
+    for _ in range(attempts):
+        timestamp_folder = generate_timestamp_folder()
+        try:
+            os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], timestamp_folder))
+            return timestamp_folder
+        except FileExistsError:
+            continue
+    raise RuntimeError("Impossible de réserver un dossier de traitement")
 
 '''
     def debug_page_content(page_text, page_num):
@@ -147,37 +223,58 @@ def generate_timestamp_folder():
 '''
 
 
-def allowed_file(filename):
-    """Vérifie si le fichier est un PDF"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-# Chargement des employés de
-def load_employees():
-    """Charge les employés depuis PostgreSQL avec matricule comme clé"""
-    employees = {}
-    try:
-        employees_list = Employee.query.filter_by(statut='actif').all()
-        for emp in employees_list:
-            # Clé par nom ET matricule pour compatibilité
-            employees[emp.nom_employe] = {
-                'email': emp.email,
-                'id': emp.id,
-                'matricule': emp.matricule  
-            }
-        #app.logger.info(f"{len(employees)} employés chargés (identifiés par matricule)")
-        return employees
-    except Exception as e:
-        app.logger.error(f"Erreur lors du chargement des employés: {str(e)}")
-        return {}
 
+def save_upload_with_digest(file_storage, filepath):
+    """Écrit le fichier uploadé par blocs en calculant son SHA-256 au passage.
+    
+    Retourne l'empreinte hexadécimale : pas de relecture du fichier pour la calculer.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as output_file:
+        while True:
+            chunk = file_storage.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            output_file.write(chunk)
+    return digest.hexdigest()
+
+
+def find_duplicate_treatment(empreinte_sha256):
+    """Dernier traitement du même PDF encore exploitable, ou None.
+    
+    En file ou en cours : à suivre tel quel, sauf un traitement en cours dont le
+    worker ne donne plus signe de vie : remis en file pour reprise (rien d'autre
+    ne le terminerait avant requeue_interrupted_jobs), ignoré si c'est impossible.
+    Terminé ou partiel : seulement si toutes les fiches de son manifeste sont
+    encore sur disque (pas nettoyées).
+    """
+    candidates = Traitement.query.filter(
+        Traitement.empreinte_sha256 == empreinte_sha256,
+        Traitement.statut.in_(('en_attente', 'en_cours', 'termine', 'partiel'))
+    ).order_by(Traitement.date_creation.desc(), Traitement.id.desc()).limit(5).all()
+    
+    for traitement in candidates:
+        if is_job_stale(traitement):
+            if not requeue_treatment_for_resume(traitement):
+                continue
+            if app.config.get('PROCESSING_IN_APP_WORKERS', True):
+                start_processing_workers()
+                processing_wakeup.set()
+            return traitement
+        if traitement.statut in ('en_attente', 'en_cours'):
+            return traitement
+        paths = [path for (path,) in db.session.query(FichierGenere.chemin_fichier).filter_by(traitement_id=traitement.id)]
+        if paths and all(os.path.exists(path) for path in paths):
+            return traitement
+    return None
 
-def find_employee_by_matricule(matricule):
-    """Trouve un employé par son matricule (plus fiable que le nom)"""
-    try:
-        return Employee.query.filter_by(matricule=matricule, statut='actif').first()
-    except Exception as e:
-        app.logger.error(f"Erreur recherche matricule {matricule}: {str(e)}")
-        return None
+
+def allowed_file(filename):
+    """Vérifie si le fichier est un PDF"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @app.route('/')
 def index():
@@ -186,374 +283,1003 @@ def index():
 
 @app.route('/upload', methods=['POST'])  
 def upload_file():
-    """Traite le fichier PDF uploadé avec débogage"""
-
-    #if 'file' in request.files:
-     #   app.logger.info(f"Nom du fichier chargé: {request.files['file'].filename}")
-    #app.logger.info("===============")
-
-    """Traite le fichier PDF uploadé avec protection contre les soumissions multiples"""
-    global is_processing
+    """Enregistre le PDF uploadé et le place dans la file de traitement"""
+    
+    wants_json = request.accept_mimetypes.best == 'application/json'
     
-    # Vérification côté serveur pour empêcher les traitements multiples
-    with processing_lock:
-        if is_processing:
-            flash('Un traitement est déjà en cours. Veuillez patienter.', 'error')
-            return redirect(request.url)
-        is_processing = True
+    if 'file' not in request.files or request.files['file'].filename == '':
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Aucun fichier sélectionné'}), 400
+        flash('Aucun fichier sélectionné', 'error')
+        return redirect(url_for('index'))
+    
+    file = request.files['file']
+    if not allowed_file(file.filename):
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Format de fichier non autorisé'}), 400
+        flash('❌ Format de fichier non autorisé. Utilisez un PDF.', 'error')
+        return redirect(url_for('index'))
+    
+    # Même PDF déjà traité : réutiliser ses fiches (défaut) ou tout retraiter
+    reuse_duplicate = request.form.get('si_doublon', 'reutiliser') != 'retraiter'
     
     try:
-        if 'file' not in request.files:
-            flash('Aucun fichier sélectionné', 'error')
-            return redirect(url_for('index'))
+        # Dossier du traitement, réservé sous un nom unique (aaaammjjhhmmss_xxxxx)
+        timestamp_folder = reserve_timestamp_folder()
         
-        file = request.files['file']
-        if file.filename == '':
-            flash('Aucun fichier sélectionné', 'error')
-            return redirect(url_for('index'))
+        upload_timestamp_dir = os.path.join(app.config['UPLOAD_FOLDER'], timestamp_folder)
         
-        if file and allowed_file(file.filename):
-            try:
-                # Génération du timestamp pour l'organisation des dossiers
-                timestamp_folder = generate_timestamp_folder()
-                
-                # Création des dossiers avec timestamp
-                upload_timestamp_dir = os.path.join(app.config['UPLOAD_FOLDER'], timestamp_folder)
-                output_timestamp_dir = os.path.join(app.config['OUTPUT_FOLDER'], timestamp_folder)
-                
-                os.makedirs(upload_timestamp_dir, exist_ok=True)
-                os.makedirs(output_timestamp_dir, exist_ok=True)
-                
-                # Sauvegarde du fichier dans le dossier timestampé
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(upload_timestamp_dir, filename)
-                file.save(filepath)
-                
-                # Traitement du PDF avec les nouveaux chemins
-                result = process_pdf(filepath, output_timestamp_dir)
-                
-                if result['success']:
-                    flash(f'✅ Traitement terminé avec succès ! {result["count"]} fiches traitées. Dossier : {timestamp_folder}', 'success')
-                else:
-                    flash(f'❌ Erreur lors du traitement: {result["error"]}', 'error')
-                
-            except Exception as e:
-                flash(f'❌ Erreur inattendue: {str(e)}', 'error')
-                
-        else:
-            flash('❌ Format de fichier non autorisé. Utilisez un PDF.', 'error')
-            
-    finally:
-        # Libérer le verrou même en cas d'erreur
-        with processing_lock:
-            is_processing = False
-            
-    return redirect(url_for('index'))
+        # Sauvegarde du fichier dans le dossier timestampé, empreinte calculée au fil de l'écriture
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(upload_timestamp_dir, filename)
+        empreinte_sha256 = save_upload_with_digest(file, filepath)
+        
+        duplicate = find_duplicate_treatment(empreinte_sha256) if reuse_duplicate else None
+        if duplicate:
+            shutil.rmtree(upload_timestamp_dir, ignore_errors=True)
+            return duplicate_upload_response(duplicate, wants_json)
+        
+        os.makedirs(os.path.join(app.config['OUTPUT_FOLDER'], timestamp_folder), exist_ok=True)
+        
+        # Mise en file : le traitement est exécuté par les workers en arrière-plan
+        traitement = enqueue_processing_job(filepath, timestamp_folder, empreinte_sha256)
+        
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Erreur mise en file du traitement: {str(e)}")
+        if wants_json:
+            return jsonify({'success': False, 'message': f'Erreur inattendue: {str(e)}'}), 500
+        flash(f'❌ Erreur inattendue: {str(e)}', 'error')
+        return redirect(url_for('index'))
+    
+    progress_url = url_for('processing_progress', timestamp=traitement.timestamp_folder)
+    if wants_json:
+        return jsonify({
+            'success': True,
+            'timestamp': traitement.timestamp_folder,
+            'progress_url': progress_url
+        }), 202
+    
+    flash(f'📥 Fichier reçu, traitement en file d\'attente. Dossier : {traitement.timestamp_folder}', 'success')
+    return redirect(url_for('index', traitement=traitement.timestamp_folder))
 
-def extract_employee_name_from_page(page_text):
-    """Extrait le nom de l'employé depuis le texte d'une page"""
-    lines = page_text.split('\n')
+
+def duplicate_upload_response(traitement, wants_json):
+    """Réponse à l'envoi d'un PDF identique à celui d'un traitement existant.
     
-    # Recherche du pattern "Catégorie" suivi de "M" ou "Mme" puis du nom
-    for i, line in enumerate(lines):
-        line = line.strip()
-        
-        # Cherche la ligne contenant "Catégorie"
-        if "Catégorie" in line:
-            # Le nom peut être sur la même ligne ou sur les lignes suivantes
-            
-            # Cas 1 : Le nom est sur la même ligne après "M" ou "Mme"
-            if " M " in line:
-                # Extrait tout ce qui suit "M "
-                parts = line.split(" M ")
-                if len(parts) > 1:
-                    name = parts[1].strip()
-                    if name and len(name) > 5:  # Vérifie qu'il y a bien un nom
-                        return name
-            
-            elif " Mme " in line:
-                # Extrait tout ce qui suit "Mme "
-                parts = line.split(" Mme ")
-                if len(parts) > 1:
-                    name = parts[1].strip()
-                    if name and len(name) > 5:  # Vérifie qu'il y a bien un nom
-                        return name
-            
-            # Cas 2 : Le nom est sur la ligne suivante
-            if i + 1 < len(lines):
-                next_line = lines[i + 1].strip()
-                if next_line and len(next_line) > 5 and next_line.isupper():
-                    return next_line
+    Le traitement en file ou en cours est simplement suivi ; un traitement fini
+    garde ses fiches, seuls les liens et emails manquants sont refaits.
+    """
+    if traitement.statut in ('en_attente', 'en_cours'):
+        app.logger.info(f"PDF identique au traitement {traitement.timestamp_folder}, déjà {traitement.statut}")
+        if wants_json:
+            return jsonify({
+                'success': True,
+                'doublon': True,
+                'timestamp': traitement.timestamp_folder,
+                'progress_url': url_for('processing_progress', timestamp=traitement.timestamp_folder)
+            }), 200
+        flash(f'♻️ Fichier identique déjà en cours de traitement. Dossier : {traitement.timestamp_folder}', 'info')
+        return redirect(url_for('index', traitement=traitement.timestamp_folder))
     
-    return None
+    result = complete_treatment_deliveries(traitement)
+    app.logger.info(
+        f"PDF identique au traitement {traitement.timestamp_folder} : fiches réutilisées, "
+        f"{result['liens_crees']} lien(s) créé(s), {result['emails_relances']} email(s) relancé(s)"
+    )
+    if wants_json:
+        return jsonify({
+            'success': True,
+            'doublon': True,
+            'timestamp': traitement.timestamp_folder,
+            'liens_crees': result['liens_crees'],
+            'emails_relances': result['emails_relances'],
+            'details_url': url_for('treatment_details', timestamp=traitement.timestamp_folder)
+        }), 200
+    flash(
+        f'♻️ Fichier identique au traitement du {traitement.date_creation.strftime("%d/%m/%Y %H:%M")} : '
+        f'fiches réutilisées, {result["liens_crees"]} lien(s) créé(s), '
+        f'{result["emails_relances"]} email(s) remis en file',
+        'success'
+    )
+    return redirect(url_for('treatment_details', timestamp=traitement.timestamp_folder))
 
-def extract_employee_matricule_from_page(page_text):
-    """Extrait le matricule de l'employé depuis le texte d'une page"""
-    lines = page_text.split('\n')
+
+@app.route('/api/traitements/<timestamp>/progression')
+def processing_progress(timestamp):
+    """Progression d'un traitement (JSON pour le polling côté navigateur)"""
+    traitement = Traitement.query.filter_by(timestamp_folder=timestamp).first()
+    if not traitement:
+        return jsonify({'success': False, 'message': 'Traitement non trouvé'}), 404
     
-    # Recherche du pattern "Matricule" suivi du numéro
-    for i, line in enumerate(lines):
-        line = line.strip()
+    return jsonify({
+        'success': True,
+        'timestamp': traitement.timestamp_folder,
+        'fichier': traitement.fichier_original,
+        'statut': traitement.statut,
+        'etape': traitement.etape,
+        'pages_total': traitement.nombre_pages or 0,
+        'pages_analysees': traitement.pages_analysees or 0,
+        'employes_detectes': traitement.nombre_employes_detectes or 0,
+        'pdfs_generes': traitement.pdfs_generes or 0,
+        'nouveaux_employes': traitement.nombre_nouveaux_employes or 0,
+        'termine': traitement.statut in ('termine', 'partiel', 'echec'),
+        'erreurs': traitement.erreurs,
+        'date_debut': traitement.date_debut.isoformat() if traitement.date_debut else None,
+        'date_fin': traitement.date_fin.isoformat() if traitement.date_fin else None
+    })
+
+
+# ---- File de traitement en arrière-plan ----
+# L'état des jobs est porté par Traitement (statut/etape/compteurs) : rien n'est
+# perdu si le processus redémarre, les jobs en attente sont repris par les workers.
+
+def enqueue_processing_job(filepath, timestamp_folder, empreinte_sha256=None):
+    """Crée le Traitement 'en_attente' et réveille les workers"""
+    traitement = Traitement(
+        timestamp_folder=timestamp_folder,
+        fichier_original=os.path.basename(filepath),
+        taille_fichier=os.path.getsize(filepath),
+        empreinte_sha256=empreinte_sha256,
+        chemin_fichier=filepath,
+        statut='en_attente',
+        etape='en_file',
+        pages_analysees=0,
+        pdfs_generes=0,
+        date_maj=datetime.utcnow()
+    )
+    db.session.add(traitement)
+    record_daily_stats({daily_stats.TRAITEMENTS_CREES: 1})
+    db.session.commit()
+    invalidate_dashboard_stats()
+    
+    # Sans workers intégrés, les processus payflow_worker.py le réservent au prochain passage
+    if app.config.get('PROCESSING_IN_APP_WORKERS', True):
+        start_processing_workers()
+        processing_wakeup.set()
+    app.logger.info(f"Traitement {timestamp_folder} mis en file d'attente")
+    return traitement
+
+
+def worker_identity():
+    """Identifiant du worker courant (hôte:pid:thread), enregistré sur le traitement réservé"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def claim_next_job(worker_id=None, traitement_id=None):
+    """Réserve atomiquement le plus ancien traitement en attente (ou celui demandé), retourne son id.
+    
+    SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL) : les workers de toutes les
+    machines se répartissent les jobs sans s'attendre ; l'UPDATE conditionnel
+    garantit qu'un job n'est réservé qu'une fois, même sans SKIP LOCKED (SQLite).
+    """
+    worker_id = worker_id or worker_identity()
+    for _ in range(5):
+        candidates = db.session.query(Traitement.id).filter(Traitement.statut == 'en_attente')
+        if traitement_id is not None:
+            candidates = candidates.filter(Traitement.id == traitement_id)
+        candidate = candidates.order_by(Traitement.date_creation.asc(), Traitement.id.asc()).limit(1).with_for_update(skip_locked=True).first()
+        if candidate is None:
+            db.session.rollback()
+            return None
         
-        # Cherche la ligne contenant "Matricule"
-        if "Matricule" in line:
-            # Le matricule peut être sur la même ligne ou sur les lignes suivantes
-            
-            # Cas 1 : Le matricule est sur la même ligne après "Matricule"
-            # Exemple : "Matricule 2204      Ancienneté 2an(s) et 8mois"
-            import re
-            matricule_match = re.search(r'Matricule\s+(\d+)', line)
-            if matricule_match:
-                return matricule_match.group(1)
-            
-            # Cas 2 : Le matricule pourrait être sur la ligne suivante
-            if i + 1 < len(lines):
-                next_line = lines[i + 1].strip()
-                # Recherche d'un nombre de 4 chiffres (format matricule courant)
-                matricule_match = re.search(r'^(\d{4})(?:\s|$)', next_line)
-                if matricule_match:
-                    return matricule_match.group(1)
+        now = datetime.utcnow()
+        claimed = Traitement.query.filter(
+            Traitement.id == candidate.id,
+            Traitement.statut == 'en_attente'
+        ).update({
+            'statut': 'en_cours',
+            'date_debut': now,
+            'date_maj': now,
+            'date_heartbeat': now,
+            'traite_par': worker_id
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return candidate.id
     return None
 
-def create_individual_pdf_with_matricule(pdf_reader, employee_name, page_numbers, matricule, employees_data, output_dir):
-    """Crée un PDF individuel pour un employé avec protection par matricule extrait du PDF"""
+
+def _job_heartbeat_loop(traitement_id, worker_id, stop_event):
+    """Signe de vie d'un traitement en cours, toutes les PROCESSING_HEARTBEAT_INTERVAL_SEC secondes"""
+    interval = app.config.get('PROCESSING_HEARTBEAT_INTERVAL_SEC', 30)
+    while not stop_event.wait(interval):
+        try:
+            with app.app_context():
+                alive = Traitement.query.filter(
+                    Traitement.id == traitement_id,
+                    Traitement.statut == 'en_cours',
+                    Traitement.traite_par == worker_id
+                ).update({'date_heartbeat': datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+            if not alive:
+                app.logger.warning(f"Traitement {traitement_id} n'est plus réservé par {worker_id}")
+                return
+        except Exception as e:
+            app.logger.error(f"Erreur signe de vie du traitement {traitement_id}: {str(e)}")
+
+
+def run_processing_job(traitement_id, worker_id=None):
+    """Exécute un traitement réservé par un worker, avec signe de vie périodique"""
+    traitement = db.session.get(Traitement, traitement_id)
+    if not traitement:
+        return
+    
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], traitement.timestamp_folder)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(
+        target=_job_heartbeat_loop,
+        args=(traitement_id, worker_id or traitement.traite_par, stop_heartbeat),
+        name=f'{threading.current_thread().name}-heartbeat',
+        daemon=True
+    )
+    heartbeat.start()
     try:
-        # Création du PDF de sortie
-        pdf_writer = PyPDF2.PdfWriter()
-        
-        # Ajout des pages de l'employé
-        for page_num in page_numbers:
-            pdf_writer.add_page(pdf_reader.pages[page_num])
-        
-        # Nom du fichier de sortie dans le dossier timestampé
-        safe_filename = "".join(c for c in employee_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        output_filename = f"{safe_filename}.pdf"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        # Sauvegarde du PDF
-        with open(output_path, 'wb') as output_file:
-            pdf_writer.write(output_file)
-        
-        # Protection et envoi si l'employé est dans la base ET matricule trouvé
-        if employee_name in employees_data and matricule:
-            email = employees_data[employee_name]['email']
-            
-            # Protection du PDF avec le matricule extrait du PDF
-            #protect_pdf_with_password(output_path, matricule)
-           # app.logger.info(f"PDF créé et protégé pour {employee_name} avec matricule {matricule} (extrait du PDF)")
+        result = process_pdf(traitement.chemin_fichier, output_dir, traitement=traitement)
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join(timeout=5)
+    
+    if result['success']:
+        app.logger.info(f"Traitement {traitement.timestamp_folder} terminé: {result['message']}")
+    else:
+        app.logger.error(f"Traitement {traitement.timestamp_folder} en échec: {result['error']}")
+
+
+def requeue_interrupted_jobs():
+    """Remet en file les traitements en_cours dont le worker ne donne plus signe de vie
+    (processus ou machine arrêté en plein traitement)"""
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=app.config['PROCESSING_STALE_AFTER_SEC'])
+        requeued = Traitement.query.filter(
+            Traitement.statut == 'en_cours',
+            Traitement.chemin_fichier.isnot(None),
+            db.or_(
+                db.func.coalesce(Traitement.date_heartbeat, Traitement.date_maj).is_(None),
+                db.func.coalesce(Traitement.date_heartbeat, Traitement.date_maj) < stale_before
+            )
+        ).update({'statut': 'en_attente', 'etape': 'en_file', 'traite_par': None}, synchronize_session=False)
+        db.session.commit()
+        if requeued:
+            app.logger.warning(f"{requeued} traitement(s) interrompu(s) remis en file")
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Erreur reprise des traitements interrompus: {str(e)}")
+
+
+def is_job_stale(traitement):
+    """En cours sans signe de vie depuis PROCESSING_STALE_AFTER_SEC (worker arrêté en plein traitement)"""
+    if traitement.statut != 'en_cours':
+        return False
+    last_seen = traitement.date_heartbeat or traitement.date_maj
+    stale_before = datetime.utcnow() - timedelta(seconds=app.config['PROCESSING_STALE_AFTER_SEC'])
+    return last_seen is None or last_seen < stale_before
+
+
+def is_treatment_resumable(traitement):
+    """En échec, ou en cours sans signe de vie (is_job_stale), avec son PDF source encore présent"""
+    if not traitement.chemin_fichier or not os.path.exists(traitement.chemin_fichier):
+        return False
+    return traitement.statut == 'echec' or is_job_stale(traitement)
+
+
+def requeue_treatment_for_resume(traitement):
+    """Remet en file un traitement interrompu ; il reprendra à son dernier point de reprise.
+    
+    UPDATE conditionnel : sans effet (False) si le traitement a changé d'état entre-temps.
+    """
+    if not is_treatment_resumable(traitement):
+        return False
+    requeued = Traitement.query.filter(
+        Traitement.id == traitement.id,
+        Traitement.statut == traitement.statut,
+        Traitement.date_maj == traitement.date_maj
+    ).update({
+        'statut': 'en_attente',
+        'etape': 'en_file',
+        'traite_par': None,
+        'erreurs': None,
+        'date_fin': None,
+        'date_maj': datetime.utcnow()
+    }, synchronize_session=False)
+    if requeued:
+        # Plus en échec : retiré des compteurs du jour de l'échec (traitement encore dans son état précédent)
+        record_treatment_transition(previous_state=treatment_state(traitement))
+    db.session.commit()
+    if requeued:
+        app.logger.info(f"Traitement {traitement.timestamp_folder} remis en file pour reprise")
+    return bool(requeued)
+
+
+def _requeue_interrupted_jobs_if_due():
+    """Reprise des jobs abandonnés au plus une fois par intervalle de signe de vie (workers inactifs)"""
+    global last_stale_jobs_check
+    now = time.monotonic()
+    if now - last_stale_jobs_check < app.config.get('PROCESSING_HEARTBEAT_INTERVAL_SEC', 30):
+        return
+    last_stale_jobs_check = now
+    requeue_interrupted_jobs()
+
+
+def _processing_worker_loop():
+    """Boucle d'un worker : obtient un créneau (MAX_CONCURRENT_JOBS), puis réserve
+    et exécute le plus ancien traitement en attente"""
+    worker_id = worker_identity()
+    while not processing_stop.is_set():
+        traitement_id = None
+        try:
+            with app.app_context():
+                slot = job_slots.try_acquire(db.engine)
+                if slot:
+                    with slot:
+                        traitement_id = claim_next_job(worker_id)
+                        if traitement_id:
+                            run_processing_job(traitement_id, worker_id)
+                if not traitement_id:
+                    _requeue_interrupted_jobs_if_due()
+        except Exception as e:
+            app.logger.error(f"Erreur worker de traitement: {str(e)}")
+        
+        if not traitement_id:
+            processing_wakeup.wait(app.config['PROCESSING_POLL_INTERVAL_SEC'])
+            processing_wakeup.clear()
+
+
+def start_processing_workers(threads=None):
+    """Démarre (une seule fois par processus) le pool de workers de traitement"""
+    with processing_workers_lock:
+        if processing_workers:
+            return
+        with app.app_context():
+            requeue_interrupted_jobs()
+        for i in range(max(1, threads or app.config['PROCESSING_WORKERS'])):
+            worker = threading.Thread(
+                target=_processing_worker_loop,
+                name=f'payflow-traitement-{i + 1}',
+                daemon=True
+            )
+            worker.start()
+            processing_workers.append(worker)
+        app.logger.info(f"{len(processing_workers)} worker(s) de traitement démarré(s)")
+
+
+def stop_processing_workers(timeout=None):
+    """Arrêt propre : plus de nouveau job, attente de la fin des traitements en cours"""
+    processing_stop.set()
+    processing_wakeup.set()
+    for worker in list(processing_workers):
+        worker.join(timeout)
+
+
+@app.before_request
+def ensure_processing_workers():
+    """Les jobs et emails en attente après un redémarrage sont repris dès la première requête
+    (jobs : sauf si confiés aux processus payflow_worker.py, PROCESSING_IN_APP_WORKERS=false)"""
+    if not processing_workers and app.config.get('PROCESSING_IN_APP_WORKERS', True):
+        start_processing_workers()
+    if not outbox_senders:
+        start_outbox_senders()
+
+
+# ---- File d'envoi des emails (email_outbox) ----
+# Le traitement ne fait qu'ajouter des lignes ; les expéditeurs les réservent par
+# lots, envoient avec leur propre session SMTP et replanifient les échecs avec un
+# délai exponentiel jusqu'à max_tentatives (puis statut echec_definitif).
+
+# Refus définitifs : inutile de réessayer
+PERMANENT_EMAIL_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+def wake_outbox_senders():
+    start_outbox_senders()
+    outbox_wakeup.set()
+
+
+def email_retry_delay(attempts):
+    """Délai avant la tentative suivante : base, 2x base, 4x base... plafonné"""
+    delay = app.config['EMAIL_RETRY_BASE_DELAY_SEC'] * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(delay, app.config['EMAIL_RETRY_MAX_DELAY_SEC']))
+
+
+def claim_outbox_messages(limit):
+    """Réserve jusqu'à `limit` emails dus, retourne leurs ids.
+
+    FOR UPDATE SKIP LOCKED (PostgreSQL) évite que deux expéditeurs se bloquent
+    sur les mêmes lignes ; l'UPDATE conditionnel marqué d'un jeton garantit
+    qu'un email n'est réservé qu'une fois, même sans SKIP LOCKED (SQLite).
+    """
+    now = datetime.utcnow()
+    claim_token = secrets.token_hex(16)
+    candidate_ids = [row.id for row in db.session.query(EmailOutbox.id).filter(
+        EmailOutbox.statut == 'en_attente',
+        EmailOutbox.prochaine_tentative <= now
+    ).order_by(EmailOutbox.prochaine_tentative, EmailOutbox.id).limit(limit).with_for_update(skip_locked=True)]
+
+    if not candidate_ids:
+        db.session.rollback()
+        return []
+
+    EmailOutbox.query.filter(
+        EmailOutbox.id.in_(candidate_ids),
+        EmailOutbox.statut == 'en_attente'
+    ).update({
+        'statut': 'en_cours',
+        'verrouille_par': claim_token,
+        'date_verrouillage': now
+    }, synchronize_session=False)
+    db.session.commit()
+
+    return [row.id for row in db.session.query(EmailOutbox.id).filter_by(
+        statut='en_cours', verrouille_par=claim_token
+    )]
+
+
+def deliver_outbox_message(message, smtp_pool):
+    """Envoie un email réservé et enregistre le résultat (outbox + TraitementEmploye)"""
+    download_link = message.download_link
+    employee_name = download_link.employee.nom_employe
+    now = datetime.utcnow()
+    try:
+        sender, body = build_secure_link_email(employee_name, message.destinataire, download_link)
+        smtp_pool.send(sender, [message.destinataire], body)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        message.tentatives += 1
+        message.derniere_erreur = error
+        message.verrouille_par = None
+        if isinstance(e, PERMANENT_EMAIL_ERRORS) or message.tentatives >= message.max_tentatives:
+            message.statut = 'echec_definitif'
+            app.logger.error(f"Email pour {employee_name} abandonné après {message.tentatives} tentative(s): {error}")
+        else:
+            message.statut = 'en_attente'
+            message.prochaine_tentative = now + email_retry_delay(message.tentatives)
+            app.logger.warning(f"Email pour {employee_name} en échec (tentative {message.tentatives}), "
+                               f"nouvel essai à {message.prochaine_tentative:%H:%M:%S}: {error}")
+        email_result = {'email_envoye': False, 'erreur_email': error}
+    else:
+        message.tentatives += 1
+        message.statut = 'envoye'
+        message.date_envoi = now
+        message.derniere_erreur = None
+        message.verrouille_par = None
+        email_result = {'email_envoye': True, 'date_email': now, 'erreur_email': None}
+
+    TraitementEmploye.query.filter_by(
+        traitement_id=message.traitement_id,
+        employe_id=message.employe_id
+    ).update(email_result, synchronize_session=False)
+    # Commit par message : un email parti n'est jamais renvoyé après un arrêt
+    db.session.commit()
+    return message.statut == 'envoye'
+
+
+def deliver_outbox_messages(message_ids, smtp_pool):
+    messages = EmailOutbox.query.options(
+        db.joinedload(EmailOutbox.download_link).joinedload(DownloadLink.employee)
+    ).filter(EmailOutbox.id.in_(message_ids)).order_by(EmailOutbox.id).all()
+    for message in messages:
+        try:
+            deliver_outbox_message(message, smtp_pool)
+        except Exception as e:
+            # Résultat non enregistré : le message reste en_cours et sera repris comme interrompu
+            db.session.rollback()
+            app.logger.error(f"Erreur enregistrement envoi email {message.id}: {str(e)}")
+
+
+def release_stale_outbox_messages():
+    """Remet en file les emails en_cours d'un expéditeur arrêté en plein envoi"""
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=app.config['EMAIL_OUTBOX_STALE_AFTER_SEC'])
+        released = EmailOutbox.query.filter(
+            EmailOutbox.statut == 'en_cours',
+            db.or_(EmailOutbox.date_verrouillage.is_(None), EmailOutbox.date_verrouillage < stale_before)
+        ).update({'statut': 'en_attente', 'verrouille_par': None}, synchronize_session=False)
+        db.session.commit()
+        if released:
+            app.logger.warning(f"{released} email(s) interrompu(s) remis en file")
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Erreur reprise des emails interrompus: {str(e)}")
+
+
+def _outbox_sender_loop():
+    """Boucle d'un expéditeur : une session SMTP ouverte tant qu'il reste des emails dus"""
+    smtp_pool = None
+    while True:
+        message_ids = []
+        try:
+            with app.app_context():
+                message_ids = claim_outbox_messages(app.config['EMAIL_OUTBOX_BATCH_SIZE'])
+                if message_ids:
+                    if smtp_pool is None:
+                        smtp_pool = create_smtp_pool(size=1)
+                    deliver_outbox_messages(message_ids, smtp_pool)
+        except Exception as e:
+            app.logger.error(f"Erreur expéditeur d'emails: {str(e)}")
+
+        if not message_ids:
+            if smtp_pool is not None:
+                app.logger.info(f"SMTP {threading.current_thread().name}: {smtp_pool.metrics}")
+                smtp_pool.close()
+                smtp_pool = None
+            with app.app_context():
+                release_stale_outbox_messages()
+            outbox_wakeup.wait(app.config['EMAIL_OUTBOX_POLL_INTERVAL_SEC'])
+            outbox_wakeup.clear()
+
+
+def start_outbox_senders():
+    """Démarre (une seule fois par processus) les expéditeurs de la file d'emails"""
+    with outbox_senders_lock:
+        if outbox_senders:
+            return
+        with app.app_context():
+            release_stale_outbox_messages()
+        for i in range(max(1, app.config['EMAIL_SENDER_THREADS'])):
+            sender = threading.Thread(
+                target=_outbox_sender_loop,
+                name=f'payflow-email-{i + 1}',
+                daemon=True
+            )
+            sender.start()
+            outbox_senders.append(sender)
+        app.logger.info(f"{len(outbox_senders)} expéditeur(s) d'emails démarré(s)")
+
+
+def update_processing_progress(traitement, **fields):
+    """Met à jour l'étape/les compteurs d'un traitement et les rend visibles au polling"""
+    for field, value in fields.items():
+        setattr(traitement, field, value)
+    traitement.date_maj = datetime.utcnow()
+    db.session.commit()
+
+
+def extract_split_plan(filepath, pdf_reader, total_pages, traitement, progress_every, metrics):
+    """Analyse les pages et retourne le plan de découpage {nom: {pages, matricule, period}}"""
+    update_processing_progress(traitement, etape='extraction', nombre_pages=total_pages,
+                               pages_analysees=0, pdfs_generes=0)
+    
+    # Extraction du texte (pool de processus pour les gros fichiers)
+    def on_extraction_progress(done_pages):
+        if done_pages % progress_every == 0 or done_pages == total_pages:
+            update_processing_progress(traitement, pages_analysees=done_pages)
+    
+    with metrics.stage('extraction'):
+        pages_text = extract_pages_text(
+            filepath,
+            total_pages,
+            workers=app.config.get('PDF_EXTRACTION_WORKERS', 1),
+            min_pages=app.config.get('PDF_PARALLEL_MIN_PAGES', 200),
+            pdf_reader=pdf_reader,
+            on_progress=on_extraction_progress
+        )
+    metrics.add('pages_analysees', total_pages)
+    
+    with metrics.stage('analyse'):
+        return build_split_plan(pages_text)
+
+
+def build_split_plan(pages_text):
+    """Regroupe les pages par employé (dans l'ordre des pages)"""
+    employee_data = {}
+    for page_num, page_text in enumerate(pages_text):
+        employee_name, employee_matricule, period = parse_page(page_text)
+        
+        if employee_name:
+            app.logger.info(f"Page {page_num + 1}: Employé trouvé - {employee_name}")
+            if employee_matricule:
+                app.logger.info(f"Page {page_num + 1}: Matricule trouvé - {employee_matricule}")
+            if period:
+                app.logger.info(f"Page {page_num + 1}: Période trouvée - {period}")
             
-            if send_email_with_secure_link(employee_name, email, output_path):
-                app.logger.info(f"Processus complet réussi pour {employee_name}")
+            if employee_name not in employee_data:
+                employee_data[employee_name] = {
+                    'pages': [],
+                    'matricule': employee_matricule,
+                    'period': period
+                }
             else:
-                app.logger.info(f"Erreur lors de l'envoi pour {employee_name}")
-                
-        elif employee_name in employees_data and not matricule:
-            app.logger.info(f"Employé {employee_name} trouvé mais matricule non détecté - PDF créé sans protection")
+                if not employee_data[employee_name]['matricule'] and employee_matricule:
+                    employee_data[employee_name]['matricule'] = employee_matricule
+                if not employee_data[employee_name]['period'] and period:
+                    employee_data[employee_name]['period'] = period
             
-        else:
-            app.logger.info(f"PDF créé SANS protection pour {employee_name} ")
-        
-        return True
-        
-    except Exception as e:
-        app.logger.error(f"Erreur lors de la création du PDF pour {employee_name}: {str(e)}")
-        return False
+            employee_data[employee_name]['pages'].append(page_num)
+    
+    return employee_data
 
-def extract_period_from_page(page_text):
-    """Extrait la période du bulletin (année_mois) depuis le texte d'une page"""
-    lines = page_text.split('\n')
+
+# Plan de découpage d'un traitement en mode flux :
+# {STREAMING_PLAN_KEY: {'page_reprise': n, 'echecs': [noms], 'remplacement': [fichier complété, fiche]}}
+# (clé impossible pour un nom d'employé, toujours en majuscules)
+STREAMING_PLAN_KEY = '_flux'
+
+
+def streaming_plan(next_page, failed, replacement=None):
+    """plan_decoupage JSON d'un traitement en mode flux : page de reprise, employés en échec et,
+    le cas échéant, fiche complétée validée en base mais pas encore mise en place (update_generated_file)"""
+    plan = {'page_reprise': next_page, 'echecs': sorted(failed)}
+    if replacement:
+        plan['remplacement'] = list(replacement)
+    return json.dumps({STREAMING_PLAN_KEY: plan})
+
+
+def use_streaming_mode(traitement, pdf_reader):
+    """Mode flux pour les PDF d'au moins PROCESSING_STREAMING_MIN_PAGES pages (0 : jamais).
     
-    import re
-    
-    # Patterns de recherche pour différents formats de date
-    patterns = [
-        # Format: "Période du 01/08/25 au 31/08/25"
-        r'Période du \d{2}/(\d{2})/(\d{2}) au',
-        # Format: "Période du 01/08/2025 au 31/08/2025"
-        r'Période du \d{2}/(\d{2})/(\d{4}) au',
-        # Format: "du 01/08/25 au 31/08/25"
-        r'du \d{2}/(\d{2})/(\d{2}) au',
-        # Format: "Mois: 08/2025" ou "Mois : 08/2025"
-        r'Mois\s*:\s*(\d{2})/(\d{4})',
-        # Format général date: "31/08/25" ou "01/08/2025"
-        r'(\d{1,2})/(\d{1,2})/(\d{2,4})'
-    ]
+    Un traitement repris garde le mode de sa première exécution (forme de son plan de découpage).
+    """
+    if traitement.plan_decoupage:
+        return STREAMING_PLAN_KEY in json.loads(traitement.plan_decoupage)
+    min_pages = app.config.get('PROCESSING_STREAMING_MIN_PAGES', 0)
+    return min_pages > 0 and count_pages(pdf_reader) >= min_pages
+
+
+def process_pdf_streaming(pdf_reader, traitement, output_dir, progress_every, metrics):
+    """Mode flux de process_pdf : pages lues une à une, fiche écrite dès la fin du bloc de l'employé.
     
-    for line in lines:
-        line = line.strip()
+    Seules les pages du bloc en cours et le lot d'employés pas encore enregistré
+    sont en mémoire (pdf_streaming). Tous les PERSISTENCE_BATCH_SIZE employés,
+    le lot est validé comme en mode standard (nouveaux employés, manifeste,
+    liens, emails en file) avec la page où reprendre après une interruption.
+    Un employé dont les pages reviennent plus loin dans le fichier voit sa
+    fiche complétée, y compris si elle est déjà enregistrée. Un employé dont la
+    fiche n'a pu être écrite ou complétée avant enregistrement est en échec
+    (conservé dans le plan) : ni manifeste, ni lien, ni email, ses pages
+    suivantes sont ignorées.
+    Retourne un ProcessingOutcome.
+    """
+    total_pages = count_pages(pdf_reader)
+    plan = json.loads(traitement.plan_decoupage) if traitement.plan_decoupage else {}
+    start_page = plan.get(STREAMING_PLAN_KEY, {}).get('page_reprise', 0)
+    failed = set(plan.get(STREAMING_PLAN_KEY, {}).get('echecs', []))  # fiches impossibles à écrire : jamais envoyées
+    replacement = plan.get(STREAMING_PLAN_KEY, {}).get('remplacement')
+    if replacement and os.path.exists(replacement[0]):
+        # Interruption entre la validation d'une fiche complétée et sa mise en place : on la termine
+        os.replace(*replacement)
+    
+    # Fiches déjà enregistrées (exécution interrompue, lots précédents) : {nom: chemin}
+    persisted = {}
+    taken_filenames = set()  # noms de fichier attribués dans ce traitement (allocate_output_filename)
+    for name, path, filename in db.session.query(
+        FichierGenere.nom_employe_extrait, FichierGenere.chemin_fichier, FichierGenere.nom_fichier
+    ).filter_by(traitement_id=traitement.id):
+        persisted[name] = path
+        taken_filenames.add(filename)
+    completed_count = len(persisted)
+    if start_page:
+        app.logger.info(f"Reprise du traitement {traitement.timestamp_folder} en mode flux à la page {start_page + 1} "
+                        f"({completed_count} employé(s) déjà terminé(s))")
+    update_processing_progress(traitement, etape='flux', nombre_pages=total_pages, pages_analysees=start_page,
+                               pdfs_generes=completed_count, nombre_employes_detectes=completed_count,
+                               plan_decoupage=streaming_plan(start_page, failed))
+    
+    checkpoint_size = app.config.get('PERSISTENCE_BATCH_SIZE', 500)
+    batch_data = {}  # lot en cours, même forme que le plan standard : {nom: {pages, matricule, period}}
+    pending_files = {}
+    generated_count = 0
+    new_employees_count = 0
+    links_created = 0
+    
+    def on_page(page_num, info):
+        metrics.add('pages_analysees')
+        if (page_num + 1) % progress_every == 0:
+            update_processing_progress(traitement, pages_analysees=page_num + 1,
+                                       pdfs_generes=completed_count + generated_count,
+                                       nombre_employes_detectes=len(persisted) + len(pending_files) + len(failed))
+    
+    def checkpoint(next_page):
+        """Valide le lot en cours ; la reprise repartira de next_page"""
+        nonlocal batch_data, pending_files, new_employees_count, links_created
+        with metrics.stage('employes'):
+            new_employees = detect_new_employees(batch_data)
+            if new_employees:
+                new_employees_count += len(add_employees_to_database(new_employees).inserted)
+        with metrics.stage('enregistrement'):
+            # Validé dans la même transaction que le lot (persist_treatment_results)
+            traitement.plan_decoupage = streaming_plan(next_page, failed)
+            traitement.nombre_employes_detectes = len(persisted) + len(pending_files) + len(failed)
+            links_created += checkpoint_treatment_results(traitement, batch_data, pending_files,
+                                                          completed_count + generated_count, metrics)
+        for name, generated_file in pending_files.items():
+            persisted[name] = generated_file.chemin
+        batch_data = {}
+        pending_files = {}
+    
+    for block in iter_employee_blocks(pdf_reader, start_page, metrics, on_page):
+        name = block.nom
+        page_numbers = list(range(block.premiere_page, block.derniere_page + 1))
+        
+        if name in persisted:
+            # Pages d'un employé déjà enregistré plus loin dans le fichier : lot en cours validé
+            # d'abord, puis fiche complétée et mise à jour avec la page de reprise suivante
+            if pending_files:
+                checkpoint(block.premiere_page)
+            # Fiche complétée écrite à côté, mise en place seulement après validation de la page de
+            # reprise suivante : une reprise ne peut ni perdre ces pages ni les ajouter deux fois
+            next_page = block.derniere_page + 1
+            staging_path = f"{persisted[name]}.{next_page}.tmp"
+            with metrics.stage('generation_pdf'):
+                generated_file = append_to_individual_pdf(persisted[name], block.pages, name, staging_path)
+            if not generated_file:
+                # Fiche déjà envoyée : traitement en échec, reprenable à ce bloc
+                raise RuntimeError(f"Fiche de {name} impossible à compléter "
+                                   f"(pages {block.premiere_page + 1}-{block.derniere_page + 1})")
+            metrics.add('octets_ecrits', generated_file.taille_fichier)
+            with metrics.stage('enregistrement'):
+                update_generated_file(traitement, generated_file,
+                                      streaming_plan(next_page, failed, (staging_path, generated_file.chemin)))
+            os.replace(staging_path, generated_file.chemin)
+            continue
+        
+        if name in failed:
+            # Fiche incomplète : ni écrite ni envoyée, les pages suivantes de l'employé sont ignorées aussi
+            app.logger.warning(f"Pages {block.premiere_page + 1}-{block.derniere_page + 1} ignorées : "
+                               f"fiche de {name} en échec")
+            continue
+        
+        with metrics.stage('generation_pdf'):
+            if name in pending_files:
+                generated_file = append_to_individual_pdf(pending_files[name].chemin, block.pages, name)
+            else:
+                filename = allocate_output_filename(name, block.matricule, block.periode, taken_filenames)
+                generated_file = write_individual_pdf(block.pages, name, os.path.join(output_dir, filename))
+        if not generated_file:
+            if name in pending_files:
+                # Pages de ce bloc perdues : l'employé sort du lot (ni manifeste, ni lien, ni email)
+                incomplete_path = pending_files.pop(name).chemin
+                filename = os.path.basename(incomplete_path)
+                del batch_data[name]
+                generated_count -= 1
+                metrics.add('fiches_generees', -1)
+                try:
+                    os.remove(incomplete_path)
+                except OSError:
+                    pass
+            failed.add(name)
+            taken_filenames.discard(filename)
+            continue
+        metrics.add('octets_ecrits', generated_file.taille_fichier)
+        
+        if name in pending_files:
+            batch_data[name]['pages'].extend(page_numbers)
+        else:
+            batch_data[name] = {'pages': page_numbers, 'matricule': block.matricule, 'period': block.periode}
+            generated_count += 1
+            metrics.add('fiches_generees')
+        pending_files[name] = generated_file
         
-        # Test de chaque pattern
-        for i, pattern in enumerate(patterns):
-            match = re.search(pattern, line)
-            if match:
-                if i in [0, 2]:  # Patterns avec jours/mois/année à 2 chiffres
-                    month = match.group(1).zfill(2)
-                    year = match.group(2)
-                    # Convertir année 2 chiffres en 4 chiffres
-                    full_year = f"20{year}" if int(year) < 50 else f"19{year}"
-                    return f"{full_year}_{month}"
-                    
-                elif i == 1:  # Pattern avec année à 4 chiffres
-                    month = match.group(1).zfill(2)
-                    year = match.group(2)
-                    return f"{year}_{month}"
-                    
-                elif i == 3:  # Pattern "Mois: MM/YYYY"
-                    month = match.group(1).zfill(2)
-                    year = match.group(2)
-                    return f"{year}_{month}"
-                    
-                elif i == 4:  # Pattern date générale
-                    day = match.group(1).zfill(2)
-                    month = match.group(2).zfill(2)
-                    year = match.group(3)
-                    # Convertir année si nécessaire
-                    if len(year) == 2:
-                        full_year = f"20{year}" if int(year) < 50 else f"19{year}"
-                    else:
-                        full_year = year
-                    return f"{full_year}_{month}"
-    
-    # Si aucune date trouvée, utiliser la date actuelle
-    from datetime import datetime
-    now = datetime.now()
-    #app.logger.info("Aucune période trouvée dans le PDF, utilisation de la date actuelle")
-    return now.strftime('%Y_%m')
+        if len(pending_files) >= checkpoint_size:
+            checkpoint(block.derniere_page + 1)
+    
+    # Dernier lot ; les emails partent via la file d'envoi au fil des lots
+    update_processing_progress(traitement, etape='enregistrement', pages_analysees=total_pages)
+    checkpoint(total_pages)
+    return ProcessingOutcome(len(persisted) + len(failed), completed_count, generated_count,
+                             new_employees_count, links_created)
+
+
+def update_generated_file(traitement, generated_file, plan_decoupage):
+    """Enregistre la fiche complétée d'un employé déjà terminé (mode flux) avec le plan de reprise suivant"""
+    db.session.execute(
+        db.update(FichierGenere)
+        .where(FichierGenere.traitement_id == traitement.id, FichierGenere.chemin_fichier == generated_file.chemin)
+        .values(taille_fichier=generated_file.taille_fichier, empreinte_sha256=generated_file.empreinte_sha256)
+    )
+    db.session.execute(
+        db.update(DownloadLink)
+        .where(DownloadLink.traitement_id == traitement.id, DownloadLink.chemin_fichier == generated_file.chemin)
+        .values(empreinte_sha256=generated_file.empreinte_sha256)
+    )
+    traitement.plan_decoupage = plan_decoupage
+    traitement.date_maj = datetime.utcnow()
+    db.session.commit()
 
 
-def process_pdf(filepath, output_dir):
-    """Fonction principale avec auto-import des employés """
+def process_pdf(filepath, output_dir, traitement=None):
+    """Fonction principale avec auto-import des employés.
+    
+    Appelée par les workers de la file avec le Traitement déjà créé ; sans
+    traitement fourni (scripts), l'enregistrement est créé ici.
+    
+    Reprenable : le plan de découpage est enregistré sur le traitement après
+    l'analyse des pages, et chaque lot d'employés terminés (fiche, lien, email
+    en file) est validé comme point de reprise. Relancé après une interruption,
+    le traitement relit le plan et ne refait que les employés absents du manifeste.
+    
+    À partir de PROCESSING_STREAMING_MIN_PAGES pages, le PDF est traité en mode
+    flux (process_pdf_streaming) : mémoire bornée quel que soit le nombre de pages.
+    """
     start_time = datetime.now()
+    progress_every = app.config.get('PROCESSING_PROGRESS_EVERY_PAGES', 25)
+    metrics = ProcessingMetrics(trace_memory=app.config.get('PROCESSING_TRACE_MEMORY', True)).start()
     
     try:
-        # 1. Chargement des employés existants
-        employees = load_employees()
-        employee_data = {}
+        if traitement is None:
+            traitement = Traitement(
+                timestamp_folder=os.path.basename(output_dir),
+                fichier_original=os.path.basename(filepath),
+                taille_fichier=os.path.getsize(filepath),
+                chemin_fichier=filepath,
+                statut='en_cours',
+                date_debut=datetime.utcnow()
+            )
+            db.session.add(traitement)
+            record_daily_stats({daily_stats.TRAITEMENTS_CREES: 1})
+        
+        # 1. Annuaire des employés : une lecture de version, rechargé seulement s'il a changé
+        with metrics.stage('employes'):
+            employee_directory.ensure_fresh()
         
         # 2. IMPORTANT : Garde le fichier ouvert pendant TOUT le traitement
         with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
-            #app.logger.info(f"Analyse du PDF avec {total_pages} pages...")
+            metrics.add('octets_lus', os.fstat(file.fileno()).st_size)
+            with metrics.stage('extraction'):
+                pdf_reader = PyPDF2.PdfReader(file)
             
-            # Analyse de chaque page
-            for page_num in range(total_pages):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                
-                employee_name = extract_employee_name_from_page(page_text)
-                employee_matricule = extract_employee_matricule_from_page(page_text)
-                period = extract_period_from_page(page_text)
-                
-                if employee_name:
-                    app.logger.info(f"Page {page_num + 1}: Employé trouvé - {employee_name}")
-                    if employee_matricule:
-                        app.logger.info(f"Page {page_num + 1}: Matricule trouvé - {employee_matricule}")
-                    if period:
-                        app.logger.info(f"Page {page_num + 1}: Période trouvée - {period}")
-                    
-                    if employee_name not in employee_data:
-                        employee_data[employee_name] = {
-                            'pages': [],
-                            'matricule': employee_matricule,
-                            'period': period
-                        }
-                    else:
-                        if not employee_data[employee_name]['matricule'] and employee_matricule:
-                            employee_data[employee_name]['matricule'] = employee_matricule
-                        if not employee_data[employee_name]['period'] and period:
-                            employee_data[employee_name]['period'] = period
-                    
-                    employee_data[employee_name]['pages'].append(page_num)
+            # Très gros PDF : mode flux, chaque fiche écrite dès la fin de son bloc de pages
+            if use_streaming_mode(traitement, pdf_reader):
+                outcome = process_pdf_streaming(pdf_reader, traitement, output_dir, progress_every, metrics)
+                return finalize_processing(traitement, start_time, metrics, outcome)
             
-            # 3. Détection des nouveaux employés
-            new_employees = detect_new_employees(employee_data)
-            new_employees_count = 0
+            with metrics.stage('extraction'):
+                total_pages = len(pdf_reader.pages)
             
-            if new_employees:
-                app.logger.info(f"\n Nouveaux employés détectés: {len(new_employees)}")
-                new_employees_count = add_employees_to_database(new_employees)
-                employees = load_employees()  # Recharger après ajout
+            if traitement.plan_decoupage:
+                # Reprise : le découpage déjà calculé est relu, les pages ne sont pas réanalysées
+                employee_data = json.loads(traitement.plan_decoupage)
+                app.logger.info(f"Reprise du traitement {traitement.timestamp_folder} : plan de découpage relu")
+            else:
+                employee_data = extract_split_plan(filepath, pdf_reader, total_pages, traitement, progress_every, metrics)
+            
+            update_processing_progress(traitement, etape='import_employes', pages_analysees=total_pages,
+                                       nombre_employes_detectes=len(employee_data),
+                                       plan_decoupage=json.dumps(employee_data))
+            
+            # 3. Détection des nouveaux employés (déjà ajoutés avant une interruption : ignorés)
+            with metrics.stage('employes'):
+                new_employees = detect_new_employees(employee_data)
+                new_employees_count = 0
                 
-                if new_employees_count > 0:
-                    flash(f'🆕 {new_employees_count} nouveaux employés détectés et ajoutés !', 'info')
+                if new_employees:
+                    app.logger.info(f"\n Nouveaux employés détectés: {len(new_employees)}")
+                    new_employees_count = len(add_employees_to_database(new_employees).inserted)
+                    
+                    if new_employees_count > 0:
+                        app.logger.info(f'🆕 {new_employees_count} nouveaux employés détectés et ajoutés !')
             
-            # 4. Enregistrement du traitement
-            traitement = Traitement(
-                timestamp_folder=os.path.basename(output_dir),
-                fichier_original=os.path.basename(filepath),
-                taille_fichier=os.path.getsize(filepath),
-                nombre_pages=total_pages,
-                nombre_employes_detectes=len(employee_data),
-                nombre_nouveaux_employes=new_employees_count,
-                statut='en_cours'
-            )
-            db.session.add(traitement)
-            db.session.commit()
+            # 4. Passage à la génération des PDF ; fiches du manifeste = employés déjà terminés
+            stored_filenames = dict(db.session.query(
+                FichierGenere.nom_employe_extrait, FichierGenere.nom_fichier
+            ).filter_by(traitement_id=traitement.id))
+            completed = set(stored_filenames)
+            output_filenames = allocate_output_filenames(employee_data, stored_filenames)
+            if completed:
+                app.logger.info(f"Reprise : {len(completed)} employé(s) déjà terminé(s) ignoré(s)")
+            update_processing_progress(traitement, etape='generation_pdf', pdfs_generes=len(completed),
+                                       nombre_nouveaux_employes=(traitement.nombre_nouveaux_employes or 0) + new_employees_count)
             
-            # 5.  Création des PDF individuels PENDANT que le fichier est ouvert
-            processed_count = 0
+            # 5. Création des PDF individuels PENDANT que le fichier est ouvert ; point de reprise
+            # tous les PERSISTENCE_BATCH_SIZE employés (manifeste, fiches, liens et emails validés ensemble)
+            checkpoint_size = app.config.get('PERSISTENCE_BATCH_SIZE', 500)
+            pending_files = {}
+            generated_count = 0
+            links_created = 0
             for employee_name, data in employee_data.items():
-                if create_individual_pdf_with_period(
-                    pdf_reader,  #  Le fichier est encore ouvert ici
-                    employee_name,
-                    data['pages'],
-                    data['matricule'],
-                    data['period'],
-                    employees,
-                    output_dir
-                ):
-                    processed_count += 1
-                    
-                    # Enregistrement du traitement par employé
-                    try:
-                        employee_record = Employee.query.filter_by(nom_employe=employee_name).first()
-                        if employee_record:
-                            traitement_employe = TraitementEmploye(
-                                traitement_id=traitement.id,
-                                employe_id=employee_record.id,
-                                matricule_extrait=data['matricule'],
-                                periode_extraite=data['period'],
-                                nom_fichier_genere=f"{employee_name}_{data['period'] or datetime.now().strftime('%Y_%m')}.pdf"
-                            )
-                            db.session.add(traitement_employe)
-                    except Exception as e:
-                        app.logger.error(f"Erreur enregistrement traitement pour {employee_name}: {str(e)}")
+                if employee_name in completed:
+                    continue
+                with metrics.stage('generation_pdf'):
+                    generated_file = create_individual_pdf_with_period(
+                        pdf_reader,  #  Le fichier est encore ouvert ici
+                        employee_name,
+                        data['pages'],
+                        os.path.join(output_dir, output_filenames[employee_name])
+                    )
+                if not generated_file:
+                    continue
+                pending_files[employee_name] = generated_file
+                generated_count += 1
+                metrics.add('fiches_generees')
+                metrics.add('octets_ecrits', generated_file.taille_fichier)
+                if len(pending_files) >= checkpoint_size:
+                    with metrics.stage('enregistrement'):
+                        links_created += checkpoint_treatment_results(traitement, employee_data, pending_files,
+                                                                      len(completed) + generated_count, metrics)
+                    pending_files = {}
+                elif generated_count % progress_every == 0:
+                    update_processing_progress(traitement, pdfs_generes=len(completed) + generated_count)
+        
+        # 5b. Dernier point de reprise ; les emails partent via la file d'envoi au fil des lots
+        update_processing_progress(traitement, etape='enregistrement')
+        with metrics.stage('enregistrement'):
+            links_created += checkpoint_treatment_results(traitement, employee_data, pending_files,
+                                                          len(completed) + generated_count, metrics)
         
         # 6. Finalisation (le fichier est maintenant fermé)
-        end_time = datetime.now()
-        processing_duration = (end_time - start_time).total_seconds()
-        
-        traitement.nombre_employes_traites = processed_count
-        traitement.duree_traitement_secondes = int(processing_duration)
-        traitement.statut = 'termine' if processed_count == len(employee_data) else 'partiel'
-        
-        db.session.commit()
-        
-        return {
-            'success': True,
-            'count': processed_count,
-            'total_employees': len(employee_data),
-            'new_employees': new_employees_count,
-            'message': f'{processed_count} fiches traitées sur {len(employee_data)} employés détectés' +
-                      (f' (dont {new_employees_count} nouveaux)' if new_employees_count > 0 else '')
-        }
+        return finalize_processing(traitement, start_time, metrics, ProcessingOutcome(
+            len(employee_data), len(completed), generated_count, new_employees_count, links_created))
         
     except Exception as e:
         app.logger.error(f" Erreur lors du traitement: {str(e)}")
+        db.session.rollback()
+        if traitement is not None and traitement.id is not None:
+            try:
+                traitement.statut = 'echec'
+                traitement.date_fin = datetime.utcnow()
+                record_treatment_transition(new_state=treatment_state(traitement))
+                add_processing_metrics(traitement, metrics, 'echec')
+                update_processing_progress(traitement, etape='echec', erreurs=str(e))
+                invalidate_dashboard_stats()
+            except Exception as e2:
+                db.session.rollback()
+                app.logger.error(f" Erreur enregistrement de l'échec: {str(e2)}")
         return {
             'success': False,
             'error': str(e)
         }
+    finally:
+        metrics.stop()
+
+
+# Bilan d'une exécution de process_pdf (employés terminés avant elle compris)
+ProcessingOutcome = namedtuple('ProcessingOutcome', ['employes_detectes', 'employes_termines', 'fiches_generees',
+                                                     'nouveaux_employes', 'liens_crees'])
+
+
+def finalize_processing(traitement, start_time, metrics, outcome):
+    """Clôture le traitement (statut, durée, compteurs journaliers, mesures) et retourne le résultat de process_pdf"""
+    processed_count = outcome.employes_termines + outcome.fiches_generees
+    new_employees_count = outcome.nouveaux_employes
+    
+    end_time = datetime.now()
+    processing_duration = (end_time - start_time).total_seconds()
+    
+    traitement.nombre_employes_traites = processed_count
+    traitement.duree_traitement_secondes = int(processing_duration)
+    traitement.statut = 'termine' if processed_count == outcome.employes_detectes else 'partiel'
+    traitement.etape = 'termine'
+    traitement.date_fin = datetime.utcnow()
+    traitement.date_maj = traitement.date_fin
+    
+    # Compteurs journaliers validés avec la finalisation : issue du traitement (reprises comprises,
+    # un échec précédent a été retiré à la remise en file) et liens créés par cette exécution
+    record_treatment_transition(new_state=treatment_state(traitement))
+    record_daily_stats({daily_stats.LIENS_CREES: outcome.liens_crees})
+    add_processing_metrics(traitement, metrics, traitement.statut)
+    db.session.commit()
+    invalidate_dashboard_stats()
+    
+    return {
+        'success': True,
+        'count': processed_count,
+        'total_employees': outcome.employes_detectes,
+        'new_employees': new_employees_count,
+        'message': f'{processed_count} fiches traitées sur {outcome.employes_detectes} employés détectés' +
+                  (f' (dont {new_employees_count} nouveaux)' if new_employees_count > 0 else '')
+    }
+
+
+def add_processing_metrics(traitement, metrics, statut):
+    """Ajoute à la session les mesures de l'exécution (validées avec la finalisation du traitement)"""
+    metrics.stop()
+    db.session.add(MetriquesTraitement(
+        traitement_id=traitement.id,
+        traite_par=traitement.traite_par,
+        statut=statut,
+        date_debut=datetime.utcfromtimestamp(metrics.started_at),
+        date_fin=datetime.utcfromtimestamp(metrics.finished_at),
+        **metrics.to_row()
+    ))
 
 
 def detect_new_employees(employee_data_from_pdf):
     """Détecte les nouveaux employés par matricule (plus fiable que le nom)"""
     
-    existing_matricules = set()
     try:
-        employees_in_db = Employee.query.filter_by(statut='actif').all()
-        existing_matricules = {emp.matricule for emp in employees_in_db if emp.matricule}
+        # Tous statuts confondus : réimporter un matricule existant violerait la contrainte unique
+        existing_matricules = employee_directory.matricules()
     except Exception as e:
         app.logger.error(f"Erreur lors de la vérification des matricules: {str(e)}")
         return []
@@ -573,120 +1299,375 @@ def detect_new_employees(employee_data_from_pdf):
 
 
 def add_employees_to_database(new_employees, source='pdf_import'):
-    """Ajoute les nouveaux employés avec matricule obligatoire"""
+    """Ajoute les nouveaux employés (matricule obligatoire) en une instruction ensembliste.
     
-    added_count = 0
+    INSERT ... ON CONFLICT (matricule) DO NOTHING RETURNING : un matricule déjà
+    présent (ajouté entre-temps par un traitement concurrent, par exemple) est
+    simplement rapporté comme existant au lieu d'annuler tout le lot.
+    Retourne un NewEmployeesResult (lignes insérées, matricules existants).
+    """
+    rows = {}
     for emp_data in new_employees:
-        try:
-            if not emp_data.get('matricule'):
-                app.logger.info(f"Employé {emp_data['nom']} ignoré - matricule manquant")
-                continue
-                
+        if not emp_data.get('matricule'):
+            app.logger.info(f"Employé {emp_data['nom']} ignoré - matricule manquant")
+            continue
+        # Un même matricule sous deux noms extraits : la première occurrence l'emporte
+        rows.setdefault(emp_data['matricule'], {
+            'matricule': emp_data['matricule'],
+            'nom_employe': emp_data['nom'],
             # Email temporaire basé sur le matricule (plus fiable)
-            temp_email = f"employe.{emp_data['matricule']}@temporaire.com"
-            
-            new_employee = Employee(
-                matricule=emp_data['matricule'],
-                nom_employe=emp_data['nom'],
-                email=temp_email,
-                statut='actif',
-                source_creation=source
-            )
-            
-            db.session.add(new_employee)
-            added_count += 1
-            #app.logger.info(f"Employé ajouté: {emp_data['nom']} (Matricule: {emp_data['matricule']})")
-            
-        except Exception as e:
-            app.logger.error(f"Erreur lors de l'ajout de {emp_data['nom']}: {str(e)}")
+            'email': f"employe.{emp_data['matricule']}@temporaire.com",
+            'statut': 'actif',
+            'source_creation': source
+        })
     
     try:
+        result = insert_new_employees(list(rows.values()))
+        directory_changes = employee_directory.stage_changes(result.inserted)
         db.session.commit()
-        #app.logger.info(f" {added_count} nouveaux employés sauvegardés avec leur matricule")
-        return added_count
+        employee_directory.apply(directory_changes)
+        invalidate_dashboard_stats()
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Erreur lors de la sauvegarde: {str(e)}")
-        return 0
+        app.logger.error(f"Erreur lors de l'ajout des nouveaux employés: {str(e)}")
+        return NewEmployeesResult([], [])
+    
+    if result.existing:
+        app.logger.info(f"Matricules déjà en base (ajoutés entre-temps) : {', '.join(result.existing)}")
+    return result
+
+# PDF individuel écrit sur disque, avec sa taille et son empreinte (ETag des téléchargements)
+GeneratedFile = namedtuple('GeneratedFile', ['chemin', 'taille_fichier', 'empreinte_sha256'])
+
 
-def create_individual_pdf_with_period(pdf_reader, employee_name, page_numbers, matricule, period, employees_data, output_dir):
-    """Version avec liens sécurisés au lieu d'emails directs"""
+def allocate_output_filename(employee_name, matricule, period, taken):
+    """Nom de fichier de la fiche d'un employé, absent de `taken` (noms déjà attribués dans le traitement).
     
+    Deux noms extraits peuvent donner le même nom de fichier une fois assainis
+    ("DUPONT J." et "DUPONT J") : le second prend son matricule en suffixe, puis
+    un compteur. Le nom retenu est ajouté à `taken`.
+    """
+    safe_filename = "".join(c for c in employee_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    period = period or datetime.now().strftime('%Y_%m')
+    safe_matricule = "".join(c for c in (matricule or '') if c.isalnum() or c in ('-', '_'))
+    candidates = [f"{safe_filename}_{period}.pdf"]
+    if safe_matricule:
+        candidates.append(f"{safe_filename}_{safe_matricule}_{period}.pdf")
+    counter = 2
+    while True:
+        for candidate in candidates:
+            if candidate not in taken:
+                taken.add(candidate)
+                return candidate
+        candidates = [f"{safe_filename}_{counter}_{period}.pdf"]
+        counter += 1
+
+
+def allocate_output_filenames(employee_data, stored_filenames):
+    """{nom_extrait: nom de fichier} pour tout le plan de découpage, sans doublon.
+    
+    stored_filenames : {nom_extrait: nom_fichier} du manifeste (employés déjà
+    terminés, qui gardent leur fichier). Attribution dans l'ordre du plan : une
+    reprise retrouve les noms de la première exécution.
+    """
+    taken = set(stored_filenames.values())
+    filenames = {}
+    for employee_name, data in employee_data.items():
+        if employee_name in stored_filenames:
+            filenames[employee_name] = stored_filenames[employee_name]
+        else:
+            filenames[employee_name] = allocate_output_filename(employee_name, data.get('matricule'),
+                                                                data.get('period'), taken)
+    return filenames
+
+
+def create_individual_pdf_with_period(pdf_reader, employee_name, page_numbers, output_path):
+    """Écrit le PDF individuel d'un employé et retourne un GeneratedFile (None en cas d'erreur).
+    
+    Liens et emails ne sont plus traités ici : ils sont créés en lot par
+    persist_treatment_results puis envoyés par les expéditeurs de la file email_outbox.
+    """
+    return write_individual_pdf((pdf_reader.pages[page_num] for page_num in page_numbers),
+                                employee_name, output_path)
+
+
+def write_individual_pdf(pages, employee_name, output_path, staging_path=None):
+    """Écrit les pages données (PageObject) dans le PDF individuel de l'employé ; GeneratedFile ou None.
+    
+    Avec staging_path, le contenu est écrit à ce chemin et output_path n'est pas
+    touché : l'appelant le met en place (os.replace) quand il le décide.
+    """
     try:
-        # Création du PDF (inchangé)
         pdf_writer = PyPDF2.PdfWriter()
-        for page_num in page_numbers:
-            pdf_writer.add_page(pdf_reader.pages[page_num])
-        
-        # Nom de fichier avec période
-        safe_filename = "".join(c for c in employee_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        if period:
-            output_filename = f"{safe_filename}_{period}.pdf"
-        else:
-            current_period = datetime.now().strftime('%Y_%m')
-            output_filename = f"{safe_filename}_{current_period}.pdf"
-        
-        output_path = os.path.join(output_dir, output_filename)
-        
-        with open(output_path, 'wb') as output_file:
-            pdf_writer.write(output_file)
+        for page in pages:
+            pdf_writer.add_page(page)
         
-        # NOUVEAU : Logique avec liens sécurisés
-        if matricule:
-            employee_record = find_employee_by_matricule(matricule)
-            
-            if employee_record:
-                # Protection avec matricule
-                #protect_pdf_with_password(output_path, matricule)
-                #app.logger.info(f" PDF créé et protégé pour {employee_name}")
-                #app.logger.info(f" Matricule: {matricule}")
-                #app.logger.info(f" Fichier: {output_filename}")
-                
-                # 🔗 NOUVEAU : Génération du lien sécurisé
-                # Récupérer le traitement actuel (vous devrez passer cette info)
-                current_traitement = get_current_traitement(output_dir) 
-                
-                if current_traitement:
-                    download_link = generate_secure_download_link(
-                        employee_record, 
-                        current_traitement, 
-                        output_path, 
-                        matricule
-                    )
-                    
-                    if download_link:
-                        # 📧 Envoi email avec lien sécurisé
-                        if send_email_with_secure_link(employee_name, employee_record.email, download_link):
-                            #app.logger.info(f"Lien sécurisé envoyé à {employee_name}")
-                            return True
-                        else:
-                            app.logger.error(f"Erreur envoi lien pour {employee_name}")
-                    else:
-                        app.logger.error(f"Erreur génération lien pour {employee_name}")
-                else:
-                    app.logger.error(f"Traitement non trouvé pour {employee_name}")
-            else:
-                app.logger.error(f"Matricule {matricule} non trouvé en base")
+        # Fiche de quelques pages : sérialisée en mémoire pour la hacher sans relire le fichier
+        pdf_buffer = io.BytesIO()
+        pdf_writer.write(pdf_buffer)
+        pdf_bytes = pdf_buffer.getvalue()
+        with open(staging_path or output_path, 'wb') as output_file:
+            output_file.write(pdf_bytes)
         
-        # Fallback : PDF créé sans envoi
-        #app.logger.info(f"PDF créé pour {employee_name} - pas d'envoi automatique")
-        return True
+        return GeneratedFile(output_path, len(pdf_bytes), hashlib.sha256(pdf_bytes).hexdigest())
         
     except Exception as e:
         app.logger.error(f"Erreur création PDF pour {employee_name}: {str(e)}")
-        return False
+        return None
+
 
-def get_current_traitement(output_dir):
-    """Récupère le traitement actuel basé sur le dossier de sortie"""
+def append_to_individual_pdf(output_path, pages, employee_name, staging_path=None):
+    """Complète un PDF individuel déjà écrit avec de nouvelles pages (mode flux) ; GeneratedFile ou None.
+    
+    Sans staging_path, le fichier est réécrit au même chemin (voir write_individual_pdf).
+    """
+    try:
+        # Relu en mémoire avant d'être réécrit
+        with open(output_path, 'rb') as existing_file:
+            existing_reader = PyPDF2.PdfReader(io.BytesIO(existing_file.read()))
+        existing_pages = list(existing_reader.pages)
+    except Exception as e:
+        app.logger.error(f"Erreur relecture du PDF de {employee_name}: {str(e)}")
+        return None
+    return write_individual_pdf(existing_pages + list(pages), employee_name, output_path, staging_path)
+
+
+def resolve_employees(employee_data):
+    """Résout les employés d'un traitement via l'annuaire en mémoire (aucune requête).
+    
+    Retourne {nom_extrait: (entrée annuaire, trouve_par_matricule)} : le matricule
+    (employé actif) prime, le nom sert de repli comme auparavant.
+    """
+    resolved = {}
+    for employee_name, data in employee_data.items():
+        employee = employee_directory.get_by_matricule(data.get('matricule'))
+        if employee:
+            resolved[employee_name] = (employee, True)
+            continue
+        employee = employee_directory.get_by_name(employee_name)
+        if employee:
+            resolved[employee_name] = (employee, False)
+    return resolved
+
+
+def checkpoint_treatment_results(traitement, employee_data, generated_files, pdfs_generes, metrics=None):
+    """Point de reprise : enregistre un lot d'employés terminés et publie la progression"""
+    links_created = persist_treatment_results(traitement, employee_data, generated_files) if generated_files else 0
+    if metrics:
+        metrics.add('liens_crees', links_created)
+    update_processing_progress(traitement, pdfs_generes=pdfs_generes)
+    if links_created:
+        wake_outbox_senders()
+    return links_created
+
+
+def persist_treatment_results(traitement, employee_data, generated_files):
+    """Enregistre en lot le manifeste (FichierGenere), les TraitementEmploye et DownloadLink d'un traitement.
+    
+    generated_files : {nom_extrait: GeneratedFile du PDF généré}, un lot de
+    PERSISTENCE_BATCH_SIZE employés au plus (process_pdf). Insertions multi-lignes
+    validées en une seule transaction, emails mis en file (email_outbox) compris :
+    un employé présent dans le manifeste est donc entièrement terminé. Si le lot
+    échoue, seul ce lot est annulé ; les lots précédents restent acquis pour la reprise.
+    Retourne le nombre de liens créés.
+    """
+    expiry = datetime.utcnow() + timedelta(days=app.config.get('DOWNLOAD_LINK_EXPIRY_DAYS', 30))
+    max_attempts = app.config.get('MAX_DOWNLOAD_ATTEMPTS', 10)
+    max_email_attempts = app.config.get('EMAIL_MAX_ATTEMPTS', 6)
+    
+    resolved = resolve_employees(employee_data)
+    now = datetime.utcnow()
+    manifest_rows = []
+    treatment_rows = []
+    link_rows = []
+    emails_by_employee = {}
+    for employee_name, generated_file in generated_files.items():
+        output_path = generated_file.chemin
+        data = employee_data[employee_name]
+        manifest_rows.append({
+            'traitement_id': traitement.id,
+            'employe_id': resolved[employee_name][0].id if employee_name in resolved else None,
+            'nom_employe_extrait': employee_name,
+            'matricule_extrait': data['matricule'],
+            'periode': data['period'],
+            'nom_fichier': os.path.basename(output_path),
+            'chemin_fichier': output_path,
+            'taille_fichier': generated_file.taille_fichier,
+            'empreinte_sha256': generated_file.empreinte_sha256,
+            'date_creation': now
+        })
+        if employee_name not in resolved:
+            app.logger.info(f"PDF créé pour {employee_name} - employé inconnu, pas d'envoi automatique")
+            continue
+        employee, found_by_matricule = resolved[employee_name]
+        
+        treatment_rows.append({
+            'traitement_id': traitement.id,
+            'employe_id': employee.id,
+            'matricule_extrait': data['matricule'],
+            'periode_extraite': data['period'],
+            'nom_fichier_genere': os.path.basename(output_path),
+            'email_envoye': False
+        })
+        # Lien sécurisé uniquement si le matricule extrait correspond à un employé actif
+        if found_by_matricule:
+            emails_by_employee[employee.id] = employee.email
+            link_rows.append({
+                'token': secrets.token_urlsafe(32),
+                'employe_id': employee.id,
+                'traitement_id': traitement.id,
+                'nom_fichier': os.path.basename(output_path),
+                'chemin_fichier': output_path,
+                'empreinte_sha256': generated_file.empreinte_sha256,
+                'matricule_requis': data['matricule'],
+                'tentatives_acces': 0,
+                'max_tentatives': max_attempts,
+                'nombre_telechargements': 0,
+                'statut': 'actif',
+                'date_creation': now,
+                'date_expiration': expiry
+            })
+        elif data.get('matricule'):
+            app.logger.error(f"Matricule {data['matricule']} non trouvé en base")
+    
     try:
-        timestamp_folder = os.path.basename(output_dir)
-        return Traitement.query.filter_by(timestamp_folder=timestamp_folder).first()
-    except Exception as e:
-        app.logger.error(f" Erreur récupération traitement: {str(e)}")
-        return None
+        if manifest_rows:
+            db.session.execute(db.insert(FichierGenere), manifest_rows)
+        if treatment_rows:
+            db.session.execute(db.insert(TraitementEmploye), treatment_rows)
+        if link_rows:
+            inserted_links = db.session.execute(
+                db.insert(DownloadLink).returning(DownloadLink.id, DownloadLink.employe_id),
+                link_rows
+            ).all()
+            # Emails mis en file dans la même transaction que leurs liens
+            db.session.execute(db.insert(EmailOutbox), [{
+                'traitement_id': traitement.id,
+                'employe_id': employe_id,
+                'download_link_id': link_id,
+                'destinataire': emails_by_employee[employe_id],
+                'statut': 'en_attente',
+                'tentatives': 0,
+                'max_tentatives': max_email_attempts,
+                'prochaine_tentative': now,
+                'date_creation': now
+            } for link_id, employe_id in inserted_links])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return len(link_rows)
+
 
+def requeue_failed_emails(traitement_id):
+    """Remet en file les emails abandonnés (echec_definitif) d'un traitement, sans commit"""
+    return EmailOutbox.query.filter_by(
+        traitement_id=traitement_id,
+        statut='echec_definitif'
+    ).update({
+        'statut': 'en_attente',
+        'tentatives': 0,
+        'prochaine_tentative': datetime.utcnow(),
+        'verrouille_par': None
+    }, synchronize_session=False)
 
 
+def complete_treatment_deliveries(traitement):
+    """Refait seulement les étapes manquantes d'un traitement fini, à partir de son manifeste.
+    
+    Les fiches déjà générées sont réutilisées telles quelles : chaque fiche sans
+    lien actif dont le matricule correspond (désormais) à un employé actif reçoit
+    un lien et son email en file, et les emails abandonnés sont relancés.
+    Retourne {'liens_crees': n, 'emails_relances': n}.
+    """
+    now = datetime.utcnow()
+    expiry = now + timedelta(days=app.config.get('DOWNLOAD_LINK_EXPIRY_DAYS', 30))
+    active_link = db.and_(
+        DownloadLink.traitement_id == FichierGenere.traitement_id,
+        DownloadLink.nom_fichier == FichierGenere.nom_fichier,
+        DownloadLink.statut == 'actif',
+        DownloadLink.date_expiration > now
+    )
+    recorded = db.and_(
+        TraitementEmploye.traitement_id == FichierGenere.traitement_id,
+        TraitementEmploye.nom_fichier_genere == FichierGenere.nom_fichier
+    )
+    # Manifestes antérieurs au matricule extrait : celui de la fiche enregistrée
+    files_without_link = db.session.query(
+        FichierGenere,
+        db.func.coalesce(FichierGenere.matricule_extrait, TraitementEmploye.matricule_extrait),
+        TraitementEmploye.id
+    ).outerjoin(TraitementEmploye, recorded).outerjoin(DownloadLink, active_link).filter(
+        FichierGenere.traitement_id == traitement.id,
+        DownloadLink.id.is_(None)
+    ).all()
+    
+    employee_directory.ensure_fresh()
+    treatment_rows = []
+    link_rows = []
+    emails_by_employee = {}
+    for generated_file, matricule, traitement_employe_id in files_without_link:
+        employee = employee_directory.get_by_matricule(matricule)
+        if not employee:
+            continue
+        if traitement_employe_id is None:
+            treatment_rows.append({
+                'traitement_id': traitement.id,
+                'employe_id': employee.id,
+                'matricule_extrait': matricule,
+                'periode_extraite': generated_file.periode,
+                'nom_fichier_genere': generated_file.nom_fichier,
+                'email_envoye': False
+            })
+        emails_by_employee[employee.id] = employee.email
+        link_rows.append({
+            'token': secrets.token_urlsafe(32),
+            'employe_id': employee.id,
+            'traitement_id': traitement.id,
+            'nom_fichier': generated_file.nom_fichier,
+            'chemin_fichier': generated_file.chemin_fichier,
+            'empreinte_sha256': generated_file.empreinte_sha256,
+            'matricule_requis': matricule,
+            'tentatives_acces': 0,
+            'max_tentatives': app.config.get('MAX_DOWNLOAD_ATTEMPTS', 10),
+            'nombre_telechargements': 0,
+            'statut': 'actif',
+            'date_creation': now,
+            'date_expiration': expiry
+        })
+    
+    try:
+        if treatment_rows:
+            db.session.execute(db.insert(TraitementEmploye), treatment_rows)
+        if link_rows:
+            inserted_links = db.session.execute(
+                db.insert(DownloadLink).returning(DownloadLink.id, DownloadLink.employe_id),
+                link_rows
+            ).all()
+            db.session.execute(db.insert(EmailOutbox), [{
+                'traitement_id': traitement.id,
+                'employe_id': employe_id,
+                'download_link_id': link_id,
+                'destinataire': emails_by_employee[employe_id],
+                'statut': 'en_attente',
+                'tentatives': 0,
+                'max_tentatives': app.config.get('EMAIL_MAX_ATTEMPTS', 6),
+                'prochaine_tentative': now,
+                'date_creation': now
+            } for link_id, employe_id in inserted_links])
+            record_daily_stats({daily_stats.LIENS_CREES: len(link_rows)})
+        requeued = requeue_failed_emails(traitement.id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    if link_rows or requeued:
+        wake_outbox_senders()
+        invalidate_dashboard_stats()
+    return {'liens_crees': len(link_rows), 'emails_relances': requeued}
+
 
 '''def protect_pdf_with_password(filepath, password):
     """Protège un PDF avec un mot de passe"""
@@ -701,7 +1682,6 @@ def get_current_traitement(output_dir):
         
         # Solution alternative si la première ne fonctionne pas
         try:
-            import shutil
             temp_path = filepath + ".temp"
             
             with pikepdf.open(filepath) as pdf:
@@ -715,53 +1695,36 @@ def get_current_traitement(output_dir):
             app.logger.error(f"Erreur lors de la protection alternative du PDF: {str(e2)}")
 '''
             
-def generate_secure_download_link(employee_record, traitement, file_path, matricule):
-    """Génère un lien de téléchargement sécurisé"""
-    try:
-        # Créer l'enregistrement du lien
-        download_link = DownloadLink(
-            employe_id=employee_record.id,
-            traitement_id=traitement.id,
-            nom_fichier=os.path.basename(file_path),
-            chemin_fichier=file_path,
-            matricule_requis=matricule,
-            max_tentatives=10,  # Configurable
-            date_expiration=datetime.utcnow() + timedelta(days=30)  # 30 jours
-        )
-        
-        db.session.add(download_link)
-        db.session.commit()
-        
-        #app.logger.info(f"Lien sécurisé généré: {download_link.token[:8]}...")
-        return download_link
-        
-    except Exception as e:
-        app.logger.error(f"Erreur génération lien: {str(e)}")
-        db.session.rollback()
-        return None
+def create_smtp_pool(size=None):
+    """Pool de sessions SMTP authentifiées (réutilisées pendant tout un traitement)"""
+    return SMTPConnectionPool(
+        host=GMAIL_CONFIG['smtp_server'],
+        port=GMAIL_CONFIG['smtp_port'],
+        username=GMAIL_CONFIG['username'],
+        password=GMAIL_CONFIG['password'],
+        use_tls=GMAIL_CONFIG.get('use_tls', True),
+        size=size or app.config.get('SMTP_POOL_SIZE', 3),
+        max_messages_per_connection=app.config.get('SMTP_MAX_MESSAGES_PER_CONNECTION', 100),
+        timeout=app.config.get('SMTP_TIMEOUT_SEC', 30),
+        logger=app.logger
+    )
 
-def send_email_with_secure_link(employee_name, email, download_link):
-    """Envoie un email avec lien de téléchargement sécurisé"""
-    try:
-        from email_config import GMAIL_CONFIG
-        
-        # Configuration SMTP
-        smtp_server = GMAIL_CONFIG['smtp_server']
-        smtp_port = GMAIL_CONFIG['smtp_port']
-        smtp_username = GMAIL_CONFIG['username']
-        smtp_password = GMAIL_CONFIG['password']
-        
-        # URL de téléchargement
-        download_url = f"http://91.160.69.7:5000/download/{download_link.token}"
-        
-        # Création du message
-        msg = MIMEMultipart()
-        msg['From'] = smtp_username
-        msg['To'] = email
-        msg['Subject'] = f"Votre fiche de paie - {employee_name}"
-        
-        # Corps du message avec lien sécurisé
-        body = f"""
+
+def build_secure_link_email(employee_name, email, download_link):
+    """Construit l'email avec lien de téléchargement sécurisé, retourne (expéditeur, message)"""
+    smtp_username = GMAIL_CONFIG['username']
+    
+    # URL de téléchargement
+    download_url = f"http://91.160.69.7:5000/download/{download_link.token}"
+    
+    # Création du message
+    msg = MIMEMultipart()
+    msg['From'] = smtp_username
+    msg['To'] = email
+    msg['Subject'] = f"Votre fiche de paie - {employee_name}"
+    
+    # Corps du message avec lien sécurisé
+    body = f"""
 Bonjour {employee_name},
 
 Votre fiche de paie est disponible au téléchargement sécurisé.
@@ -781,25 +1744,138 @@ Pour toute question, contactez les ressources humaines.
 Cordialement,
 L'équipe RH
 """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Envoi du message
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        text = msg.as_string()
-        server.sendmail(smtp_username, email, text)
-        server.quit()
-        
-        #app.logger.info(f"Email avec lien sécurisé envoyé à {employee_name}")
-        return True
-        
-    except Exception as e:
-        app.logger.error(f" Erreur envoi email: {str(e)}")
-        return False
+    
+    msg.attach(MIMEText(body, 'plain'))
+    return smtp_username, msg.as_string()
+
+
+# ---- Envoi des fichiers PDF ----
+# En mode x-accel-redirect / x-sendfile, les routes ne font que les contrôles
+# (jeton, matricule, traitement) : le proxy frontal envoie les octets et le
+# worker Flask est libéré immédiatement.
+# Téléchargements conditionnels et reprises : ETag fort (SHA-256 calculé à la
+# génération), If-None-Match / If-Modified-Since -> 304, Range -> 206.
+
+class _CompletionTrackingBody:
+    """Corps de réponse qui appelle on_complete() une fois `expected` octets envoyés.
+
+    Si le client coupe la connexion, le serveur WSGI arrête l'itération et
+    appelle close() : le téléchargement n'est pas compté.
+    """
+    
+    def __init__(self, body, expected, on_complete):
+        self.body = body
+        self.expected = expected
+        self.on_complete = on_complete
+    
+    def __iter__(self):
+        sent = 0
+        for chunk in self.body:
+            sent += len(chunk)
+            yield chunk
+        if sent == self.expected:
+            try:
+                self.on_complete()
+            except Exception as e:
+                app.logger.error(f"Erreur comptage téléchargement: {str(e)}")
+    
+    def close(self):
+        if hasattr(self.body, 'close'):
+            self.body.close()
+
 
+def record_completed_download(download_link_id):
+    """Callback : +1 téléchargement (incrément atomique, hors contexte de requête)"""
+    def on_complete():
+        with app.app_context():
+            try:
+                DownloadLink.query.filter_by(id=download_link_id).update(
+                    {'nombre_telechargements': DownloadLink.nombre_telechargements + 1},
+                    synchronize_session=False
+                )
+                record_daily_stats({daily_stats.TELECHARGEMENTS: 1})
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        invalidate_dashboard_stats()
+    return on_complete
+
+
+def stored_file_digest(timestamp, filename):
+    """Empreinte SHA-256 enregistrée à la génération d'un fichier (None si inconnue)"""
+    return db.session.query(DownloadLink.empreinte_sha256).join(
+        Traitement, DownloadLink.traitement_id == Traitement.id
+    ).filter(
+        Traitement.timestamp_folder == timestamp,
+        DownloadLink.nom_fichier == filename
+    ).limit(1).scalar()
+
+
+def serve_payslip_file(file_path, download_name, etag=None, on_complete=None):
+    """Réponse de téléchargement d'un PDF selon FILE_SERVING_MODE.
+    
+    etag : empreinte SHA-256 du fichier ; sans elle, werkzeug dérive un ETag
+    de la date et de la taille. on_complete() est appelé quand le client a reçu
+    le fichier entier en une réponse (200, ou 206 couvrant tout le fichier) :
+    jamais pour une plage partielle (fin du fichier comprise, « bytes=-N » des
+    lecteurs PDF), ni un 304. Un fichier reçu en plusieurs plages n'est donc pas
+    compté. En mode proxy (x-accel-redirect / x-sendfile), rien n'est compté :
+    l'application ne voit pas les octets envoyés par le proxy.
+    """
+    file_path = os.path.abspath(file_path)
+    mode = app.config.get('FILE_SERVING_MODE', 'direct')
     
+    if mode in ('x-accel-redirect', 'x-sendfile'):
+        output_root = os.path.abspath(app.config['OUTPUT_FOLDER'])
+        if os.path.commonpath([output_root, file_path]) != output_root:
+            # Le proxy ne sert que le dossier de sortie
+            app.logger.warning(f"Fichier hors de {output_root}, envoi direct: {file_path}")
+            mode = 'direct'
+    
+    if mode == 'direct':
+        response = send_file(file_path, as_attachment=True, download_name=download_name,
+                             etag=etag or True, conditional=True)
+        if on_complete is None or request.method == 'HEAD':
+            return response
+        content_range = response.content_range
+        if response.status_code == 200 or (
+            response.status_code == 206 and content_range
+            and content_range.start == 0 and content_range.stop == content_range.length
+        ):
+            response.response = _CompletionTrackingBody(response.response, response.content_length, on_complete)
+        return response
+    
+    # Le proxy gère lui-même les plages : seuls les en-têtes conditionnels sont traités ici.
+    # En-têtes (type, Content-Disposition, ETag...) calculés par werkzeug, sans corps.
+    environ = dict(request.environ)
+    environ.pop('HTTP_RANGE', None)
+    environ.pop('HTTP_IF_RANGE', None)
+    response = werkzeug_send_file(
+        file_path,
+        environ,
+        as_attachment=True,
+        download_name=download_name,
+        etag=etag or True,
+        conditional=True,
+        use_x_sendfile=True,
+        response_class=app.response_class
+    )
+    if response.status_code == 304:
+        return response
+    
+    if mode == 'x-accel-redirect':
+        del response.headers['X-Sendfile']
+        relative_path = os.path.relpath(file_path, os.path.abspath(app.config['OUTPUT_FOLDER']))
+        accel_prefix = app.config.get('FILE_SERVING_ACCEL_PREFIX', '/protected-output').rstrip('/')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix}/{url_quote(relative_path.replace(os.sep, '/'))}"
+        response.content_length = 0
+    
+    # Pas de comptage ici : à ce stade le proxy n'a encore rien envoyé, et un transfert
+    # interrompu serait compté comme un téléchargement
+    return response
+
+
 @app.route('/download/<token>')
 def secure_download_page(token):
     """Page de téléchargement sécurisé"""
@@ -843,7 +1919,9 @@ def verify_and_download(token):
         download_link.adresse_ip_derniere = client_ip
         
         if matricule_saisi != download_link.matricule_requis:
+            record_daily_stats({daily_stats.ACCES_REFUSES: 1})
             db.session.commit()
+            invalidate_dashboard_stats()
             app.logger.error(f"🚨 ÉCHEC D'AUTHENTIFICATION - Token: {token[:8]}...")
             remaining = download_link.max_tentatives - download_link.tentatives_acces
             
@@ -856,9 +1934,14 @@ def verify_and_download(token):
         # Log succès
         app.logger.info(f"✅ TÉLÉCHARGEMENT AUTORISÉ - Employé: {download_link.employee.nom_employe}")
         
-        download_link.nombre_telechargements += 1
-        download_link.derniere_date_telechargement = datetime.utcnow()
+        # Autorisation enregistrée ici ; le téléchargement n'est compté qu'une fois le fichier entièrement reçu
+        now = datetime.utcnow()
+        if download_link.date_premier_acces is None:
+            download_link.date_premier_acces = now
+        download_link.date_dernier_acces = now
+        record_daily_stats({daily_stats.ACCES_AUTORISES: 1})
         db.session.commit()
+        invalidate_dashboard_stats()
         
         if not os.path.exists(download_link.chemin_fichier):
             return jsonify({
@@ -890,15 +1973,18 @@ def download_file_direct(token):
     try:
         download_link = DownloadLink.query.filter_by(token=token).first()
         
-        if not download_link or download_link.nombre_telechargements == 0:
+        if not download_link or not download_link.is_authorized:
             return "Téléchargement non autorisé", 403
         
         if not os.path.exists(download_link.chemin_fichier):
             return "Fichier non trouvé", 404
         
-        return send_file(download_link.chemin_fichier, 
-                        as_attachment=True, 
-                        download_name=download_link.nom_fichier)
+        return serve_payslip_file(
+            download_link.chemin_fichier,
+            download_link.nom_fichier,
+            etag=download_link.empreinte_sha256,
+            on_complete=record_completed_download(download_link.id)
+        )
         
     except Exception as e:
         app.logger.error(f"❌ Erreur téléchargement direct: {str(e)}")
@@ -919,7 +2005,7 @@ def download_success():
     
     # Vérifier que le lien existe et a été utilisé
     download_link = DownloadLink.query.filter_by(token=token).first()
-    if not download_link or download_link.nombre_telechargements == 0:
+    if not download_link or not download_link.is_authorized:
         return redirect(url_for('index'))
     
     return render_template('download_success.html',
@@ -995,89 +2081,29 @@ def dashboard():
         # Top employés (sans graphique)
         top_employees = get_employee_top_stats()
         
-        # Derniers traitements (PostgreSQL prioritaire)
-        treatments = get_treatments_from_db()
-        if not treatments:
-            treatments = get_treatments_from_filesystem()
-            for treatment in treatments:
-                treatment['source'] = 'Filesystem'
-        
-        # Limiter à 10 pour performance
-        treatments = treatments[:10]
+        # Historique des traitements, 10 par page (pagination par clé, voir get_treatments_page).
+        # Traitements antérieurs à la base : les importer avec sync_filesystem_to_db.py
+        cursor = request.args.get('avant')
+        if cursor:
+            treatments, next_cursor = get_treatments_page(cursor, limit=10)
+        else:
+            treatments, next_cursor = dashboard_cache.get_or_compute(
+                'dashboard:treatments', lambda: get_treatments_page(limit=10)
+            )
         
         return render_template('dashboard.html', 
                              stats_v12=stats_v12,
                              recent_activity=recent_activity,
                              top_employees=top_employees,
-                             treatments=treatments)
+                             treatments=treatments,
+                             next_cursor=next_cursor,
+                             is_first_page=not cursor)
         
     except Exception as e:
         flash(f'Erreur dashboard: {str(e)}', 'error')
         return redirect(url_for('index'))
 
 
-def get_treatments_from_filesystem():
-    """Votre ancienne fonction pour compatibilité"""
-    treatments = []
-    uploads_path = app.config['UPLOAD_FOLDER']
-    output_path = app.config['OUTPUT_FOLDER']
-    
-    if os.path.exists(uploads_path):
-        for folder in os.listdir(uploads_path):
-            folder_path = os.path.join(uploads_path, folder)
-            if os.path.isdir(folder_path):
-                treatment_info = analyze_treatment_folder(folder, folder_path, output_path)
-                if treatment_info:
-                    treatments.append(treatment_info)
-    
-    treatments.sort(key=lambda x: x['timestamp'], reverse=True)
-    return treatments
-
-
-def analyze_treatment_folder(folder_name, upload_path, output_path):
-    """Analyse un dossier de traitement pour extraire les statistiques"""
-    try:
-        from datetime import datetime
-        
-        # Parse du timestamp
-        timestamp_str = folder_name
-        try:
-            timestamp = datetime.strptime(timestamp_str, '%Y%m%d%H%M%S')
-        except ValueError:
-            return None
-        
-        # Fichier original
-        original_files = [f for f in os.listdir(upload_path) if f.endswith('.pdf')]
-        original_file = original_files[0] if original_files else 'Inconnu'
-        
-        # Dossier de sortie correspondant
-        output_folder_path = os.path.join(output_path, folder_name)
-        
-        # Comptage des PDFs générés
-        generated_files = []
-        if os.path.exists(output_folder_path):
-            generated_files = [f for f in os.listdir(output_folder_path) if f.endswith('.pdf')]
-        
-        # Calcul de la taille du fichier original
-        original_file_path = os.path.join(upload_path, original_file)
-        file_size = 0
-        if os.path.exists(original_file_path):
-            file_size = os.path.getsize(original_file_path)
-        
-        return {
-            'timestamp': timestamp,
-            'timestamp_str': timestamp_str,
-            'date_formatted': timestamp.strftime('%d/%m/%Y à %H:%M:%S'),
-            'original_file': original_file,
-            'file_size': format_file_size(file_size),
-            'employees_count': len(generated_files),
-            'generated_files': generated_files,
-            'status': 'Réussi' if generated_files else 'Échec'
-        }
-        
-    except Exception as e:
-        return None
-
 def calculate_global_stats(treatments):
     """Calcule les statistiques globales"""
     if not treatments:
@@ -1116,10 +2142,10 @@ from flask import send_file
 def download_file(timestamp, filename):
     """Permet de télécharger un fichier PDF généré"""
     try:
-        file_path = os.path.join(app.config['OUTPUT_FOLDER'], timestamp, filename)
+        file_path = safe_join(app.config['OUTPUT_FOLDER'], timestamp, filename)
         
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True, download_name=filename)
+        if file_path and os.path.isfile(file_path):
+            return serve_payslip_file(file_path, filename, etag=stored_file_digest(timestamp, filename))
         else:
             flash('Fichier non trouvé', 'error')
             return redirect(url_for('dashboard'))
@@ -1140,25 +2166,25 @@ def cleanup_files():
         # Nettoyage des uploads
         if os.path.exists(app.config['UPLOAD_FOLDER']):
             for folder in os.listdir(app.config['UPLOAD_FOLDER']):
-                try:
-                    folder_date = datetime.strptime(folder, '%Y%m%d%H%M%S')
-                    if folder_date < cutoff_date:
-                        import shutil
-                        shutil.rmtree(os.path.join(app.config['UPLOAD_FOLDER'], folder))
-                        deleted_folders += 1
-                except ValueError:
+                folder_date = parse_timestamp_folder(folder)
+                if folder_date is None:
                     continue  # Ignore les dossiers qui ne correspondent pas au format
+                if folder_date < cutoff_date:
+                    shutil.rmtree(os.path.join(app.config['UPLOAD_FOLDER'], folder))
+                    deleted_folders += 1
         
         # Nettoyage des outputs
         if os.path.exists(app.config['OUTPUT_FOLDER']):
             for folder in os.listdir(app.config['OUTPUT_FOLDER']):
-                try:
-                    folder_date = datetime.strptime(folder, '%Y%m%d%H%M%S')
-                    if folder_date < cutoff_date:
-                        import shutil
-                        shutil.rmtree(os.path.join(app.config['OUTPUT_FOLDER'], folder))
-                except ValueError:
+                folder_date = parse_timestamp_folder(folder)
+                if folder_date is None:
                     continue
+                if folder_date < cutoff_date:
+                    shutil.rmtree(os.path.join(app.config['OUTPUT_FOLDER'], folder))
+        
+        if deleted_folders:
+            record_daily_stats({daily_stats.DOSSIERS_SUPPRIMES: deleted_folders})
+            db.session.commit()
         
         flash(f'Nettoyage terminé ! {deleted_folders} dossier(s) supprimé(s) (+ de 30 jours)', 'success')
         return redirect(url_for('dashboard'))
@@ -1169,9 +2195,13 @@ def cleanup_files():
     
 # Nouvelles fonctions pour dashboard PostgreSQL
 def calculate_stats_from_db():
-    """Calcule les statistiques depuis PostgreSQL"""
+    """Calcule les statistiques depuis les compteurs journaliers (aucun parcours de l'historique)"""
     try:
-        total_treatments = Traitement.query.count()
+        totals = daily_totals([
+            daily_stats.TRAITEMENTS_CREES, daily_stats.TRAITEMENTS_TERMINES,
+            daily_stats.FICHES_GENEREES, daily_stats.FICHES_TRAITEMENTS_TERMINES
+        ])
+        total_treatments = totals[daily_stats.TRAITEMENTS_CREES]
         if total_treatments == 0:
             return {
                 'total_treatments': 0,
@@ -1181,17 +2211,14 @@ def calculate_stats_from_db():
                 'last_treatment': None
             }
         
-        successful_treatments = Traitement.query.filter_by(statut='termine').all()
-        total_employees = sum(t.nombre_employes_traites for t in Traitement.query.all())
-        total_files = sum(t.nombre_employes_traites for t in successful_treatments)
-        
-        last_treatment = Traitement.query.order_by(Traitement.date_creation.desc()).first()
+        last_treatment = db.session.query(Traitement.date_creation).order_by(Traitement.date_creation.desc()).first()
         
         return {
             'total_treatments': total_treatments,
-            'total_employees': total_employees,
-            'total_files_generated': total_files,
-            'success_rate': round(len(successful_treatments) / total_treatments * 100, 1) if total_treatments > 0 else 0,
+            # Comme avant les compteurs : employés de tous les traitements, fiches des traitements terminés
+            'total_employees': totals[daily_stats.FICHES_GENEREES],
+            'total_files_generated': totals[daily_stats.FICHES_TRAITEMENTS_TERMINES],
+            'success_rate': round(totals[daily_stats.TRAITEMENTS_TERMINES] / total_treatments * 100, 1) if total_treatments > 0 else 0,
             'last_treatment': last_treatment.date_creation.strftime('%d/%m/%Y à %H:%M:%S') if last_treatment else None
         }
         
@@ -1205,19 +2232,46 @@ def calculate_stats_from_db():
             'last_treatment': None
         }
 
-def get_treatments_from_db():
-    """Récupère les traitements depuis PostgreSQL"""
+def encode_history_cursor(date_creation, traitement_id):
+    """Position d'un traitement dans l'historique (date de création, id)"""
+    return f"{date_creation.isoformat()}_{traitement_id}"
+
+
+def decode_history_cursor(cursor):
     try:
-        treatments = []
-        db_treatments = Traitement.query.order_by(Traitement.date_creation.desc()).all()
+        date_part, id_part = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_treatments_page(cursor=None, limit=10):
+    """Une page de l'historique (plus récents d'abord) et le curseur de la page suivante.
+    
+    Pagination par clé sur (date_creation, id) : chaque page coûte `limit` lignes
+    d'index, quelle que soit sa profondeur. Le nombre de fiches vient du
+    manifeste (fichiers_generes), sans lister les dossiers de sortie.
+    """
+    try:
+        query = Traitement.query
+        position = decode_history_cursor(cursor) if cursor else None
+        if position:
+            query = query.filter(db.tuple_(Traitement.date_creation, Traitement.id) < position)
+        db_treatments = query.order_by(
+            Traitement.date_creation.desc(), Traitement.id.desc()
+        ).limit(limit + 1).all()
+        
+        has_more = len(db_treatments) > limit
+        db_treatments = db_treatments[:limit]
+        
+        generated_counts = dict(db.session.query(
+            FichierGenere.traitement_id, func.count(FichierGenere.id)
+        ).filter(
+            FichierGenere.traitement_id.in_([treatment.id for treatment in db_treatments])
+        ).group_by(FichierGenere.traitement_id).all()) if db_treatments else {}
         
+        treatments = []
         for treatment in db_treatments:
-            # Récupération des fichiers générés depuis le filesystem
-            output_folder_path = os.path.join(app.config['OUTPUT_FOLDER'], treatment.timestamp_folder)
-            generated_files = []
-            if os.path.exists(output_folder_path):
-                generated_files = [f for f in os.listdir(output_folder_path) if f.endswith('.pdf')]
-            
             treatments.append({
                 'timestamp': treatment.date_creation,
                 'timestamp_str': treatment.timestamp_folder,
@@ -1225,16 +2279,20 @@ def get_treatments_from_db():
                 'original_file': treatment.fichier_original,
                 'file_size': format_file_size(treatment.taille_fichier),
                 'employees_count': treatment.nombre_employes_traites,
-                'generated_files': generated_files,
+                'generated_count': generated_counts.get(treatment.id, 0),
                 'status': 'Réussi' if treatment.statut == 'termine' else 'Échec',
                 'source': 'PostgreSQL'
             })
         
-        return treatments
+        next_cursor = None
+        if has_more:
+            last = db_treatments[-1]
+            next_cursor = encode_history_cursor(last.date_creation, last.id)
+        return treatments, next_cursor
         
     except Exception as e:
         app.logger.error(f"Erreur récupération traitements DB: {str(e)}")
-        return []
+        return [], None
 
 
 # Routes pour la gestion des employés
@@ -1247,33 +2305,25 @@ def admin_dashboard():
 def manage_employees():
     """Interface de gestion des employés"""
     try:
-        # Pagination pour de gros volumes
-        page = request.args.get('page', 1, type=int)
+        # Pagination par clé (curseurs apres / avant) pour de gros volumes
         search = request.args.get('search', '', type=str)
         
-        # Construction de la requête
+        # Construction de la requête (recherche indexée, voir employee_search.py)
         query = Employee.query
         
-        if search:
-            query = query.filter(
-                db.or_(
-                    Employee.nom_employe.ilike(f'%{search}%'),
-                    Employee.email.ilike(f'%{search}%'),
-                    Employee.matricule.ilike(f'%{search}%')
-                )
-            )
+        condition = search_condition(search)
+        if condition is not None:
+            query = query.filter(condition)
         
-        employees = query.order_by(Employee.nom_employe.asc()).paginate(
-            page=page, per_page=20, error_out=False
+        employees = keyset_page(
+            query,
+            after=request.args.get('apres'),
+            before=request.args.get('avant'),
+            per_page=20
         )
         
-        # Statistiques rapides
-        stats = {
-            'total_employees': Employee.query.count(),
-            'active_employees': Employee.query.filter_by(statut='actif').count(),
-            'pdf_imported': Employee.query.filter_by(source_creation='pdf_import').count(),
-            'manual_added': Employee.query.filter_by(source_creation='manual').count()
-        }
+        # Statistiques rapides (une requête)
+        stats = employee_counts()
         
         return render_template('admin/manage_employees.html', 
                              employees=employees, 
@@ -1318,7 +2368,10 @@ def add_employee():
             )
             
             db.session.add(new_employee)
+            directory_changes = employee_directory.stage_changes([new_employee])
             db.session.commit()
+            employee_directory.apply(directory_changes)
+            invalidate_dashboard_stats()
             
             flash(f'Employé {nom_employe} ajouté avec succès', 'success')
             return redirect(url_for('manage_employees'))
@@ -1329,6 +2382,51 @@ def add_employee():
     
     return render_template('admin/add_employee.html')
 
+# Erreurs affichées après un import (le CLI migrate_csv_to_db.py écrit le rapport complet)
+IMPORT_ERRORS_DISPLAYED = 500
+
+
+@app.route('/admin/employees/import', methods=['GET', 'POST'])
+def import_employees():
+    """Import en masse d'employés depuis un CSV (matricule, nom_employe, email, statut)"""
+    if request.method == 'POST':
+        uploaded = request.files.get('fichier')
+        on_conflict = request.form.get('conflit', 'mettre_a_jour')
+        if not uploaded or not uploaded.filename:
+            flash('Aucun fichier sélectionné', 'error')
+            return render_template('admin/import_employees.html')
+        
+        try:
+            # Lecture en flux du fichier envoyé (utf-8-sig : BOM des exports Excel)
+            text_stream = io.TextIOWrapper(uploaded.stream, encoding='utf-8-sig', newline='')
+            report = import_employees_csv(
+                text_stream,
+                on_conflict=on_conflict,
+                batch_size=app.config.get('EMPLOYEE_IMPORT_BATCH_SIZE', 1000),
+                before_commit=lambda: employee_directory.stage_changes([])
+            )
+            
+        except (ValueError, UnicodeDecodeError) as e:
+            db.session.rollback()
+            flash(f'Fichier invalide : {str(e)}', 'error')
+            return render_template('admin/import_employees.html')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Erreur lors de l\'import : {str(e)}', 'error')
+            return render_template('admin/import_employees.html')
+        finally:
+            # Lots déjà validés : l'annuaire en mémoire est rechargé dans tous les cas
+            employee_directory.invalidate()
+            invalidate_dashboard_stats()
+        
+        app.logger.info(f"Import CSV {uploaded.filename}: {report!r}")
+        return render_template('admin/import_employees.html',
+                             report=report,
+                             errors=report.erreurs[:IMPORT_ERRORS_DISPLAYED],
+                             filename=uploaded.filename)
+    
+    return render_template('admin/import_employees.html')
+
 @app.route('/admin/employees/<int:employee_id>/edit', methods=['GET', 'POST'])
 def edit_employee(employee_id):
     """Modifier un employé existant avec restrictions selon la source"""
@@ -1362,7 +2460,10 @@ def edit_employee(employee_id):
                 employee.statut = statut
                 employee.date_derniere_maj = datetime.utcnow()
                 
+                directory_changes = employee_directory.stage_changes([employee])
                 db.session.commit()
+                employee_directory.apply(directory_changes)
+                invalidate_dashboard_stats()
                 flash(f'Email et statut mis à jour pour {employee.nom_employe} (importé PDF)', 'success')
                 
             else:
@@ -1403,7 +2504,10 @@ def edit_employee(employee_id):
                 employee.statut = statut
                 employee.date_derniere_maj = datetime.utcnow()
                 
+                directory_changes = employee_directory.stage_changes([employee])
                 db.session.commit()
+                employee_directory.apply(directory_changes)
+                invalidate_dashboard_stats()
                 flash(f'Employé {nom_employe} modifié avec succès', 'success')
             
             return redirect(url_for('manage_employees'))
@@ -1424,7 +2528,10 @@ def delete_employee(employee_id):
         employee.statut = 'supprime'
         employee.date_derniere_maj = datetime.utcnow()
         
+        directory_changes = employee_directory.stage_changes([employee])
         db.session.commit()
+        employee_directory.apply(directory_changes)
+        invalidate_dashboard_stats()
         
         flash(f'Employé {employee.nom_employe} supprimé', 'success')
         
@@ -1435,151 +2542,219 @@ def delete_employee(employee_id):
     return redirect(url_for('manage_employees'))
 
 
+def csv_export_response(export_name):
+    """Réponse CSV en flux pour un export de csv_export.EXPORTS, filtrée par ?du=&au= (AAAA-MM-JJ)"""
+    export = EXPORTS[export_name]
+    date_from = request.args.get('du', '')
+    date_to = request.args.get('au', '')
+    start, end = parse_date_range(date_from, date_to)
+    
+    period = f"_{date_from or 'debut'}_{date_to or 'fin'}" if (date_from or date_to) else ''
+    filename = f'{export.filename}{period}_{datetime.now().strftime("%Y%m%d")}.csv'
+    
+    # stream_with_context : la session de base reste ouverte pendant l'envoi
+    return Response(
+        stream_with_context(stream_csv(export.header, export_rows(export, start, end))),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 @app.route('/admin/employees/export')
 def export_employees():
     """Exporter la liste des employés en CSV"""
     try:
-        import io
-        import csv
-        
-        # Créer le CSV en mémoire
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # En-têtes
-        writer.writerow(['Matricule', 'Nom', 'Email', 'Statut', 'Source', 'Date création'])
-        
-        # Données
-        employees = Employee.query.order_by(Employee.nom_employe.asc()).all()
-        for emp in employees:
-            writer.writerow([
-                emp.matricule or '',
-                emp.nom_employe,
-                emp.email,
-                emp.statut,
-                emp.source_creation,
-                emp.date_creation.strftime('%d/%m/%Y %H:%M')
-            ])
-        
-        # Préparation du téléchargement
-        output.seek(0)
-        
-        from flask import make_response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=employes_payflow_{datetime.now().strftime("%Y%m%d")}.csv'
-        
-        return response
+        return csv_export_response('employes')
         
     except Exception as e:
         flash(f'Erreur lors de l\'export : {str(e)}', 'error')
         return redirect(url_for('manage_employees'))
 
+
+@app.route('/admin/exports')
+def exports_page():
+    """Choix d'un export CSV et de sa période"""
+    return render_template('admin/exports.html', exports=EXPORTS)
+
+
+@app.route('/admin/exports/<export_name>')
+def export_csv(export_name):
+    """Export CSV en flux (employés, traitements, fiches, liens) sur une période"""
+    if export_name not in EXPORTS:
+        flash('Export inconnu', 'error')
+        return redirect(url_for('exports_page'))
+    try:
+        return csv_export_response(export_name)
+        
+    except ValueError:
+        flash('Dates invalides (format attendu : AAAA-MM-JJ)', 'error')
+        return redirect(url_for('exports_page'))
+    except Exception as e:
+        flash(f'Erreur lors de l\'export : {str(e)}', 'error')
+        return redirect(url_for('exports_page'))
+
 # Nouvelles fonctions pour dashboard enrichi v1.2
 from sqlalchemy import func, and_, or_
 from datetime import datetime, timedelta
 
 def get_v12_dashboard_stats():
-    """Statistiques complètes pour dashboard v1.2"""
+    """Statistiques complètes pour dashboard v1.2 (cache court, voir dashboard_cache)"""
     try:
-        now = datetime.utcnow()
-        last_30_days = now - timedelta(days=30)
-        last_7_days = now - timedelta(days=7)
-        
-        # Statistiques générales
-        stats = {
-            # Traitements
-            'total_treatments': Traitement.query.count(),
-            'treatments_last_30_days': Traitement.query.filter(Traitement.date_creation >= last_30_days).count(),
-            'treatments_last_7_days': Traitement.query.filter(Traitement.date_creation >= last_7_days).count(),
-            'successful_treatments': Traitement.query.filter_by(statut='termine').count(),
-            'failed_treatments': Traitement.query.filter_by(statut='echec').count(),
-            
-            # Employés
-            'total_employees': Employee.query.count(),
-            'active_employees': Employee.query.filter_by(statut='actif').count(),
-            'pdf_imported_employees': Employee.query.filter_by(source_creation='pdf_import').count(),
-            'manual_employees': Employee.query.filter_by(source_creation='manual').count(),
-            
-            # Liens de téléchargement
-            'total_download_links': DownloadLink.query.count(),
-            'active_links': DownloadLink.query.filter_by(statut='actif').count(),
-            'expired_links': DownloadLink.query.filter(DownloadLink.date_expiration < now).count(),
-            'total_downloads': db.session.query(func.sum(DownloadLink.nombre_telechargements)).scalar() or 0,
-            
-            # Sécurité
-            'blocked_attempts': DownloadLink.query.filter(DownloadLink.tentatives_acces >= DownloadLink.max_tentatives).count(),
-            'links_with_attempts': DownloadLink.query.filter(DownloadLink.tentatives_acces > 0).count(),
-        }
-        
-        # Calculs dérivés
-        stats['success_rate'] = round(
-            (stats['successful_treatments'] / stats['total_treatments'] * 100) if stats['total_treatments'] > 0 else 0, 1
-        )
-        
-        stats['security_rate'] = round(
-            ((stats['active_links'] - stats['blocked_attempts']) / stats['active_links'] * 100) if stats['active_links'] > 0 else 100, 1
-        )
-        
-        return stats
-        
+        return dashboard_cache.get_or_compute('dashboard:stats', compute_v12_dashboard_stats)
     except Exception as e:
         app.logger.error(f" Erreur calcul stats v1.2: {str(e)}")
         return {}
 
 
+def compute_v12_dashboard_stats():
+    """Traitements depuis les compteurs journaliers ; employés et liens (état courant)
+    en une requête d'agrégats conditionnels (COUNT(*) FILTER (WHERE ...)) par table"""
+    now = datetime.utcnow()
+    
+    # Traitements : O(jours) lignes de statistiques_journalieres
+    treatment_totals = daily_totals([
+        daily_stats.TRAITEMENTS_CREES, daily_stats.TRAITEMENTS_TERMINES, daily_stats.TRAITEMENTS_ECHEC
+    ])
+    recent_created = db.session.query(
+        func.coalesce(func.sum(StatistiqueJournaliere.valeur).filter(
+            StatistiqueJournaliere.jour >= (now - timedelta(days=30)).date()), 0),
+        func.coalesce(func.sum(StatistiqueJournaliere.valeur).filter(
+            StatistiqueJournaliere.jour >= (now - timedelta(days=7)).date()), 0),
+    ).filter(StatistiqueJournaliere.metrique == daily_stats.TRAITEMENTS_CREES).one()
+    
+    # Employés
+    employees = employee_counts()
+    
+    # Liens de téléchargement et sécurité
+    link_counts = db.session.query(
+        func.count(DownloadLink.id),
+        func.count(DownloadLink.id).filter(DownloadLink.statut == 'actif'),
+        func.count(DownloadLink.id).filter(DownloadLink.date_expiration < now),
+        func.coalesce(func.sum(DownloadLink.nombre_telechargements), 0),
+        func.count(DownloadLink.id).filter(DownloadLink.tentatives_acces >= DownloadLink.max_tentatives),
+        func.count(DownloadLink.id).filter(DownloadLink.tentatives_acces > 0),
+    ).one()
+    
+    stats = {
+        # Traitements
+        'total_treatments': treatment_totals[daily_stats.TRAITEMENTS_CREES],
+        'treatments_last_30_days': int(recent_created[0]),
+        'treatments_last_7_days': int(recent_created[1]),
+        'successful_treatments': treatment_totals[daily_stats.TRAITEMENTS_TERMINES],
+        'failed_treatments': treatment_totals[daily_stats.TRAITEMENTS_ECHEC],
+        
+        # Employés
+        'total_employees': employees['total_employees'],
+        'active_employees': employees['active_employees'],
+        'pdf_imported_employees': employees['pdf_imported'],
+        'manual_employees': employees['manual_added'],
+        
+        # Liens de téléchargement
+        'total_download_links': link_counts[0],
+        'active_links': link_counts[1],
+        'expired_links': link_counts[2],
+        'total_downloads': int(link_counts[3] or 0),
+        
+        # Sécurité
+        'blocked_attempts': link_counts[4],
+        'links_with_attempts': link_counts[5],
+    }
+    
+    # Calculs dérivés
+    stats['success_rate'] = round(
+        (stats['successful_treatments'] / stats['total_treatments'] * 100) if stats['total_treatments'] > 0 else 0, 1
+    )
+    
+    stats['security_rate'] = round(
+        ((stats['active_links'] - stats['blocked_attempts']) / stats['active_links'] * 100) if stats['active_links'] > 0 else 100, 1
+    )
+    
+    return stats
+
+
 def get_employee_top_stats():
     """Top 10 des employés par nombre de fiches reçues"""
     try:
-        top_employees = db.session.query(
-            Employee.nom_employe,
-            func.count(TraitementEmploye.id).label('nb_fiches')
-        ).join(
-            TraitementEmploye
-        ).group_by(
-            Employee.id, Employee.nom_employe
-        ).order_by(
-            func.count(TraitementEmploye.id).desc()
-        ).limit(10).all()
-        
-        return [
-            {
-                'name': emp.nom_employe,
-                'count': emp.nb_fiches
-            }
-            for emp in top_employees
-        ]
-        
+        return dashboard_cache.get_or_compute('dashboard:top_employees', compute_employee_top_stats)
     except Exception as e:
         app.logger.error(f" Erreur top employés: {str(e)}")
         return []
+
+
+def compute_employee_top_stats():
+    # Agrégat sur traitement_employes seul, puis jointure sur les 10 lignes retenues
+    top_counts = db.session.query(
+        TraitementEmploye.employe_id,
+        func.count(TraitementEmploye.id).label('nb_fiches')
+    ).group_by(
+        TraitementEmploye.employe_id
+    ).order_by(
+        func.count(TraitementEmploye.id).desc()
+    ).limit(10).subquery()
+    
+    top_employees = db.session.query(
+        Employee.nom_employe,
+        top_counts.c.nb_fiches
+    ).join(
+        top_counts, top_counts.c.employe_id == Employee.id
+    ).order_by(
+        top_counts.c.nb_fiches.desc()
+    ).all()
+    
+    return [
+        {
+            'name': emp.nom_employe,
+            'count': emp.nb_fiches
+        }
+        for emp in top_employees
+    ]
     
 
 def get_recent_activity():
     """Activité récente (dernières 24h)"""
     try:
-        last_24h = datetime.utcnow() - timedelta(hours=24)
-        
-        # Derniers traitements
-        recent_treatments = Traitement.query.filter(
-            Traitement.date_creation >= last_24h
-        ).order_by(Traitement.date_creation.desc()).limit(5).all()
-        
-        # Derniers téléchargements
-        recent_downloads = DownloadLink.query.filter(
-            DownloadLink.date_dernier_acces >= last_24h,
-            DownloadLink.nombre_telechargements > 0
-        ).order_by(DownloadLink.date_dernier_acces.desc()).limit(5).all()
-        
-        return {
-            'treatments': recent_treatments,
-            'downloads': recent_downloads
-        }
-        
+        return dashboard_cache.get_or_compute('dashboard:recent_activity', compute_recent_activity)
     except Exception as e:
         app.logger.error(f" Erreur activité récente: {str(e)}")
         return {'treatments': [], 'downloads': []}
 
+
+def compute_recent_activity():
+    # Valeurs simples (pas d'objets ORM) : le résultat survit à la session de la requête
+    last_24h = datetime.utcnow() - timedelta(hours=24)
+    
+    # Derniers traitements
+    recent_treatments = db.session.query(
+        Traitement.timestamp_folder, Traitement.fichier_original, Traitement.statut,
+        Traitement.nombre_employes_traites, Traitement.date_creation
+    ).filter(
+        Traitement.date_creation >= last_24h
+    ).order_by(Traitement.date_creation.desc()).limit(5).all()
+    
+    # Derniers téléchargements
+    recent_downloads = db.session.query(
+        DownloadLink.nom_fichier, DownloadLink.nombre_telechargements,
+        DownloadLink.date_dernier_acces, Employee.nom_employe
+    ).join(
+        Employee, DownloadLink.employe_id == Employee.id
+    ).filter(
+        DownloadLink.date_dernier_acces >= last_24h,
+        DownloadLink.nombre_telechargements > 0
+    ).order_by(DownloadLink.date_dernier_acces.desc()).limit(5).all()
+    
+    return {
+        'treatments': [row._asdict() for row in recent_treatments],
+        'downloads': [row._asdict() for row in recent_downloads]
+    }
+
+
+def invalidate_dashboard_stats():
+    """À appeler après une écriture qui change les chiffres du dashboard"""
+    dashboard_cache.invalidate()
+
 # Routes de maintenance système
 @app.route('/admin/maintenance')
 def maintenance_page():
@@ -1702,9 +2877,9 @@ def analyze_old_files():
                     subfolder_path = os.path.join(folder, subfolder)
                     if os.path.isdir(subfolder_path):
                         try:
-                            # Parse la date du dossier (format: YYYYMMDDHHMMSS)
-                            if len(subfolder) == 14 and subfolder.isdigit():
-                                folder_date = datetime.strptime(subfolder, '%Y%m%d%H%M%S')
+                            # Parse la date du dossier (format: YYYYMMDDHHMMSS[_xxxxx])
+                            folder_date = parse_timestamp_folder(subfolder)
+                            if folder_date is not None:
                                 if folder_date < cutoff_date:
                                     old_count += 1
                                     total_size += get_folder_size(subfolder_path)
@@ -1760,11 +2935,17 @@ def perform_system_cleanup(cleanup_type='all'):
                 DownloadLink.date_expiration < datetime.utcnow()
             ).all()
             
+            # Emails en file de ces liens d'abord (clé étrangère email_outbox -> download_links)
+            EmailOutbox.query.filter(
+                EmailOutbox.download_link_id.in_([link.id for link in expired_links])
+            ).delete(synchronize_session=False)
             for link in expired_links:
                 db.session.delete(link)
                 results['expired_links_removed'] += 1
             
+            record_daily_stats({daily_stats.LIENS_EXPIRES_SUPPRIMES: results['expired_links_removed']})
             db.session.commit()
+            invalidate_dashboard_stats()
         
         if cleanup_type in ['all', 'files']:
             # Nettoyer les fichiers anciens
@@ -1776,16 +2957,19 @@ def perform_system_cleanup(cleanup_type='all'):
                         subfolder_path = os.path.join(folder, subfolder)
                         if os.path.isdir(subfolder_path):
                             try:
-                                if len(subfolder) == 14 and subfolder.isdigit():
-                                    folder_date = datetime.strptime(subfolder, '%Y%m%d%H%M%S')
+                                folder_date = parse_timestamp_folder(subfolder)
+                                if folder_date is not None:
                                     if folder_date < cutoff_date:
                                         folder_size = get_folder_size(subfolder_path)
-                                        import shutil
                                         shutil.rmtree(subfolder_path)
                                         results['old_files_removed'] += 1
                                         results['space_freed'] += folder_size
                             except (ValueError, OSError):
                                 continue
+            
+            if results['old_files_removed']:
+                record_daily_stats({daily_stats.DOSSIERS_SUPPRIMES: results['old_files_removed']})
+                db.session.commit()
         
         # Enregistrer la date de nettoyage
         save_cleanup_date()
@@ -1932,6 +3116,16 @@ def perform_database_optimization():
             'error': str(e)
         }
 
+# Colonnes de tri de la liste des fichiers d'un traitement (paramètre ?tri=)
+TREATMENT_FILES_SORTS = {
+    'nom': FichierGenere.nom_employe_extrait,
+    'fichier': FichierGenere.nom_fichier,
+    'taille': FichierGenere.taille_fichier,
+    'acces': func.coalesce(DownloadLink.tentatives_acces, 0),
+    'telechargements': func.coalesce(DownloadLink.nombre_telechargements, 0),
+}
+
+
 @app.route('/admin/treatment/<timestamp>/details')
 def treatment_details(timestamp):
     """Affiche les détails d'un traitement avec liste des PDFs générés"""
@@ -1943,65 +3137,132 @@ def treatment_details(timestamp):
             flash('Traitement non trouvé', 'error')
             return redirect(url_for('dashboard'))
         
-        # Récupérer les fichiers générés depuis le dossier output
-        output_folder = os.path.join(app.config['OUTPUT_FOLDER'], timestamp)
-        generated_files = []
+        # Tri et pagination côté serveur
+        page = request.args.get('page', 1, type=int)
+        sort = request.args.get('tri', 'nom')
+        if sort not in TREATMENT_FILES_SORTS:
+            sort = 'nom'
+        order = 'desc' if request.args.get('ordre') == 'desc' else 'asc'
+        sort_column = TREATMENT_FILES_SORTS[sort]
+        
+        # Une requête : manifeste ⟕ lien du même fichier (index traitement_id, nom_fichier), employé chargé d'avance
+        files_page = db.session.query(FichierGenere, DownloadLink).outerjoin(
+            DownloadLink, and_(
+                DownloadLink.traitement_id == FichierGenere.traitement_id,
+                DownloadLink.nom_fichier == FichierGenere.nom_fichier
+            )
+        ).options(
+            db.joinedload(FichierGenere.employee)
+        ).filter(
+            FichierGenere.traitement_id == traitement.id
+        ).order_by(
+            sort_column.desc() if order == 'desc' else sort_column.asc(),
+            FichierGenere.id.asc()
+        ).paginate(page=page, per_page=app.config.get('TREATMENT_FILES_PER_PAGE', 60), error_out=False)
+        
+        # Suivi des envois : dernier email de chaque lien de la page et répartition par statut
+        link_ids = [link.id for _, link in files_page.items if link is not None]
+        emails_by_link = {
+            message.download_link_id: message
+            for message in EmailOutbox.query.filter(
+                EmailOutbox.download_link_id.in_(link_ids)
+            ).order_by(EmailOutbox.id)
+        } if link_ids else {}
+        email_counts = dict(
+            db.session.query(EmailOutbox.statut, db.func.count(EmailOutbox.id))
+            .filter(EmailOutbox.traitement_id == traitement.id)
+            .group_by(EmailOutbox.statut)
+            .all()
+        )
         
-        if os.path.exists(output_folder):
-            for filename in os.listdir(output_folder):
-                if filename.endswith('.pdf'):
-                    file_path = os.path.join(output_folder, filename)
-                    file_size = os.path.getsize(file_path)
-                    
-                    # Extraire le nom de l'employé du nom de fichier
-                    employee_name = filename.replace('.pdf', '').replace('_', ' ')
-                    # Enlever la période si présente (ex: "2025_08")
-                    import re
-                    employee_name = re.sub(r'_\d{4}_\d{2}$', '', employee_name)
-                    
-                    # 🆕 RÉCUPÉRER LES STATISTIQUES DEPUIS LA BASE
-                    access_count = 0
-                    download_count = 0
-                    
-                    # Chercher dans les download_links du traitement
-                    for link in traitement.download_links:
-                        # Correspondance par nom de fichier exact
-                        if link.nom_fichier == filename:
-                            access_count = link.tentatives_acces
-                            download_count = link.nombre_telechargements
-                            break
-                        # Correspondance par nom d'employé dans le nom de fichier
-                        elif link.employee and link.employee.nom_employe:
-                            # Normaliser les noms pour comparaison
-                            db_name = link.employee.nom_employe.strip().upper()
-                            file_name = employee_name.strip().upper()
-                            if db_name == file_name or db_name in filename.upper():
-                                access_count = link.tentatives_acces
-                                download_count = link.nombre_telechargements
-                                break
-                    
-                    generated_files.append({
-                        'filename': filename,
-                        'employee_name': employee_name,
-                        'file_size': format_file_size(file_size),
-                        'file_path': file_path,
-                        'access_count': access_count,      
-                        'download_count': download_count   
-                    })
-        
-        # Trier par nom d'employé
-        generated_files.sort(key=lambda x: x['employee_name'])
+        # Mesures des exécutions (reprises comprises) ; l'envoi des emails est asynchrone :
+        # sa durée va de la première mise en file au dernier envoi réussi
+        metriques = MetriquesTraitement.query.filter_by(
+            traitement_id=traitement.id
+        ).order_by(MetriquesTraitement.date_debut.asc()).all()
+        first_queued, last_sent = db.session.query(
+            db.func.min(EmailOutbox.date_creation), db.func.max(EmailOutbox.date_envoi)
+        ).filter(EmailOutbox.traitement_id == traitement.id).one()
+        email_duration = (last_sent - first_queued).total_seconds() if first_queued and last_sent else None
+        
+        generated_files = []
+        for fichier, link in files_page.items:
+            generated_files.append({
+                'filename': fichier.nom_fichier,
+                'employee_name': fichier.employee.nom_employe if fichier.employee else fichier.nom_employe_extrait,
+                'file_size': format_file_size(fichier.taille_fichier or 0),
+                'file_path': fichier.chemin_fichier,
+                'access_count': link.tentatives_acces if link else 0,
+                'download_count': link.nombre_telechargements if link else 0,
+                'email': emails_by_link.get(link.id) if link else None
+            })
         
         return render_template('admin/treatment_details.html',
                              traitement=traitement,
+                             resumable=is_treatment_resumable(traitement),
                              generated_files=generated_files,
-                             total_files=len(generated_files))
+                             files_page=files_page,
+                             total_files=files_page.total,
+                             sort=sort,
+                             order=order,
+                             email_counts=email_counts,
+                             metriques=metriques,
+                             email_duration=email_duration,
+                             format_file_size=format_file_size)
         
     except Exception as e:
         flash(f'Erreur lors du chargement des détails : {str(e)}', 'error')
         return redirect(url_for('dashboard'))
 
 
+@app.route('/admin/treatment/<timestamp>/resume', methods=['POST'])
+def resume_treatment(timestamp):
+    """Reprend un traitement interrompu à son dernier point de reprise"""
+    try:
+        traitement = Traitement.query.filter_by(timestamp_folder=timestamp).first()
+        if not traitement:
+            flash('Traitement non trouvé', 'error')
+            return redirect(url_for('dashboard'))
+        
+        if requeue_treatment_for_resume(traitement):
+            if app.config.get('PROCESSING_IN_APP_WORKERS', True):
+                start_processing_workers()
+                processing_wakeup.set()
+            invalidate_dashboard_stats()
+            flash('▶️ Traitement remis en file : il reprend là où il s\'était arrêté', 'success')
+        else:
+            flash('Ce traitement n\'est pas interrompu (ou son PDF source a été supprimé)', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erreur lors de la reprise : {str(e)}', 'error')
+    
+    return redirect(url_for('treatment_details', timestamp=timestamp))
+
+
+@app.route('/admin/treatment/<timestamp>/emails/retry', methods=['POST'])
+def retry_failed_emails(timestamp):
+    """Remet en file les emails abandonnés (echec_definitif) d'un traitement"""
+    try:
+        traitement = Traitement.query.filter_by(timestamp_folder=timestamp).first()
+        if not traitement:
+            flash('Traitement non trouvé', 'error')
+            return redirect(url_for('dashboard'))
+        
+        requeued = requeue_failed_emails(traitement.id)
+        db.session.commit()
+        
+        if requeued:
+            wake_outbox_senders()
+            flash(f'{requeued} email(s) remis en file d\'envoi', 'success')
+        else:
+            flash('Aucun email en échec à renvoyer', 'info')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erreur lors de la remise en file : {str(e)}', 'error')
+    
+    return redirect(url_for('treatment_details', timestamp=timestamp))
+
+
 @app.route('/admin/treatment/<timestamp>/download/<filename>')
 def download_generated_pdf(timestamp, filename):
     """Télécharge un PDF généré spécifique"""
@@ -2013,14 +3274,14 @@ def download_generated_pdf(timestamp, filename):
             return redirect(url_for('dashboard'))
         
         # Construire le chemin du fichier
-        file_path = os.path.join(app.config['OUTPUT_FOLDER'], timestamp, filename)
+        file_path = safe_join(app.config['OUTPUT_FOLDER'], timestamp, filename)
         
-        if not os.path.exists(file_path):
+        if not file_path or not os.path.isfile(file_path):
             flash('Fichier non trouvé', 'error')
             return redirect(url_for('treatment_details', timestamp=timestamp))
         
         # Téléchargement sécurisé
-        return send_file(file_path, as_attachment=True, download_name=filename)
+        return serve_payslip_file(file_path, filename, etag=stored_file_digest(timestamp, filename))
         
     except Exception as e:
         flash(f'Erreur lors du téléchargement : {str(e)}', 'error')
@@ -2030,47 +3291,50 @@ def download_generated_pdf(timestamp, filename):
 def download_all_generated_pdfs(timestamp):
     """Télécharge tous les PDFs générés d'un traitement en ZIP"""
     try:
-        import zipfile
-        import io
-        
         # Vérifier que le traitement existe
         traitement = Traitement.query.filter_by(timestamp_folder=timestamp).first()
         if not traitement:
             flash('Traitement non trouvé', 'error')
             return redirect(url_for('dashboard'))
         
-        # Dossier des fichiers générés
+        # Dossier des fichiers générés (supprimé par le nettoyage après 30 jours)
         output_folder = os.path.join(app.config['OUTPUT_FOLDER'], timestamp)
         if not os.path.exists(output_folder):
             flash('Dossier de fichiers non trouvé', 'error')
             return redirect(url_for('treatment_details', timestamp=timestamp))
         
-        # Créer le ZIP en mémoire
-        zip_buffer = io.BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Ajouter tous les PDFs au ZIP
-            pdf_count = 0
-            for filename in os.listdir(output_folder):
-                if filename.endswith('.pdf'):
-                    file_path = os.path.join(output_folder, filename)
-                    zip_file.write(file_path, filename)
-                    pdf_count += 1
+        # Fichiers générés d'après le manifeste (triés par nom, comme l'archive l'était) ;
+        # ceux absents du disque sont écartés avant l'envoi, qui ne peut plus échouer proprement
+        pdf_files = []
+        for chemin, nom in db.session.query(
+            FichierGenere.chemin_fichier, FichierGenere.nom_fichier
+        ).filter(FichierGenere.traitement_id == traitement.id).order_by(FichierGenere.nom_fichier):
+            if os.path.isfile(chemin):
+                pdf_files.append((chemin, nom))
+            else:
+                app.logger.warning(f"ZIP {timestamp} : fichier du manifeste absent du disque, ignoré : {chemin}")
+        pdf_count = len(pdf_files)
         
         if pdf_count == 0:
             flash('Aucun PDF trouvé dans ce traitement', 'error')
             return redirect(url_for('treatment_details', timestamp=timestamp))
         
-        zip_buffer.seek(0)
-        
         # Nom du fichier ZIP
         zip_filename = f"payflow_fiches_{timestamp}_{pdf_count}files.zip"
         
-        return send_file(
-            zip_buffer,
+        # Archive envoyée au fil de l'eau : mémoire constante, premiers octets immédiats
+        return Response(
+            stream_zip(
+                pdf_files,
+                compression=app.config.get('ZIP_COMPRESSION', 'stored'),
+                chunk_size=app.config.get('ZIP_STREAM_CHUNK_SIZE', 64 * 1024),
+                on_missing=lambda chemin, e: app.logger.warning(f"ZIP {timestamp} : {chemin} omis ({e})")
+            ),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name=zip_filename
+            headers={
+                'Content-Disposition': f'attachment; filename="{zip_filename}"',
+                'X-Accel-Buffering': 'no'
+            }
         )
         
     except Exception as e:
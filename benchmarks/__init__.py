@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Mesures de performance reproductibles de PayFlow (lancer les modules avec python -m benchmarks.<module>)"""
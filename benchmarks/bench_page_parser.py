@@ -0,0 +1,249 @@
+# benchmarks/bench_page_parser.py
+"""Micro-benchmark : page_parser.parse_page contre les trois anciens extract_* de app.py.
+
+Vérifie d'abord que les résultats sont identiques sur tout le corpus, puis mesure
+le temps d'analyse. Corpus synthétique par défaut, ou texte réel d'un PDF :
+
+    python -m benchmarks.bench_page_parser
+    python -m benchmarks.bench_page_parser --pdf uploads/20250901120000/paie.pdf --repeat 20
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from page_parser import parse_page
+
+
+# ---- Implémentations d'origine (copie conforme, référence d'équivalence) ----
+
+def legacy_extract_employee_name_from_page(page_text):
+    """Extrait le nom de l'employé depuis le texte d'une page"""
+    lines = page_text.split('\n')
+    
+    # Recherche du pattern "Catégorie" suivi de "M" ou "Mme" puis du nom
+    for i, line in enumerate(lines):
+        line = line.strip()
+        
+        # Cherche la ligne contenant "Catégorie"
+        if "Catégorie" in line:
+            # Le nom peut être sur la même ligne ou sur les lignes suivantes
+            
+            # Cas 1 : Le nom est sur la même ligne après "M" ou "Mme"
+            if " M " in line:
+                # Extrait tout ce qui suit "M "
+                parts = line.split(" M ")
+                if len(parts) > 1:
+                    name = parts[1].strip()
+                    if name and len(name) > 5:  # Vérifie qu'il y a bien un nom
+                        return name
+            
+            elif " Mme " in line:
+                # Extrait tout ce qui suit "Mme "
+                parts = line.split(" Mme ")
+                if len(parts) > 1:
+                    name = parts[1].strip()
+                    if name and len(name) > 5:  # Vérifie qu'il y a bien un nom
+                        return name
+            
+            # Cas 2 : Le nom est sur la ligne suivante
+            if i + 1 < len(lines):
+                next_line = lines[i + 1].strip()
+                if next_line and len(next_line) > 5 and next_line.isupper():
+                    return next_line
+    
+    return None
+
+def legacy_extract_employee_matricule_from_page(page_text):
+    """Extrait le matricule de l'employé depuis le texte d'une page"""
+    lines = page_text.split('\n')
+    
+    # Recherche du pattern "Matricule" suivi du numéro
+    for i, line in enumerate(lines):
+        line = line.strip()
+        
+        # Cherche la ligne contenant "Matricule"
+        if "Matricule" in line:
+            # Le matricule peut être sur la même ligne ou sur les lignes suivantes
+            
+            # Cas 1 : Le matricule est sur la même ligne après "Matricule"
+            # Exemple : "Matricule 2204      Ancienneté 2an(s) et 8mois"
+            import re
+            matricule_match = re.search(r'Matricule\s+(\d+)', line)
+            if matricule_match:
+                return matricule_match.group(1)
+            
+            # Cas 2 : Le matricule pourrait être sur la ligne suivante
+            if i + 1 < len(lines):
+                next_line = lines[i + 1].strip()
+                # Recherche d'un nombre de 4 chiffres (format matricule courant)
+                matricule_match = re.search(r'^(\d{4})(?:\s|$)', next_line)
+                if matricule_match:
+                    return matricule_match.group(1)
+    return None
+
+def legacy_extract_period_from_page(page_text):
+    """Extrait la période du bulletin (année_mois) depuis le texte d'une page"""
+    lines = page_text.split('\n')
+    
+    import re
+    
+    # Patterns de recherche pour différents formats de date
+    patterns = [
+        # Format: "Période du 01/08/25 au 31/08/25"
+        r'Période du \d{2}/(\d{2})/(\d{2}) au',
+        # Format: "Période du 01/08/2025 au 31/08/2025"
+        r'Période du \d{2}/(\d{2})/(\d{4}) au',
+        # Format: "du 01/08/25 au 31/08/25"
+        r'du \d{2}/(\d{2})/(\d{2}) au',
+        # Format: "Mois: 08/2025" ou "Mois : 08/2025"
+        r'Mois\s*:\s*(\d{2})/(\d{4})',
+        # Format général date: "31/08/25" ou "01/08/2025"
+        r'(\d{1,2})/(\d{1,2})/(\d{2,4})'
+    ]
+    
+    for line in lines:
+        line = line.strip()
+        
+        # Test de chaque pattern
+        for i, pattern in enumerate(patterns):
+            match = re.search(pattern, line)
+            if match:
+                if i in [0, 2]:  # Patterns avec jours/mois/année à 2 chiffres
+                    month = match.group(1).zfill(2)
+                    year = match.group(2)
+                    # Convertir année 2 chiffres en 4 chiffres
+                    full_year = f"20{year}" if int(year) < 50 else f"19{year}"
+                    return f"{full_year}_{month}"
+                    
+                elif i == 1:  # Pattern avec année à 4 chiffres
+                    month = match.group(1).zfill(2)
+                    year = match.group(2)
+                    return f"{year}_{month}"
+                    
+                elif i == 3:  # Pattern "Mois: MM/YYYY"
+                    month = match.group(1).zfill(2)
+                    year = match.group(2)
+                    return f"{year}_{month}"
+                    
+                elif i == 4:  # Pattern date générale
+                    day = match.group(1).zfill(2)
+                    month = match.group(2).zfill(2)
+                    year = match.group(3)
+                    # Convertir année si nécessaire
+                    if len(year) == 2:
+                        full_year = f"20{year}" if int(year) < 50 else f"19{year}"
+                    else:
+                        full_year = year
+                    return f"{full_year}_{month}"
+    
+    # Si aucune date trouvée, utiliser la date actuelle
+    from datetime import datetime
+    now = datetime.now()
+    #app.logger.info("Aucune période trouvée dans le PDF, utilisation de la date actuelle")
+    return now.strftime('%Y_%m')
+
+
+def legacy_parse_page(page_text):
+    return (
+        legacy_extract_employee_name_from_page(page_text),
+        legacy_extract_employee_matricule_from_page(page_text),
+        legacy_extract_period_from_page(page_text)
+    )
+
+
+# ---- Corpus ----
+
+BODY_LINES = [
+    "Salaire de base 151,67 16,4850 2 500,28",
+    "Prime d'ancienneté 75,00",
+    "Cotisations salariales 412,55 18,00 %",
+    "Net à payer avant impôt sur le revenu 1 987,40",
+    "Impôt sur le revenu prélevé à la source 45,20",
+    "Congés payés N-1 acquis 25,00 pris 12,00",
+    "Cumul brut imposable 20 114,90",
+]
+
+
+def synthetic_page(rng, index):
+    """Page de bulletin synthétique couvrant les variantes de mise en page connues"""
+    name = f"{rng.choice(['DUPONT', 'MARTIN', 'KOUASSI', 'NGUYEN'])} {rng.choice(['JEAN', 'MARIE', 'AWA', 'PAUL'])} {index:04d}"
+    civility = rng.choice([' M ', ' Mme ', ' M ', None])
+    lines = ["SOCIETE EXEMPLE SA", "BULLETIN DE PAIE"]
+    lines += rng.sample(BODY_LINES, 3)
+    if civility is None:
+        lines += ["Catégorie Employé", name]
+    else:
+        lines.append(f"Catégorie Cadre{civility}{name}")
+    if rng.random() < 0.8:
+        lines.append(f"Matricule {2000 + index}      Ancienneté 2an(s) et 8mois")
+    else:
+        lines += ["Matricule", f"{2000 + index % 8000} Ancienneté"]
+    lines.append(rng.choice([
+        "Période du 01/08/25 au 31/08/25",
+        "Période du 01/08/2025 au 31/08/2025",
+        "Paie du 01/07/25 au 31/07/25",
+        "Mois : 09/2025",
+        "Date de paiement 31/08/2025",
+        "Sans période",
+    ]))
+    lines += rng.sample(BODY_LINES, 4)
+    if rng.random() < 0.1:
+        lines = lines[:2]  # page de suite sans en-tête employé
+    return "\n".join(lines) + "\n"
+
+
+def load_corpus(pdf_path, size, seed):
+    if pdf_path:
+        import PyPDF2
+        from pdf_extraction import extract_pages_text
+        total_pages = len(PyPDF2.PdfReader(pdf_path).pages)
+        return extract_pages_text(pdf_path, total_pages)
+    rng = random.Random(seed)
+    return [synthetic_page(rng, i) for i in range(size)]
+
+
+def time_parser(parser, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page_text in corpus:
+            parser(page_text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', help="PDF dont le texte sert de corpus (sinon corpus synthétique)")
+    parser.add_argument('--pages', type=int, default=5000, help="taille du corpus synthétique")
+    parser.add_argument('--repeat', type=int, default=5, help="nombre de mesures (on garde la meilleure)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.pdf, args.pages, args.seed)
+
+    mismatches = [i for i, page_text in enumerate(corpus)
+                  if tuple(parse_page(page_text)) != legacy_parse_page(page_text)]
+    if mismatches:
+        print(f"❌ {len(mismatches)} page(s) avec un résultat différent, ex. page {mismatches[0]}", file=sys.stderr)
+        return 1
+
+    legacy_seconds = time_parser(legacy_parse_page, corpus, args.repeat)
+    parser_seconds = time_parser(parse_page, corpus, args.repeat)
+    print(json.dumps({
+        'benchmark': 'page_parser',
+        'pages': len(corpus),
+        'legacy_seconds': round(legacy_seconds, 6),
+        'parse_page_seconds': round(parser_seconds, 6),
+        'legacy_pages_per_second': round(len(corpus) / legacy_seconds),
+        'parse_page_pages_per_second': round(len(corpus) / parser_seconds),
+        'speedup': round(legacy_seconds / parser_seconds, 2),
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
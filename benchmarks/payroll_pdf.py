@@ -0,0 +1,136 @@
+# benchmarks/payroll_pdf.py
+"""Générateur de PDF de paie synthétiques, dans la mise en page attendue par page_parser.
+
+Chaque page porte l'en-tête employé ("Catégorie Cadre M NOM", "Matricule 2204",
+"Période du 01/08/25 au 31/08/25"), comme les bulletins réels sur plusieurs
+pages. Le PDF est écrit au fil de l'eau (texte Helvetica non compressé) : une
+dizaine de milliers de pages se génèrent en quelques secondes sans tout garder
+en mémoire.
+
+    python -m benchmarks.payroll_pdf paie.pdf --pages 2000 --pages-par-employe 1-5
+"""
+import argparse
+import random
+from collections import namedtuple
+
+LAST_NAMES = ['DUPONT', 'MARTIN', 'KOUASSI', 'NGUYEN', 'DIALLO', 'BERNARD', 'TRAORE', 'LEROY', 'KONAN', 'MOREAU']
+FIRST_NAMES = ['JEAN', 'MARIE', 'AWA', 'PAUL', 'FATOU', 'LUC', 'AICHA', 'PIERRE', 'ADAMA', 'SOPHIE']
+CIVILITIES = ['M', 'Mme']
+
+# Employé du PDF généré : ses pages (numéros à partir de 0) et ce que l'extraction doit retrouver
+SyntheticEmployee = namedtuple('SyntheticEmployee', ['nom', 'matricule', 'pages'])
+
+
+def parse_pages_per_employee(value):
+    """'3' -> (3, 3) ; '1-5' -> (1, 5)"""
+    low, _, high = value.partition('-')
+    low, high = int(low), int(high or low)
+    if low < 1 or high < low:
+        raise ValueError(f"Pages par employé invalides : {value}")
+    return low, high
+
+
+def _employee_name(index):
+    # Nom unique, en majuscules (critère de page_parser), sans chiffres
+    suffix = ''
+    n = index
+    while True:
+        suffix = chr(ord('A') + n % 26) + suffix
+        n //= 26
+        if not n:
+            break
+    return f"{LAST_NAMES[index % len(LAST_NAMES)]} {FIRST_NAMES[index // len(LAST_NAMES) % len(FIRST_NAMES)]} {suffix}"
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _page_lines(employee, civility, page_index, page_count, period):
+    month, year = period
+    return [
+        "SOCIETE EXEMPLE SA - BULLETIN DE PAIE",
+        f"Page {page_index + 1}/{page_count}",
+        f"Catégorie Cadre {civility} {employee.nom}",
+        f"Matricule {employee.matricule}      Ancienneté 2an(s) et 8mois",
+        f"Période du 01/{month:02d}/{year % 100:02d} au 28/{month:02d}/{year % 100:02d}",
+        "Salaire de base                      2 500 000",
+        "Prime de transport                      30 000",
+        "Cotisations salariales                -185 000",
+        "Net à payer                          2 345 000",
+    ]
+
+
+def plan_employees(pages, pages_per_employee=(1, 5), seed=42, first_matricule=2000):
+    """Répartit `pages` pages entre employés de pages_per_employee[0] à [1] pages chacun"""
+    rng = random.Random(seed)
+    employees = []
+    page = 0
+    while page < pages:
+        count = min(rng.randint(*pages_per_employee), pages - page)
+        index = len(employees)
+        employees.append(SyntheticEmployee(_employee_name(index), str(first_matricule + index),
+                                           list(range(page, page + count))))
+        page += count
+    return employees
+
+
+def write_payroll_pdf(path, pages=1000, pages_per_employee=(1, 5), seed=42, period=(8, 2025)):
+    """Écrit le PDF et retourne la liste des SyntheticEmployee qu'il contient"""
+    employees = plan_employees(pages, pages_per_employee, seed)
+    rng = random.Random(seed)
+
+    # Objets : 1 police, 2 arbre des pages, puis (contenu, page) par page, catalogue en dernier
+    offsets = []
+    with open(path, 'wb') as output:
+        position = 0
+
+        def write_object(body):
+            nonlocal position
+            offsets.append(position)
+            data = b"%d 0 obj\n" % len(offsets) + body + b"\nendobj\n"
+            output.write(data)
+            position += len(data)
+
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        output.write(header)
+        position = len(header)
+        write_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        page_ids = [4 + 2 * i for i in range(pages)]
+        write_object(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids)
+                     + b"] /Count %d >>" % pages)
+
+        for employee in employees:
+            civility = rng.choice(CIVILITIES)
+            for page_index, _ in enumerate(employee.pages):
+                lines = _page_lines(employee, civility, page_index, len(employee.pages), period)
+                content = ("BT /F1 10 Tf 14 TL 50 800 Td "
+                           + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET").encode('cp1252')
+                write_object(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+                write_object(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                             b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>" % len(offsets))
+
+        write_object(b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_position = position
+        output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        output.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        output.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                     % (len(offsets) + 1, len(offsets), xref_position))
+
+    return employees
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un PDF de paie synthétique")
+    parser.add_argument('path')
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--pages-par-employe', default='1-5', help="nombre fixe (2) ou intervalle (1-5)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    employees = write_payroll_pdf(args.path, args.pages, parse_pages_per_employee(args.pages_par_employe), args.seed)
+    print(f"{args.path} : {args.pages} pages, {len(employees)} employés")
+
+
+if __name__ == '__main__':
+    main()
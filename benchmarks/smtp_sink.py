@@ -0,0 +1,78 @@
+# benchmarks/smtp_sink.py
+"""Serveur SMTP local qui accepte et compte les messages sans les délivrer.
+
+Suffisant pour smtplib sans TLS ni authentification (EHLO, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT) : les benchmarks mesurent l'envoi de bout en bout sans
+dépendre d'un vrai serveur.
+
+    with SMTPSink() as sink:
+        ...  # envoyer vers 127.0.0.1:sink.port
+        print(sink.messages)
+"""
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.wfile.write(b"220 payflow-sink ESMTP\r\n")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    with server.lock:
+                        server.messages += 1
+                    self.wfile.write(b"250 OK\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.wfile.write(b"250-payflow-sink\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Puits SMTP sur 127.0.0.1 (port 0 = port libre choisi par le système)"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
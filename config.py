@@ -36,6 +36,28 @@ class Config:
     DOWNLOAD_LINK_EXPIRY_DAYS = int(os.getenv("DOWNLOAD_LINK_EXPIRY_DAYS", "30"))
     MAX_DOWNLOAD_ATTEMPTS = int(os.getenv("MAX_DOWNLOAD_ATTEMPTS", "10"))
 
+    # File de traitement en arrière-plan
+    PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", "2"))
+    PROCESSING_POLL_INTERVAL_SEC = int(os.getenv("PROCESSING_POLL_INTERVAL_SEC", "5"))
+    PROCESSING_PROGRESS_EVERY_PAGES = int(os.getenv("PROCESSING_PROGRESS_EVERY_PAGES", "25"))
+    PROCESSING_STALE_AFTER_SEC = int(os.getenv("PROCESSING_STALE_AFTER_SEC", "600"))  # job en_cours sans mise à jour = interrompu
+    # Pic mémoire des traitements (tracemalloc) dans MetriquesTraitement ; false pour éviter son surcoût
+    PROCESSING_TRACE_MEMORY = os.getenv("PROCESSING_TRACE_MEMORY", "true").lower() == "true"
+    # false : l'application ne fait que mettre en file, les jobs sont exécutés par payflow_worker.py
+    PROCESSING_IN_APP_WORKERS = os.getenv("PROCESSING_IN_APP_WORKERS", "true").lower() == "true"
+    PROCESSING_HEARTBEAT_INTERVAL_SEC = int(os.getenv("PROCESSING_HEARTBEAT_INTERVAL_SEC", "30"))  # << PROCESSING_STALE_AFTER_SEC
+    # Traitements simultanés au total (tous workers gunicorn / machines) : verrous consultatifs PostgreSQL
+    MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+
+    # Extraction du texte PDF : pool de processus au-delà de PDF_PARALLEL_MIN_PAGES pages
+    PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200"))
+    # Mode flux (mémoire bornée, extraction en série) à partir de ce nombre de pages ; 0 : jamais
+    PROCESSING_STREAMING_MIN_PAGES = int(os.getenv("PROCESSING_STREAMING_MIN_PAGES", "5000"))
+
+    # Enregistrement en lot des fiches/liens d'un traitement (un commit par lot = point de reprise)
+    PERSISTENCE_BATCH_SIZE = int(os.getenv("PERSISTENCE_BATCH_SIZE", "500"))
+
     # SMTP (remplace email_config.py à terme)
     MAIL_SERVER = os.getenv("SMTP_SERVER", "localhost")
     MAIL_PORT = int(os.getenv("SMTP_PORT", "25"))
@@ -44,6 +66,40 @@ class Config:
     MAIL_PASSWORD = os.getenv("SMTP_PASSWORD")
     MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", os.getenv("SMTP_USERNAME"))
 
+    # Pool de sessions SMTP (réutilisées pendant un traitement, recyclées après N envois)
+    SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+    SMTP_TIMEOUT_SEC = int(os.getenv("SMTP_TIMEOUT_SEC", "30"))
+
+    # File d'envoi des emails (table email_outbox) : expéditeurs concurrents, une session SMTP chacun
+    EMAIL_SENDER_THREADS = int(os.getenv("EMAIL_SENDER_THREADS", os.getenv("SMTP_POOL_SIZE", "3")))
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20"))
+    EMAIL_OUTBOX_POLL_INTERVAL_SEC = int(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL_SEC", "10"))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))  # au-delà : echec_definitif
+    EMAIL_RETRY_BASE_DELAY_SEC = int(os.getenv("EMAIL_RETRY_BASE_DELAY_SEC", "60"))  # 1 min, 2 min, 4 min...
+    EMAIL_RETRY_MAX_DELAY_SEC = int(os.getenv("EMAIL_RETRY_MAX_DELAY_SEC", "3600"))
+    EMAIL_OUTBOX_STALE_AFTER_SEC = int(os.getenv("EMAIL_OUTBOX_STALE_AFTER_SEC", "600"))  # message en_cours abandonné
+
+    # Import CSV d'employés : lignes par INSERT ... ON CONFLICT
+    EMPLOYEE_IMPORT_BATCH_SIZE = int(os.getenv("EMPLOYEE_IMPORT_BATCH_SIZE", "1000"))
+
+    # Détails d'un traitement : fichiers affichés par page
+    TREATMENT_FILES_PER_PAGE = int(os.getenv("TREATMENT_FILES_PER_PAGE", "60"))
+
+    # Archive ZIP "Télécharger tout" envoyée en flux ; 'stored' = sans recompresser les PDF
+    ZIP_COMPRESSION = os.getenv("ZIP_COMPRESSION", "stored")  # stored | deflated
+    ZIP_STREAM_CHUNK_SIZE = int(os.getenv("ZIP_STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+    # Envoi des fiches PDF : 'direct' (Flask lit le fichier), ou délégué au proxy frontal
+    #  - 'x-accel-redirect' (nginx) : location FILE_SERVING_ACCEL_PREFIX/ { internal; alias <OUTPUT_FOLDER>/; }
+    #  - 'x-sendfile' (Apache mod_xsendfile, lighttpd) : chemin absolu du fichier
+    # En mode proxy, nombre_telechargements n'est pas incrémenté (octets envoyés hors de l'application)
+    FILE_SERVING_MODE = os.getenv("FILE_SERVING_MODE", "direct")
+    FILE_SERVING_ACCEL_PREFIX = os.getenv("FILE_SERVING_ACCEL_PREFIX", "/protected-output")
+
+    # Cache des statistiques du dashboard (secondes) ; 0 = toujours recalculer
+    DASHBOARD_CACHE_TTL_SEC = int(os.getenv("DASHBOARD_CACHE_TTL_SEC", "30"))
+
 class DevelopmentConfig(Config):
     DEBUG = True
     # Si tu veux forcer un DSN spécifique en dev :
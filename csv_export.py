@@ -0,0 +1,152 @@
+# csv_export.py
+"""Exports CSV envoyés au fil de l'eau (employés, traitements, fiches envoyées, liens).
+
+Les lignes sont lues par lots avec un curseur côté serveur (yield_per :
+stream_results sous PostgreSQL) et écrites dans la réponse au fur et à mesure.
+Aucun objet ORM n'est construit : la mémoire reste constante et les premiers
+octets partent immédiatement, quel que soit le nombre de lignes.
+"""
+import csv
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from models import db, Employee, Traitement, TraitementEmploye, DownloadLink
+
+YIELD_PER = 1000
+
+# Lignes accumulées avant d'envoyer un morceau de réponse
+ROWS_PER_CHUNK = 500
+
+DATE_FORMAT = '%d/%m/%Y %H:%M'
+
+CsvExport = namedtuple('CsvExport', ['label', 'filename', 'header', 'query', 'date_column'])
+
+
+def _format_date(value):
+    return value.strftime(DATE_FORMAT) if value else ''
+
+
+class _LineBuffer:
+    """Destination de csv.writer : garde les lignes écrites jusqu'au prochain drain()"""
+
+    def __init__(self):
+        self._lines = []
+
+    def write(self, line):
+        self._lines.append(line)
+
+    def drain(self):
+        data = ''.join(self._lines)
+        self._lines = []
+        return data.encode('utf-8')
+
+
+def stream_csv(header, rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """Générateur des octets d'un CSV : l'en-tête, puis un morceau tous les `rows_per_chunk` lignes"""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.drain()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.drain()
+            pending = 0
+    if pending:
+        yield buffer.drain()
+
+
+def _employees_query():
+    return db.session.query(
+        Employee.matricule, Employee.nom_employe, Employee.email,
+        Employee.statut, Employee.source_creation, Employee.date_creation
+    ).order_by(Employee.nom_employe.asc(), Employee.id.asc())
+
+
+def _treatments_query():
+    return db.session.query(
+        Traitement.timestamp_folder, Traitement.fichier_original, Traitement.taille_fichier,
+        Traitement.nombre_pages, Traitement.nombre_employes_detectes, Traitement.nombre_employes_traites,
+        Traitement.nombre_nouveaux_employes, Traitement.duree_traitement_secondes,
+        Traitement.statut, Traitement.date_creation, Traitement.date_fin
+    ).order_by(Traitement.date_creation.asc(), Traitement.id.asc())
+
+
+def _treatment_employees_query():
+    return db.session.query(
+        Traitement.timestamp_folder, Traitement.date_creation, Employee.matricule, Employee.nom_employe,
+        TraitementEmploye.periode_extraite, TraitementEmploye.nom_fichier_genere,
+        TraitementEmploye.email_envoye, TraitementEmploye.date_email, TraitementEmploye.erreur_email
+    ).join(
+        Traitement, TraitementEmploye.traitement_id == Traitement.id
+    ).join(
+        Employee, TraitementEmploye.employe_id == Employee.id
+    ).order_by(Traitement.date_creation.asc(), TraitementEmploye.id.asc())
+
+
+def _download_links_query():
+    # Jamais le jeton : l'export ne doit pas permettre d'ouvrir les liens
+    return db.session.query(
+        Traitement.timestamp_folder, Employee.matricule, Employee.nom_employe, DownloadLink.nom_fichier,
+        DownloadLink.statut, DownloadLink.date_creation, DownloadLink.date_expiration,
+        DownloadLink.date_premier_acces, DownloadLink.date_dernier_acces,
+        DownloadLink.tentatives_acces, DownloadLink.nombre_telechargements
+    ).join(
+        Traitement, DownloadLink.traitement_id == Traitement.id
+    ).join(
+        Employee, DownloadLink.employe_id == Employee.id
+    ).order_by(DownloadLink.date_creation.asc(), DownloadLink.id.asc())
+
+
+EXPORTS = {
+    'employes': CsvExport(
+        'Employés', 'employes_payflow',
+        ['Matricule', 'Nom', 'Email', 'Statut', 'Source', 'Date création'],
+        _employees_query, Employee.date_creation
+    ),
+    'traitements': CsvExport(
+        'Traitements', 'traitements_payflow',
+        ['Dossier', 'Fichier original', 'Taille (octets)', 'Pages', 'Employés détectés', 'Employés traités',
+         'Nouveaux employés', 'Durée (s)', 'Statut', 'Date création', 'Date fin'],
+        _treatments_query, Traitement.date_creation
+    ),
+    'fiches': CsvExport(
+        'Fiches envoyées par traitement', 'fiches_payflow',
+        ['Dossier', 'Date traitement', 'Matricule', 'Nom', 'Période', 'Fichier',
+         'Email envoyé', 'Date email', 'Erreur email'],
+        _treatment_employees_query, Traitement.date_creation
+    ),
+    'liens': CsvExport(
+        'Liens de téléchargement', 'liens_payflow',
+        ['Dossier', 'Matricule', 'Nom', 'Fichier', 'Statut', 'Date création', 'Date expiration',
+         'Premier accès', 'Dernier accès', 'Tentatives', 'Téléchargements'],
+        _download_links_query, DownloadLink.date_creation
+    ),
+}
+
+
+def parse_date_range(date_from, date_to):
+    """Bornes (début inclus, fin exclue) à partir de dates AAAA-MM-JJ ; ValueError si invalides"""
+    start = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+    end = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1) if date_to else None
+    return start, end
+
+
+def export_rows(export, start=None, end=None):
+    """Lignes (tuples) d'un export, lues par lots de YIELD_PER avec curseur côté serveur"""
+    query = export.query()
+    if start is not None:
+        query = query.filter(export.date_column >= start)
+    if end is not None:
+        query = query.filter(export.date_column < end)
+
+    for row in query.execution_options(yield_per=YIELD_PER):
+        yield [
+            _format_date(value) if isinstance(value, datetime)
+            else ('Oui' if value else 'Non') if isinstance(value, bool)
+            else value
+            for value in row
+        ]
@@ -0,0 +1,202 @@
+# daily_stats.py
+"""Compteurs journaliers (table statistiques_journalieres) alimentés par les événements.
+
+Chaque événement (traitement terminé, accès à un lien, téléchargement complet,
+nettoyage...) incrémente ses métriques dans la transaction qui l'enregistre :
+les tableaux de bord lisent O(jours) lignes au lieu de parcourir l'historique.
+rebuild_daily_stats() recalcule depuis les tables brutes les métriques qui en
+sont dérivables, pour corriger une dérive (voir rebuild_statistics.py).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Traitement, StatistiqueJournaliere
+
+# Traitements (alimentés par la file de traitement)
+TRAITEMENTS_CREES = 'traitements_crees'
+TRAITEMENTS_TERMINES = 'traitements_termines'
+TRAITEMENTS_PARTIELS = 'traitements_partiels'
+TRAITEMENTS_ECHEC = 'traitements_echec'
+PAGES_ANALYSEES = 'pages_analysees'
+FICHES_GENEREES = 'fiches_generees'
+# Fiches des seuls traitements terminés sans échec (total_files_generated du tableau de bord)
+FICHES_TRAITEMENTS_TERMINES = 'fiches_traitements_termines'
+NOUVEAUX_EMPLOYES = 'nouveaux_employes'
+LIENS_CREES = 'liens_crees'
+
+# Liens de téléchargement
+ACCES_AUTORISES = 'acces_autorises'
+ACCES_REFUSES = 'acces_refuses'
+TELECHARGEMENTS = 'telechargements'
+
+# Maintenance
+LIENS_EXPIRES_SUPPRIMES = 'liens_expires_supprimes'
+DOSSIERS_SUPPRIMES = 'dossiers_supprimes'
+
+# Métriques recalculables depuis la table traitements (jamais purgée). Les autres
+# ne laissent pas d'historique exploitable (liens supprimés au nettoyage, accès
+# non journalisés) : la reconstruction les conserve telles quelles.
+REBUILDABLE_METRICS = (
+    TRAITEMENTS_CREES, TRAITEMENTS_TERMINES, TRAITEMENTS_PARTIELS, TRAITEMENTS_ECHEC,
+    PAGES_ANALYSEES, FICHES_GENEREES, FICHES_TRAITEMENTS_TERMINES, NOUVEAUX_EMPLOYES,
+)
+
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def record_daily_stats(counters, jour=None):
+    """Ajoute {metrique: delta} aux compteurs du jour, dans la transaction en cours.
+
+    Pas de commit ici : les compteurs sont validés (ou annulés) avec l'événement.
+    INSERT ... ON CONFLICT DO UPDATE valeur = valeur + delta : incrément atomique,
+    sans lecture préalable ni perte de mise à jour entre processus.
+    """
+    counters = {metrique: delta for metrique, delta in counters.items() if delta}
+    if not counters:
+        return
+    jour = jour or datetime.utcnow().date()
+    now = datetime.utcnow()
+    # Ordre fixe des lignes : deux transactions concurrentes verrouillent dans le même ordre
+    rows = [
+        {'jour': jour, 'metrique': metrique, 'valeur': delta, 'date_maj': now}
+        for metrique, delta in sorted(counters.items())
+    ]
+
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(StatistiqueJournaliere).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['jour', 'metrique'],
+            set_={
+                'valeur': StatistiqueJournaliere.valeur + statement.excluded.valeur,
+                'date_maj': statement.excluded.date_maj,
+            }
+        )
+        db.session.execute(statement)
+        return
+
+    # Autres bases : UPDATE puis INSERT si la ligne du jour n'existe pas encore
+    for row in rows:
+        updated = StatistiqueJournaliere.query.filter_by(jour=row['jour'], metrique=row['metrique']).update(
+            {'valeur': StatistiqueJournaliere.valeur + row['valeur'], 'date_maj': now},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.execute(db.insert(StatistiqueJournaliere), [row])
+
+
+def daily_totals(metriques, since=None):
+    """{metrique: total} sur tous les jours (ou depuis la date `since`)"""
+    query = db.session.query(
+        StatistiqueJournaliere.metrique,
+        db.func.coalesce(db.func.sum(StatistiqueJournaliere.valeur), 0)
+    ).filter(StatistiqueJournaliere.metrique.in_(metriques))
+    if since is not None:
+        query = query.filter(StatistiqueJournaliere.jour >= since)
+    totals = dict.fromkeys(metriques, 0)
+    for metrique, total in query.group_by(StatistiqueJournaliere.metrique):
+        totals[metrique] = int(total)
+    return totals
+
+
+def daily_series(metrique, days=30):
+    """[(jour, valeur)] des `days` derniers jours, jours sans événement à 0"""
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    values = dict(db.session.query(StatistiqueJournaliere.jour, StatistiqueJournaliere.valeur).filter(
+        StatistiqueJournaliere.metrique == metrique,
+        StatistiqueJournaliere.jour >= first_day
+    ).all())
+    return [(first_day + timedelta(days=i), values.get(first_day + timedelta(days=i), 0)) for i in range(days)]
+
+
+# État d'un traitement tel que compté par les compteurs journaliers (colonnes de la table traitements)
+TREATMENT_STATE_COLUMNS = (
+    Traitement.statut, Traitement.date_creation, Traitement.date_fin,
+    Traitement.nombre_pages, Traitement.nombre_employes_traites, Traitement.nombre_nouveaux_employes,
+)
+
+
+def treatment_state(traitement):
+    """Valeurs de TREATMENT_STATE_COLUMNS pour un Traitement chargé"""
+    return tuple(getattr(traitement, column.key) for column in TREATMENT_STATE_COLUMNS)
+
+
+def treatment_outcome_counters(state):
+    """{(jour, métrique): valeur} comptés pour l'issue d'un traitement (hors TRAITEMENTS_CREES).
+
+    Issue comptée au jour où elle a eu lieu ; rien tant que le traitement
+    n'est pas terminé, partiel ou en échec (ni pour state None).
+    """
+    if state is None:
+        return {}
+    statut, date_creation, date_fin, pages, processed, new_employees = state
+    end = date_fin or date_creation
+    if end is None:
+        return {}
+    end_day = end.date()
+    if statut == 'echec':
+        return {(end_day, TRAITEMENTS_ECHEC): 1}
+    if statut not in ('termine', 'partiel'):
+        return {}
+    return {
+        (end_day, TRAITEMENTS_TERMINES if statut == 'termine' else TRAITEMENTS_PARTIELS): 1,
+        (end_day, PAGES_ANALYSEES): pages or 0,
+        (end_day, FICHES_GENEREES): processed or 0,
+        (end_day, FICHES_TRAITEMENTS_TERMINES): (processed or 0) if statut == 'termine' else 0,
+        (end_day, NOUVEAUX_EMPLOYES): new_employees or 0,
+    }
+
+
+def record_treatment_transition(previous_state=None, new_state=None):
+    """Compteurs d'un traitement qui change d'état, dans la transaction en cours.
+
+    L'issue précédente (échec avant une reprise...) est retirée au jour où elle
+    avait été comptée, puis la nouvelle ajoutée : un traitement n'est compté
+    que dans son dernier état, comme par rebuild_daily_stats.
+    """
+    deltas = defaultdict(int)
+    for key, valeur in treatment_outcome_counters(previous_state).items():
+        deltas[key] -= valeur
+    for key, valeur in treatment_outcome_counters(new_state).items():
+        deltas[key] += valeur
+    by_day = defaultdict(dict)
+    for (jour, metrique), delta in deltas.items():
+        by_day[jour][metrique] = delta
+    for jour, counters in sorted(by_day.items()):
+        record_daily_stats(counters, jour)
+
+
+def rebuild_daily_stats():
+    """Recalcule les REBUILDABLE_METRICS depuis la table traitements (une transaction).
+
+    Retourne le nombre de lignes (jour, métrique) écrites.
+    """
+    totals = defaultdict(int)
+    rows = db.session.query(*TREATMENT_STATE_COLUMNS).execution_options(yield_per=1000)
+
+    for state in rows:
+        date_creation = state[1]
+        if date_creation is not None:
+            totals[(date_creation.date(), TRAITEMENTS_CREES)] += 1
+        for key, valeur in treatment_outcome_counters(tuple(state)).items():
+            totals[key] += valeur
+
+    now = datetime.utcnow()
+    StatistiqueJournaliere.query.filter(
+        StatistiqueJournaliere.metrique.in_(REBUILDABLE_METRICS)
+    ).delete(synchronize_session=False)
+    new_rows = [
+        {'jour': jour, 'metrique': metrique, 'valeur': valeur, 'date_maj': now}
+        for (jour, metrique), valeur in sorted(totals.items())
+        if valeur
+    ]
+    if new_rows:
+        db.session.execute(db.insert(StatistiqueJournaliere), new_rows)
+    db.session.commit()
+    return len(new_rows)
@@ -0,0 +1,183 @@
+# employee_directory.py
+"""Annuaire des employés en mémoire, partagé par tout le processus.
+
+Indexé par matricule et par nom normalisé : pendant un traitement, la
+résolution des employés ne coûte plus aucune requête. Chargé à la première
+utilisation, mis à jour sur place par les écritures de l'application ; un
+numéro de version en base (versions_cache) permet aux autres processus de
+détecter que leur copie est périmée et de la recharger.
+"""
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Employee, VersionCache
+
+EmployeeEntry = namedtuple('EmployeeEntry', ['id', 'matricule', 'nom_employe', 'email', 'statut', 'source_creation'])
+
+# Modifications préparées avant commit, appliquées au cache après commit
+PendingChanges = namedtuple('PendingChanges', ['entries', 'version'])
+
+VERSION_KEY = 'employees'
+
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def normalize_name(name):
+    """Nom comparable : espaces multiples réduits, majuscules"""
+    return " ".join((name or '').split()).upper()
+
+
+def entry_from_employee(employee):
+    return EmployeeEntry(
+        employee.id,
+        employee.matricule,
+        employee.nom_employe,
+        employee.email,
+        employee.statut,
+        employee.source_creation
+    )
+
+
+def _bump_version():
+    """Incrémente la version de l'annuaire dans la transaction en cours.
+
+    INSERT ... ON CONFLICT DO UPDATE : la première écriture crée la ligne sans
+    course entre deux processus (un UPDATE puis INSERT pourrait insérer deux fois).
+    """
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(VersionCache).values(cle=VERSION_KEY, version=1, date_maj=datetime.utcnow())
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['cle'],
+            set_={'version': VersionCache.version + 1, 'date_maj': statement.excluded.date_maj}
+        ))
+        return
+
+    # Autres bases : UPDATE puis INSERT si la ligne n'existe pas encore
+    updated = VersionCache.query.filter_by(cle=VERSION_KEY).update(
+        {'version': VersionCache.version + 1, 'date_maj': datetime.utcnow()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.session.add(VersionCache(cle=VERSION_KEY, version=1))
+        db.session.flush()
+
+
+class EmployeeDirectory:
+    """Cache process-wide des employés (par id, matricule et nom normalisé)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_matricule = {}
+        self._by_name = {}  # nom normalisé -> {id: entrée} : les homonymes sont tous indexés
+        self._version = None  # None = pas encore chargé
+
+    # ---- Chargement / fraîcheur ----
+
+    def _read_version(self):
+        # Requête explicite (pas session.get) : l'identity map pourrait rendre une version périmée
+        return db.session.query(VersionCache.version).filter_by(cle=VERSION_KEY).scalar() or 0
+
+    def reload(self):
+        """Recharge tout l'annuaire depuis la base (une requête)"""
+        with self._lock:
+            version = self._read_version()
+            rows = db.session.query(
+                Employee.id, Employee.matricule, Employee.nom_employe,
+                Employee.email, Employee.statut, Employee.source_creation
+            ).all()
+            self._by_id = {}
+            self._by_matricule = {}
+            self._by_name = {}
+            for row in rows:
+                self._index(EmployeeEntry(*row))
+            self._version = version
+
+    def ensure_fresh(self):
+        """Charge l'annuaire si besoin, ou le recharge si un autre processus l'a modifié.
+
+        Une seule lecture de la version en base : à appeler une fois par traitement.
+        """
+        with self._lock:
+            if self._version is None or self._read_version() != self._version:
+                self.reload()
+
+    def invalidate(self):
+        """Force le rechargement à la prochaine utilisation"""
+        with self._lock:
+            self._version = None
+
+    # ---- Lecture (aucune requête une fois chargé) ----
+
+    def get_by_matricule(self, matricule, active_only=True):
+        entry = self._by_matricule.get(matricule)
+        if entry and active_only and entry.statut != 'actif':
+            return None
+        return entry
+
+    def get_by_name(self, name, active_only=True):
+        """Employé portant ce nom ; None si aucun, ou si plusieurs (homonymes : seul le matricule les départage)"""
+        entries = [
+            entry for entry in self._by_name.get(normalize_name(name), {}).values()
+            if not active_only or entry.statut == 'actif'
+        ]
+        return entries[0] if len(entries) == 1 else None
+
+    def matricules(self):
+        return set(self._by_matricule)
+
+    def active_entries(self):
+        return [entry for entry in self._by_id.values() if entry.statut == 'actif']
+
+    def __len__(self):
+        return len(self._by_id)
+
+    # ---- Écritures de l'application ----
+
+    def stage_changes(self, employees):
+        """À appeler AVANT le commit : flush, incrémente la version en base dans la
+        même transaction et capture l'état des employés modifiés."""
+        db.session.flush()
+        _bump_version()
+        version = self._read_version()
+        return PendingChanges([entry_from_employee(emp) for emp in employees], version)
+
+    def apply(self, changes):
+        """À appeler APRÈS le commit : met à jour le cache sur place.
+
+        Si la version a bougé entre-temps (écriture d'un autre processus), le
+        cache est simplement marqué périmé et sera rechargé."""
+        with self._lock:
+            if self._version is None:
+                return
+            if changes.version != self._version + 1:
+                self._version = None
+                return
+            for entry in changes.entries:
+                self._index(entry)
+            self._version = changes.version
+
+    # ---- Interne ----
+
+    def _index(self, entry):
+        previous = self._by_id.get(entry.id)
+        if previous:
+            if self._by_matricule.get(previous.matricule) is previous:
+                del self._by_matricule[previous.matricule]
+            previous_name = normalize_name(previous.nom_employe)
+            same_name = self._by_name.get(previous_name)
+            if same_name is not None:
+                same_name.pop(previous.id, None)
+                if not same_name:
+                    del self._by_name[previous_name]
+        self._by_id[entry.id] = entry
+        if entry.matricule:
+            self._by_matricule[entry.matricule] = entry
+        self._by_name.setdefault(normalize_name(entry.nom_employe), {})[entry.id] = entry
@@ -0,0 +1,324 @@
+# employee_import.py
+"""Import en masse d'employés depuis un CSV (interface d'administration et migrate_csv_to_db.py).
+
+Le fichier est lu au fil de l'eau et chargé par lots : pour chaque lot, une
+requête lit les matricules déjà connus (rapport créés / mis à jour), puis un
+seul INSERT multi-lignes ... ON CONFLICT (matricule) écrit tout le lot.
+Chaque ligne rejetée (champ manquant, doublon dans le fichier, refus de la
+base) est rapportée avec son numéro de ligne ; les autres sont importées.
+
+Ancien format sans matricule (nom_employe, email : employees.csv d'origine) :
+les employés dont le nom est déjà en base sont ignorés, les autres créés avec
+un matricule temporaire TEMP<id>, comme par populate_matricules.py.
+"""
+import csv
+import secrets
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from models import db, Employee
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Conflit sur le matricule : mettre à jour nom/email/statut, ou laisser l'existant
+ON_CONFLICT_MODES = ('mettre_a_jour', 'ignorer')
+
+REQUIRED_COLUMNS = ('matricule', 'nom_employe', 'email')
+LEGACY_COLUMNS = ('nom_employe', 'email')
+VALID_STATUSES = ('actif', 'inactif')
+
+# Longueurs des colonnes (models.Employee)
+MAX_LENGTHS = {'matricule': 20, 'nom_employe': 200, 'email': 200}
+
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+ImportRowError = namedtuple('ImportRowError', ['ligne', 'matricule', 'message'])
+
+# Résultat de insert_new_employees : lignes insérées (id, matricule, nom_employe,
+# email, statut, source_creation) et matricules déjà présents en base
+NewEmployeesResult = namedtuple('NewEmployeesResult', ['inserted', 'existing'])
+
+
+class ImportReport:
+    """Bilan d'un import : compteurs et erreurs ligne par ligne"""
+
+    def __init__(self):
+        self.lignes = 0
+        self.crees = 0
+        self.mis_a_jour = 0
+        self.ignores = 0
+        self.erreurs = []
+
+    def add_error(self, ligne, matricule, message):
+        self.erreurs.append(ImportRowError(ligne, matricule, message))
+
+    @property
+    def importes(self):
+        return self.crees + self.mis_a_jour
+
+    def write_errors_csv(self, file):
+        writer = csv.writer(file)
+        writer.writerow(['Ligne', 'Matricule', 'Erreur'])
+        for erreur in self.erreurs:
+            writer.writerow([erreur.ligne, erreur.matricule or '', erreur.message])
+
+    def __repr__(self):
+        return (f'<ImportReport {self.lignes} lignes: {self.crees} créés, {self.mis_a_jour} mis à jour, '
+                f'{self.ignores} ignorés, {len(self.erreurs)} erreurs>')
+
+
+def open_csv(text_stream):
+    """DictReader sur un flux texte, séparateur détecté (',' ';' ou tabulation)"""
+    sample = text_stream.read(4096)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return csv.DictReader(_chain(sample, text_stream), dialect=dialect)
+
+
+def _chain(sample, text_stream):
+    # Rejoue l'échantillon lu par le Sniffer puis le reste du flux, ligne par ligne
+    lines = sample.splitlines(keepends=True)
+    if lines and not lines[-1].endswith(('\n', '\r')):
+        lines[-1] += text_stream.readline()
+    yield from lines
+    yield from text_stream
+
+
+def _validate(line_number, row, seen_matricules, report, columns=REQUIRED_COLUMNS):
+    """Ligne normalisée pour l'insertion, ou None (erreur rapportée).
+
+    Ancien format (columns=LEGACY_COLUMNS) : matricule vide, doublons détectés sur le nom.
+    """
+    values = {column: (row.get(column) or '').strip() for column in columns}
+    values.setdefault('matricule', '')
+    matricule = values['matricule']
+
+    missing = [column for column in columns if not values[column]]
+    if missing:
+        report.add_error(line_number, matricule, f"Champ(s) obligatoire(s) manquant(s) : {', '.join(missing)}")
+        return None
+    too_long = [column for column, max_length in MAX_LENGTHS.items() if len(values[column]) > max_length]
+    if too_long:
+        report.add_error(line_number, matricule, f"Valeur trop longue : {', '.join(too_long)}")
+        return None
+    if '@' not in values['email']:
+        report.add_error(line_number, matricule, f"Email invalide : {values['email']}")
+        return None
+
+    statut = (row.get('statut') or '').strip() or 'actif'
+    if statut not in VALID_STATUSES:
+        report.add_error(line_number, matricule, f"Statut invalide : {statut}")
+        return None
+
+    key = matricule or values['nom_employe']
+    first_line = seen_matricules.get(key)
+    if first_line is not None:
+        report.add_error(line_number, matricule, f"{'Matricule' if matricule else 'Nom'} déjà présent ligne {first_line}")
+        return None
+    seen_matricules[key] = line_number
+
+    return values['matricule'], values['nom_employe'], values['email'], statut
+
+
+def _upsert_statement(on_conflict):
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        return None
+    statement = insert(Employee)
+    if on_conflict == 'ignorer':
+        return statement.on_conflict_do_nothing(index_elements=['matricule'])
+    return statement.on_conflict_do_update(
+        index_elements=['matricule'],
+        set_={
+            'nom_employe': statement.excluded.nom_employe,
+            'email': statement.excluded.email,
+            'statut': statement.excluded.statut,
+            'date_derniere_maj': statement.excluded.date_derniere_maj,
+        }
+    )
+
+
+def _write_rows(rows, existing, on_conflict):
+    statement = _upsert_statement(on_conflict)
+    if statement is not None:
+        # Paramètres passés à part : instruction compilée une fois (cache), envoyée
+        # en INSERT multi-lignes par SQLAlchemy (insertmanyvalues)
+        db.session.execute(statement, rows)
+        return
+
+    # Autres bases : INSERT des nouveaux, UPDATE des existants
+    new_rows = [row for row in rows if row['matricule'] not in existing]
+    if new_rows:
+        db.session.execute(db.insert(Employee), new_rows)
+    if on_conflict == 'mettre_a_jour':
+        for row in rows:
+            if row['matricule'] in existing:
+                Employee.query.filter_by(matricule=row['matricule']).update({
+                    'nom_employe': row['nom_employe'], 'email': row['email'],
+                    'statut': row['statut'], 'date_derniere_maj': row['date_derniere_maj']
+                }, synchronize_session=False)
+
+
+def _load_batch(batch, on_conflict, report, before_commit=None):
+    """Écrit un lot [(ligne, (matricule, nom, email, statut))] et le valide"""
+    now = datetime.utcnow()
+    rows = [
+        {'matricule': matricule, 'nom_employe': nom, 'email': email, 'statut': statut,
+         'source_creation': 'csv_import', 'date_creation': now, 'date_derniere_maj': now}
+        for _, (matricule, nom, email, statut) in batch
+    ]
+    existing = {
+        matricule for (matricule,) in db.session.query(Employee.matricule).filter(
+            Employee.matricule.in_([row['matricule'] for row in rows])
+        )
+    }
+
+    try:
+        _write_rows(rows, existing, on_conflict)
+        if before_commit:
+            before_commit()
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(batch) == 1:
+            line_number, (matricule, _, _, _) = batch[0]
+            report.add_error(line_number, matricule, f"Refusé par la base de données : {getattr(e, 'orig', e)}")
+            return
+        # Lot refusé : repris ligne par ligne pour isoler les lignes en cause
+        for item in batch:
+            _load_batch([item], on_conflict, report, before_commit)
+        return
+
+    report.crees += len(rows) - len(existing)
+    if on_conflict == 'ignorer':
+        report.ignores += len(existing)
+    else:
+        report.mis_a_jour += len(existing)
+
+
+def _load_legacy_batch(batch, report, before_commit=None):
+    """Ancien format : crée les employés absents (par nom) avec un matricule TEMP<id> et valide le lot"""
+    existing = {
+        nom for (nom,) in db.session.query(Employee.nom_employe).filter(
+            Employee.nom_employe.in_([nom for _, (_, nom, _, _) in batch])
+        )
+    }
+    new_items = [item for item in batch if item[1][1] not in existing]
+    now = datetime.utcnow()
+
+    try:
+        if new_items:
+            # Matricule provisoire unique le temps d'obtenir l'id, puis TEMP<id>
+            ids = db.session.execute(db.insert(Employee).returning(Employee.id), [
+                {'matricule': f"CSV{secrets.token_hex(8)}", 'nom_employe': nom, 'email': email, 'statut': statut,
+                 'source_creation': 'csv_import', 'date_creation': now, 'date_derniere_maj': now}
+                for _, (_, nom, email, statut) in new_items
+            ]).scalars().all()
+            db.session.execute(db.update(Employee), [
+                {'id': employee_id, 'matricule': f"TEMP{employee_id:04d}"} for employee_id in ids
+            ])
+        if before_commit:
+            before_commit()
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(batch) == 1:
+            line_number, _ = batch[0]
+            report.add_error(line_number, None, f"Refusé par la base de données : {getattr(e, 'orig', e)}")
+            return
+        for item in batch:
+            _load_legacy_batch([item], report, before_commit)
+        return
+
+    report.crees += len(new_items)
+    report.ignores += len(batch) - len(new_items)
+
+
+def import_employees_csv(text_stream, on_conflict='mettre_a_jour', batch_size=DEFAULT_BATCH_SIZE, before_commit=None):
+    """Importe un CSV (colonnes matricule, nom_employe, email, statut facultatif) et retourne un ImportReport.
+
+    Sans colonne matricule (ancien format), on_conflict est sans effet : un nom déjà en base est ignoré.
+    text_stream : flux texte (fichier ouvert en utf-8-sig, newline='')
+    before_commit : appelé avant chaque commit de lot (ex. version de l'annuaire)
+    """
+    if on_conflict not in ON_CONFLICT_MODES:
+        raise ValueError(f"Mode inconnu : {on_conflict}")
+
+    report = ImportReport()
+    reader = open_csv(text_stream)
+    fieldnames = reader.fieldnames or []
+    columns = REQUIRED_COLUMNS
+    if 'matricule' not in fieldnames and all(column in fieldnames for column in LEGACY_COLUMNS):
+        columns = LEGACY_COLUMNS
+    missing_columns = [column for column in columns if column not in fieldnames]
+    if missing_columns:
+        raise ValueError(f"Colonne(s) manquante(s) dans l'en-tête : {', '.join(missing_columns)}")
+
+    if columns is LEGACY_COLUMNS:
+        load_batch = lambda batch: _load_legacy_batch(batch, report, before_commit)
+    else:
+        load_batch = lambda batch: _load_batch(batch, on_conflict, report, before_commit)
+
+    seen_matricules = {}
+    batch = []
+    for row in reader:
+        report.lignes += 1
+        line_number = report.lignes + 1  # ligne 1 = en-tête
+        values = _validate(line_number, row, seen_matricules, report, columns)
+        if values is None:
+            continue
+        batch.append((line_number, values))
+        if len(batch) >= batch_size:
+            load_batch(batch)
+            batch = []
+    if batch:
+        load_batch(batch)
+
+    return report
+
+
+def insert_new_employees(rows):
+    """Insère les employés absents en une instruction INSERT ... ON CONFLICT (matricule) DO NOTHING RETURNING.
+
+    rows : dicts de colonnes Employee (matricule obligatoire), un seul par matricule.
+    Pas de commit ici. Seules les lignes réellement insérées par CETTE transaction
+    sont renvoyées : un matricule inséré entre-temps par un traitement concurrent
+    est rapporté comme existant, sans erreur ni annulation du lot.
+    """
+    if not rows:
+        return NewEmployeesResult([], [])
+
+    returned_columns = (
+        Employee.id, Employee.matricule, Employee.nom_employe,
+        Employee.email, Employee.statut, Employee.source_creation
+    )
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(Employee).on_conflict_do_nothing(
+            index_elements=['matricule']
+        ).returning(*returned_columns)
+        inserted = db.session.execute(statement, rows).all()
+    else:
+        # Autres bases : un SAVEPOINT par ligne, la violation d'unicité vaut « existant »
+        inserted = []
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    inserted.extend(db.session.execute(
+                        db.insert(Employee).returning(*returned_columns), [row]
+                    ).all())
+            except IntegrityError:
+                pass
+
+    inserted_matricules = {row.matricule for row in inserted}
+    existing = [row['matricule'] for row in rows if row['matricule'] not in inserted_matricules]
+    return NewEmployeesResult(inserted, existing)
+
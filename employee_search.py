@@ -0,0 +1,122 @@
+# employee_search.py
+"""Recherche d'employés par sous-chaîne (nom, email, matricule) et pagination par clé.
+
+Les ILIKE '%terme%' ne peuvent pas utiliser les index btree. Selon la base :
+ - PostgreSQL : index GIN pg_trgm sur les trois colonnes (migration
+   c3f9a1e7d254), que le planificateur utilise directement pour ILIKE ;
+ - SQLite : table FTS5 'employees_recherche' (tokenizer trigram), tenue à jour
+   par triggers, interrogée par MATCH ;
+ - autres bases, ou terme de moins de 3 caractères : ILIKE simple.
+
+Les pages sont découpées par clé (nom_employe, id) au lieu d'OFFSET : chaque
+page lit `per_page` lignes d'index, quelle que soit sa position dans la liste.
+"""
+import base64
+import json
+from collections import namedtuple
+
+from sqlalchemy import inspect, text
+
+from models import db, Employee
+
+FTS_TABLE = 'employees_recherche'
+
+# Un trigramme = 3 caractères : en dessous, aucun index n'aide
+MIN_INDEXED_TERM_LENGTH = 3
+
+EmployeePage = namedtuple('EmployeePage', ['items', 'next_cursor', 'prev_cursor'])
+
+_fts_available = {}  # url du moteur -> table FTS5 présente
+
+
+def _has_fts_table():
+    engine = db.session.get_bind()
+    key = str(engine.url)
+    if key not in _fts_available:
+        _fts_available[key] = inspect(engine).has_table(FTS_TABLE)
+    return _fts_available[key]
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_condition(term):
+    """Condition SQLAlchemy « terme contenu dans le nom, l'email ou le matricule »"""
+    term = (term or '').strip()
+    if not term:
+        return None
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite' and len(term) >= MIN_INDEXED_TERM_LENGTH and _has_fts_table():
+        # Phrase entre guillemets : recherche de sous-chaîne, insensible à la casse
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase").bindparams(phrase=phrase)
+        return Employee.id.in_(matches)
+
+    pattern = f'%{_escape_like(term)}%'
+    return db.or_(
+        Employee.nom_employe.ilike(pattern, escape='\\'),
+        Employee.email.ilike(pattern, escape='\\'),
+        Employee.matricule.ilike(pattern, escape='\\')
+    )
+
+
+def encode_cursor(employee):
+    """Position (nom_employe, id) d'un employé, opaque et utilisable dans une URL"""
+    raw = json.dumps([employee.nom_employe, employee.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        nom_employe, employee_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(nom_employe), int(employee_id)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def keyset_page(query, after=None, before=None, per_page=20):
+    """Page d'employés triés par (nom_employe, id), après ou avant un curseur.
+
+    Retourne EmployeePage(items, next_cursor, prev_cursor) ; un curseur vaut None
+    s'il n'y a rien dans cette direction.
+    """
+    sort_key = db.tuple_(Employee.nom_employe, Employee.id)
+    after_position = decode_cursor(after) if after else None
+    before_position = decode_cursor(before) if before and not after_position else None
+
+    if before_position:
+        # Page précédente : lecture à rebours puis remise dans l'ordre
+        rows = query.filter(sort_key < before_position).order_by(
+            Employee.nom_employe.desc(), Employee.id.desc()
+        ).limit(per_page + 1).all()
+        has_more_before = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        next_cursor = encode_cursor(items[-1]) if items else None
+        prev_cursor = encode_cursor(items[0]) if items and has_more_before else None
+        return EmployeePage(items, next_cursor, prev_cursor)
+
+    if after_position:
+        query = query.filter(sort_key > after_position)
+    rows = query.order_by(Employee.nom_employe.asc(), Employee.id.asc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > per_page else None
+    prev_cursor = encode_cursor(items[0]) if items and after_position else None
+    return EmployeePage(items, next_cursor, prev_cursor)
+
+
+def employee_counts():
+    """Total, actifs, importés d'un PDF et ajoutés à la main, en une requête"""
+    total, active, pdf_imported, manual = db.session.query(
+        db.func.count(Employee.id),
+        db.func.count(Employee.id).filter(Employee.statut == 'actif'),
+        db.func.count(Employee.id).filter(Employee.source_creation == 'pdf_import'),
+        db.func.count(Employee.id).filter(Employee.source_creation == 'manual'),
+    ).one()
+    return {
+        'total_employees': total,
+        'active_employees': active,
+        'pdf_imported': pdf_imported,
+        'manual_added': manual,
+    }
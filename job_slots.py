@@ -0,0 +1,89 @@
+# job_slots.py
+"""Créneaux de traitement partagés entre processus et machines (MAX_CONCURRENT_JOBS).
+
+Sous PostgreSQL, chaque créneau est un verrou consultatif de session
+(pg_try_advisory_lock(espace, numéro)) tenu par une connexion dédiée pendant
+tout le traitement : quel que soit le nombre de workers gunicorn ou de
+machines, au plus MAX_CONCURRENT_JOBS traitements tournent en même temps. Si
+le processus meurt, la connexion se ferme et le serveur libère le créneau.
+
+Les autres bases (SQLite en développement) n'ont pas de verrou partagé : la
+limite est appliquée par processus.
+"""
+import logging
+import threading
+
+from sqlalchemy import text
+
+# Premier argument de pg_try_advisory_lock(int, int) : espace réservé à PayFlow
+ADVISORY_LOCK_NAMESPACE = 0x50415946  # 'PAYF'
+
+
+class JobSlot:
+    """Créneau obtenu ; release() le rend (idempotent)"""
+
+    def __init__(self, number, release_callback):
+        self.number = number
+        self._release_callback = release_callback
+
+    def release(self):
+        if self._release_callback:
+            callback, self._release_callback = self._release_callback, None
+            callback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class JobSlots:
+    """Au plus max_slots créneaux occupés à la fois (tous processus confondus sous PostgreSQL)"""
+
+    def __init__(self, max_slots, namespace=ADVISORY_LOCK_NAMESPACE, logger=None):
+        self.max_slots = max(1, max_slots)
+        self.namespace = namespace
+        self.logger = logger or logging.getLogger('payflow.jobs')
+        self._local_slots = threading.BoundedSemaphore(self.max_slots)
+
+    def try_acquire(self, engine):
+        """JobSlot libre, ou None si tous les créneaux sont occupés (sans attendre)"""
+        if engine.dialect.name == 'postgresql':
+            return self._try_acquire_advisory(engine)
+        if self._local_slots.acquire(blocking=False):
+            return JobSlot(None, self._local_slots.release)
+        return None
+
+    def _try_acquire_advisory(self, engine):
+        connection = engine.connect()
+        try:
+            for number in range(self.max_slots):
+                acquired = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:namespace, :number)"),
+                    {'namespace': self.namespace, 'number': number}
+                ).scalar()
+                # Verrou de session : il survit au commit, la connexion ne reste pas « idle in transaction »
+                connection.commit()
+                if acquired:
+                    return JobSlot(number, lambda: self._release_advisory(connection, number))
+        except Exception:
+            connection.invalidate()
+            connection.close()
+            raise
+        connection.close()
+        return None
+
+    def _release_advisory(self, connection, number):
+        try:
+            connection.execute(
+                text("SELECT pg_advisory_unlock(:namespace, :number)"),
+                {'namespace': self.namespace, 'number': number}
+            )
+            connection.commit()
+        except Exception as e:
+            # Connexion jetée plutôt que rendue au pool : sa fermeture libère le verrou
+            self.logger.warning(f"Libération du créneau {number} impossible, connexion abandonnée: {e}")
+            connection.invalidate()
+        finally:
+            connection.close()
@@ -1,47 +1,73 @@
 # migrate_csv_to_db.py
-from app import create_app
-from models import db, Employee
-import csv
+"""Import en masse d'employés depuis un CSV (matricule, nom_employe, email, statut facultatif).
+
+    python migrate_csv_to_db.py [employees.csv] [--ignorer] [--rapport erreurs.csv]
+
+Le fichier est lu au fil de l'eau et chargé par lots (voir employee_import.py).
+L'ancien format nom_employe,email (employees.csv d'origine) reste accepté :
+employés absents créés avec un matricule temporaire TEMP<id>.
+"""
+import argparse
 import os
+import time
+
+from app import create_app, employee_directory
+from models import db
+from employee_import import import_employees_csv, DEFAULT_BATCH_SIZE
+
+
+def migrate_csv_to_postgresql(csv_path='employees.csv', on_conflict='mettre_a_jour',
+                              report_path=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Importe les employés du CSV en base"""
 
-def migrate_csv_to_postgresql():
-    """Migre les employés du CSV vers PostgreSQL"""
-    
     app = create_app('development')
     with app.app_context():
         try:
-            if not os.path.exists('employees.csv'):
-                print("❌ Fichier employees.csv non trouvé")
+            if not os.path.exists(csv_path):
+                print(f"❌ Fichier {csv_path} non trouvé")
                 return
-            
-            # Lecture du CSV existant
-            employees_added = 0
-            with open('employees.csv', 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                for row in reader:
-                    # Vérifier si l'employé existe déjà
-                    existing = Employee.query.filter_by(nom_employe=row['nom_employe']).first()
-                    
-                    if not existing:
-                        employee = Employee(
-                            nom_employe=row['nom_employe'],
-                            email=row['email'],
-                            statut='actif',
-                            source_creation='manual'
-                        )
-                        db.session.add(employee)
-                        employees_added += 1
-                        print(f"✅ Ajouté: {row['nom_employe']}")
-                    else:
-                        print(f"⚠️ Existe déjà: {row['nom_employe']}")
-            
-            db.session.commit()
-            print(f"\n🎉 Migration terminée: {employees_added} employés ajoutés en base PostgreSQL")
-            
+
+            start = time.time()
+            with open(csv_path, 'r', encoding='utf-8-sig', newline='') as file:
+                report = import_employees_csv(
+                    file,
+                    on_conflict=on_conflict,
+                    batch_size=batch_size,
+                    before_commit=lambda: employee_directory.stage_changes([])
+                )
+
+            print(f"\n🎉 Import terminé en {time.time() - start:.1f}s: {report.lignes} lignes lues")
+            print(f"   ✅ Créés: {report.crees}")
+            print(f"   🔄 Mis à jour: {report.mis_a_jour}")
+            print(f"   ⏭️ Ignorés (déjà en base): {report.ignores}")
+            print(f"   ❌ Erreurs: {len(report.erreurs)}")
+
+            for erreur in report.erreurs[:20]:
+                print(f"      ligne {erreur.ligne} ({erreur.matricule or '?'}): {erreur.message}")
+            if len(report.erreurs) > 20 and not report_path:
+                print(f"      ... utiliser --rapport pour les {len(report.erreurs) - 20} autres")
+
+            if report_path and report.erreurs:
+                with open(report_path, 'w', encoding='utf-8', newline='') as report_file:
+                    report.write_errors_csv(report_file)
+                print(f"📄 Rapport d'erreurs: {report_path}")
+
         except Exception as e:
-            print(f"❌ Erreur lors de la migration: {str(e)}")
+            print(f"❌ Erreur lors de l'import: {str(e)}")
             db.session.rollback()
 
 if __name__ == '__main__':
-    migrate_csv_to_postgresql()
+    parser = argparse.ArgumentParser(description="Import en masse d'employés depuis un CSV")
+    parser.add_argument('csv_path', nargs='?', default='employees.csv')
+    parser.add_argument('--ignorer', action='store_true',
+                        help="conserver les employés dont le matricule existe déjà (défaut : mise à jour)")
+    parser.add_argument('--rapport', help="écrire toutes les lignes en erreur dans ce fichier CSV")
+    parser.add_argument('--lot', type=int, default=DEFAULT_BATCH_SIZE, help="lignes par INSERT")
+    args = parser.parse_args()
+
+    migrate_csv_to_postgresql(
+        args.csv_path,
+        on_conflict='ignorer' if args.ignorer else 'mettre_a_jour',
+        report_path=args.rapport,
+        batch_size=args.lot
+    )
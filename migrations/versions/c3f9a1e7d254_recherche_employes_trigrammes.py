@@ -0,0 +1,70 @@
+"""Recherche d'employés indexée (pg_trgm, FTS5 trigram sous SQLite)
+
+Revision ID: c3f9a1e7d254
+Revises: b5e8d2f1c936
+Create Date: 2026-10-18 14:41:09.207315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f9a1e7d254'
+down_revision = 'b5e8d2f1c936'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('nom_employe', 'email', 'matricule')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # Index GIN trigrammes : utilisés par ILIKE '%terme%' (terme de 3 caractères ou plus)
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in SEARCH_COLUMNS:
+            op.create_index(
+                f'idx_employee_{column}_trgm', 'employees', [column], unique=False,
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+    elif dialect == 'sqlite':
+        # Table FTS5 à contenu externe (tokenizer trigram, SQLite >= 3.34), tenue à jour par triggers.
+        # Attention : une migration batch sur employees recrée la table et supprime ces triggers.
+        op.execute(
+            "CREATE VIRTUAL TABLE employees_recherche USING fts5("
+            "nom_employe, email, matricule, content='employees', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER employees_recherche_ai AFTER INSERT ON employees BEGIN "
+            "INSERT INTO employees_recherche(rowid, nom_employe, email, matricule) "
+            "VALUES (new.id, new.nom_employe, new.email, new.matricule); END"
+        )
+        op.execute(
+            "CREATE TRIGGER employees_recherche_ad AFTER DELETE ON employees BEGIN "
+            "INSERT INTO employees_recherche(employees_recherche, rowid, nom_employe, email, matricule) "
+            "VALUES ('delete', old.id, old.nom_employe, old.email, old.matricule); END"
+        )
+        op.execute(
+            "CREATE TRIGGER employees_recherche_au AFTER UPDATE ON employees BEGIN "
+            "INSERT INTO employees_recherche(employees_recherche, rowid, nom_employe, email, matricule) "
+            "VALUES ('delete', old.id, old.nom_employe, old.email, old.matricule); "
+            "INSERT INTO employees_recherche(rowid, nom_employe, email, matricule) "
+            "VALUES (new.id, new.nom_employe, new.email, new.matricule); END"
+        )
+        op.execute("INSERT INTO employees_recherche(employees_recherche) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for column in SEARCH_COLUMNS:
+            op.drop_index(f'idx_employee_{column}_trgm', table_name='employees')
+
+    elif dialect == 'sqlite':
+        for trigger in ('employees_recherche_ai', 'employees_recherche_ad', 'employees_recherche_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS employees_recherche")
@@ -29,6 +29,7 @@ class Employee(db.Model):
 
 # Index pour performance
 db.Index('idx_employee_matricule', Employee.matricule)
+db.Index('idx_employee_nom', Employee.nom_employe)
 
 
 class Traitement(db.Model):
@@ -48,6 +49,19 @@ class Traitement(db.Model):
     date_creation = db.Column(db.DateTime, default=datetime.utcnow)
     erreurs = db.Column(db.Text)
     
+    # Suivi de la file de traitement (en_attente -> en_cours -> termine/partiel/echec)
+    chemin_fichier = db.Column(db.String(1000))
+    etape = db.Column(db.String(30))
+    pages_analysees = db.Column(db.Integer, default=0)
+    pdfs_generes = db.Column(db.Integer, default=0)
+    date_debut = db.Column(db.DateTime)
+    date_fin = db.Column(db.DateTime)
+    date_maj = db.Column(db.DateTime)
+    traite_par = db.Column(db.String(100))  # worker qui a réservé le traitement (hôte:pid:thread)
+    date_heartbeat = db.Column(db.DateTime)  # signe de vie du worker pendant le traitement
+    empreinte_sha256 = db.Column(db.String(64), index=True)  # du PDF uploadé : détection des renvois à l'identique
+    plan_decoupage = db.Column(db.Text)  # JSON {nom: {pages, matricule, period}} : reprise sans réanalyse des pages ; mode flux : {'_flux': {'page_reprise': n}}
+    
     # Relations
     traitement_employes = db.relationship('TraitementEmploye', backref='traitement', lazy=True)
     
@@ -72,6 +86,95 @@ class TraitementEmploye(db.Model):
         return f'<TraitementEmploye {self.employe_id}>'
 
 
+class FichierGenere(db.Model):
+    """Manifeste des PDF individuels d'un traitement (écrit à la génération)"""
+    __tablename__ = 'fichiers_generes'
+    __table_args__ = (
+        db.UniqueConstraint('traitement_id', 'nom_fichier', name='uq_fichier_genere_traitement_nom'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    traitement_id = db.Column(db.Integer, db.ForeignKey('traitements.id'), nullable=False)
+    employe_id = db.Column(db.Integer, db.ForeignKey('employees.id'))  # None : employé inconnu
+    nom_employe_extrait = db.Column(db.String(200))
+    matricule_extrait = db.Column(db.String(20))
+    periode = db.Column(db.String(10))  # Format: YYYY_MM
+    nom_fichier = db.Column(db.String(500), nullable=False)
+    chemin_fichier = db.Column(db.String(1000), nullable=False)
+    taille_fichier = db.Column(db.BigInteger)
+    empreinte_sha256 = db.Column(db.String(64))
+    date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relations
+    traitement = db.relationship('Traitement', backref=db.backref('fichiers_generes', lazy=True))
+    employee = db.relationship('Employee')
+    
+    def __repr__(self):
+        return f'<FichierGenere {self.nom_fichier}>'
+
+
+class VersionCache(db.Model):
+    """Version des caches en mémoire partagés entre processus (annuaire employés...)"""
+    __tablename__ = 'versions_cache'
+    
+    cle = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    date_maj = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<VersionCache {self.cle}={self.version}>'
+
+
+class MetriquesTraitement(db.Model):
+    """Mesures d'une exécution de process_pdf (une ligne par exécution, reprises comprises)"""
+    __tablename__ = 'metriques_traitements'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    traitement_id = db.Column(db.Integer, db.ForeignKey('traitements.id'), nullable=False, index=True)
+    traite_par = db.Column(db.String(100))
+    statut = db.Column(db.String(20))  # termine / partiel / echec
+    date_debut = db.Column(db.DateTime)
+    date_fin = db.Column(db.DateTime)
+    
+    # Durées par étape, en millisecondes
+    duree_totale_ms = db.Column(db.Integer)
+    duree_extraction_ms = db.Column(db.Integer)
+    duree_analyse_ms = db.Column(db.Integer)
+    duree_employes_ms = db.Column(db.Integer)
+    duree_generation_pdf_ms = db.Column(db.Integer)
+    duree_enregistrement_ms = db.Column(db.Integer)
+    
+    # Volumes traités pendant l'exécution
+    pages_analysees = db.Column(db.Integer)
+    octets_lus = db.Column(db.BigInteger)
+    octets_ecrits = db.Column(db.BigInteger)
+    fiches_generees = db.Column(db.Integer)
+    liens_crees = db.Column(db.Integer)
+    pic_memoire_octets = db.Column(db.BigInteger)  # tracemalloc, None si désactivé
+    
+    traitement = db.relationship('Traitement', backref=db.backref('metriques', lazy=True))
+    
+    def __repr__(self):
+        return f'<MetriquesTraitement {self.traitement_id} {self.duree_totale_ms}ms>'
+
+
+class StatistiqueJournaliere(db.Model):
+    """Compteurs par jour et par métrique, incrémentés au fil des événements (voir daily_stats.py)"""
+    __tablename__ = 'statistiques_journalieres'
+    __table_args__ = (
+        db.UniqueConstraint('jour', 'metrique', name='uq_statistique_jour_metrique'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jour = db.Column(db.Date, nullable=False)
+    metrique = db.Column(db.String(50), nullable=False)
+    valeur = db.Column(db.BigInteger, nullable=False, default=0)
+    date_maj = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StatistiqueJournaliere {self.jour} {self.metrique}={self.valeur}>'
+
+
 import secrets
 from datetime import datetime, timedelta
 
@@ -85,6 +188,7 @@ class DownloadLink(db.Model):
     traitement_id = db.Column(db.Integer, db.ForeignKey('traitements.id'), nullable=False)
     nom_fichier = db.Column(db.String(500), nullable=False)
     chemin_fichier = db.Column(db.String(1000), nullable=False)
+    empreinte_sha256 = db.Column(db.String(64))  # calculée à la génération, sert d'ETag fort
     
     # Sécurité
     matricule_requis = db.Column(db.String(20), nullable=False)
@@ -118,6 +222,11 @@ class DownloadLink(db.Model):
             self.tentatives_acces < self.max_tentatives
         )
     
+    @property
+    def is_authorized(self):
+        """Matricule déjà vérifié pour ce lien (nombre_telechargements : anciens liens)"""
+        return self.date_premier_acces is not None or (self.nombre_telechargements or 0) > 0
+    
     @property
     def expires_in_days(self):
         """Nombre de jours avant expiration"""
@@ -129,6 +238,37 @@ class DownloadLink(db.Model):
     def __repr__(self):
         return f'<DownloadLink {self.token[:8]}... pour {self.employee.nom_employe}>'
 
+
+class EmailOutbox(db.Model):
+    """File d'envoi des emails (en_attente -> en_cours -> envoye / echec_definitif).
+
+    Alimentée dans la même transaction que les liens de téléchargement, vidée
+    par les expéditeurs en arrière-plan avec nouvelles tentatives espacées.
+    """
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    traitement_id = db.Column(db.Integer, db.ForeignKey('traitements.id'), nullable=False)
+    employe_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    download_link_id = db.Column(db.Integer, db.ForeignKey('download_links.id'), nullable=False)
+    destinataire = db.Column(db.String(200), nullable=False)
+
+    statut = db.Column(db.String(20), nullable=False, default='en_attente')
+    tentatives = db.Column(db.Integer, nullable=False, default=0)
+    max_tentatives = db.Column(db.Integer, nullable=False, default=6)
+    prochaine_tentative = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    derniere_erreur = db.Column(db.Text)
+    verrouille_par = db.Column(db.String(64))
+    date_verrouillage = db.Column(db.DateTime)
+
+    date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+    date_envoi = db.Column(db.DateTime)
+
+    download_link = db.relationship('DownloadLink', backref=db.backref('emails', lazy=True))
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.destinataire} {self.statut}>'
+
 # ✅ Relations à la fin du fichier models.py
 Employee.download_links = db.relationship('DownloadLink', backref='employee', lazy=True)
 Traitement.download_links = db.relationship('DownloadLink', backref='traitement', lazy=True)
@@ -136,9 +276,14 @@ Traitement.download_links = db.relationship('DownloadLink', backref='traitement'
     
 # Index pour améliorer les performances
 db.Index('idx_download_token', DownloadLink.token)
+db.Index('idx_download_traitement_fichier', DownloadLink.traitement_id, DownloadLink.nom_fichier)
 ##db.Index('idx_download_expires', DownloadLink.expires_at)
 db.Index('idx_employee_email', Employee.email)
 db.Index('idx_traitement_timestamp', Traitement.timestamp_folder)
+db.Index('idx_traitement_statut', Traitement.statut, Traitement.date_creation)
+db.Index('idx_traitement_date_creation', Traitement.date_creation, Traitement.id)
+db.Index('idx_email_outbox_statut', EmailOutbox.statut, EmailOutbox.prochaine_tentative)
+db.Index('idx_email_outbox_traitement', EmailOutbox.traitement_id)
 
 # Relations
 Employee.download_links = db.relationship('DownloadLink', backref='employee', lazy=True)
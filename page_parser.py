@@ -0,0 +1,116 @@
+# page_parser.py
+"""Analyse en une seule passe du texte d'une page de bulletin : nom, matricule et période.
+
+Remplace extract_employee_name_from_page, extract_employee_matricule_from_page et
+extract_period_from_page : mêmes règles et mêmes résultats, mais les lignes ne
+sont parcourues qu'une fois et les expressions régulières sont compilées au chargement.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime
+
+# Résultat compact d'une page (nom et matricule à None si non trouvés, période toujours renseignée)
+PageInfo = namedtuple('PageInfo', ['nom', 'matricule', 'periode'])
+
+MATRICULE_INLINE_RE = re.compile(r'Matricule\s+(\d+)')
+# Matricule seul en début de ligne suivante (format courant à 4 chiffres)
+MATRICULE_NEXT_LINE_RE = re.compile(r'^(\d{4})(?:\s|$)')
+
+# Formats de période, testés dans cet ordre sur chaque ligne
+PERIOD_DU_AU_2_DIGITS_RE = re.compile(r'Période du \d{2}/(\d{2})/(\d{2}) au')   # "Période du 01/08/25 au 31/08/25"
+PERIOD_DU_AU_4_DIGITS_RE = re.compile(r'Période du \d{2}/(\d{2})/(\d{4}) au')   # "Période du 01/08/2025 au 31/08/2025"
+PERIOD_DU_2_DIGITS_RE = re.compile(r'du \d{2}/(\d{2})/(\d{2}) au')              # "du 01/08/25 au 31/08/25"
+PERIOD_MOIS_RE = re.compile(r'Mois\s*:\s*(\d{2})/(\d{4})')                      # "Mois: 08/2025"
+PERIOD_ANY_DATE_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{2,4})')               # "31/08/25" ou "01/08/2025"
+
+
+def _full_year(year):
+    """Convertit une année à 2 chiffres en 4 chiffres (pivot 50)"""
+    if len(year) == 2:
+        return f"20{year}" if int(year) < 50 else f"19{year}"
+    return year
+
+
+def _period_from_line(line):
+    """Période YYYY_MM trouvée sur une ligne, ou None"""
+    match = PERIOD_DU_AU_2_DIGITS_RE.search(line)
+    if match:
+        return f"{_full_year(match.group(2))}_{match.group(1).zfill(2)}"
+    match = PERIOD_DU_AU_4_DIGITS_RE.search(line)
+    if match:
+        return f"{match.group(2)}_{match.group(1).zfill(2)}"
+    match = PERIOD_DU_2_DIGITS_RE.search(line)
+    if match:
+        return f"{_full_year(match.group(2))}_{match.group(1).zfill(2)}"
+    match = PERIOD_MOIS_RE.search(line)
+    if match:
+        return f"{match.group(2)}_{match.group(1).zfill(2)}"
+    match = PERIOD_ANY_DATE_RE.search(line)
+    if match:
+        return f"{_full_year(match.group(3))}_{match.group(2).zfill(2)}"
+    return None
+
+
+def _name_from_categorie_line(line, next_line):
+    """Nom après "M "/"Mme " sur la ligne "Catégorie", sinon sur la ligne suivante en majuscules"""
+    if " M " in line:
+        name = line.split(" M ")[1].strip()
+        if name and len(name) > 5:
+            return name
+    elif " Mme " in line:
+        name = line.split(" Mme ")[1].strip()
+        if name and len(name) > 5:
+            return name
+
+    if next_line is not None:
+        next_line = next_line.strip()
+        if next_line and len(next_line) > 5 and next_line.isupper():
+            return next_line
+    return None
+
+
+def _matricule_from_line(line, next_line):
+    """Matricule sur la ligne "Matricule", sinon en début de ligne suivante"""
+    match = MATRICULE_INLINE_RE.search(line)
+    if match:
+        return match.group(1)
+
+    if next_line is not None:
+        match = MATRICULE_NEXT_LINE_RE.search(next_line.strip())
+        if match:
+            return match.group(1)
+    return None
+
+
+def parse_page(page_text):
+    """Extrait nom, matricule et période d'une page en un seul parcours des lignes.
+
+    Pour chaque information, la première ligne qui la fournit l'emporte ; le
+    parcours s'arrête dès que les trois sont trouvées. Sans période détectée,
+    la période courante est retournée (comme l'ancien extract_period_from_page).
+    """
+    lines = page_text.split('\n')
+    last_index = len(lines) - 1
+    name = matricule = period = None
+
+    for i, raw_line in enumerate(lines):
+        line = raw_line.strip()
+        if not line:
+            continue
+        next_line = lines[i + 1] if i < last_index else None
+
+        if name is None and "Catégorie" in line:
+            name = _name_from_categorie_line(line, next_line)
+        if matricule is None and "Matricule" in line:
+            matricule = _matricule_from_line(line, next_line)
+        # Tous les formats de période contiennent un "/" : filtre bon marché avant les regex
+        if period is None and '/' in line:
+            period = _period_from_line(line)
+
+        if name is not None and matricule is not None and period is not None:
+            break
+
+    if period is None:
+        period = datetime.now().strftime('%Y_%m')
+
+    return PageInfo(name, matricule, period)
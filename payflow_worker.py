@@ -0,0 +1,46 @@
+# payflow_worker.py
+"""Processus worker autonome : exécute les traitements mis en file par l'application.
+
+    python payflow_worker.py [--threads N]
+
+Autant de processus que voulu, sur une ou plusieurs machines partageant la
+base et les dossiers uploads/output : chaque job est réservé par
+SELECT ... FOR UPDATE SKIP LOCKED, le worker signe sa présence sur le
+traitement (traite_par, date_heartbeat) et les jobs d'un worker arrêté net
+sont remis en file par les autres. Avec PROCESSING_IN_APP_WORKERS=false,
+l'application web ne fait plus que mettre en file.
+
+SIGTERM / Ctrl+C : plus de nouveau job, les traitements en cours se terminent.
+"""
+import argparse
+import signal
+
+import app as payflow
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de traitement PayFlow")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="traitements simultanés dans ce processus (défaut : PROCESSING_WORKERS)")
+    args = parser.parse_args()
+
+    def shutdown(signum, frame):
+        payflow.app.logger.info(f"Signal {signum} reçu : arrêt après les traitements en cours")
+        payflow.processing_stop.set()
+        payflow.processing_wakeup.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    payflow.start_processing_workers(args.threads)
+    print(f"🚀 Worker {payflow.worker_identity()} démarré ({len(payflow.processing_workers)} thread(s))")
+
+    # Attente interruptible : le thread principal doit rester disponible pour les signaux
+    while not payflow.processing_stop.wait(1):
+        pass
+    payflow.stop_processing_workers()
+    print("👋 Worker arrêté")
+
+
+if __name__ == '__main__':
+    main()
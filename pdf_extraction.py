@@ -0,0 +1,105 @@
+# pdf_extraction.py
+"""Extraction du texte des pages d'un PDF, en série ou sur un pool de processus.
+
+Le pool est lancé depuis un processus dédié (ce module exécuté comme script) :
+en 'spawn', chaque worker du pool réimporte le module principal de son parent
+(__mp_main__). Lancé directement depuis app.py ou payflow_worker.py, chaque
+worker recréerait l'application (Flask, moteur de base, journaux) ; ici il ne
+réimporte que ce module, sans dépendance à Flask. Surcoût par pool : un
+interpréteur et l'import de PyPDF2, négligeable au-delà de PDF_PARALLEL_MIN_PAGES.
+"""
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import PyPDF2
+
+
+def extract_pages_text_range(filepath, start, end):
+    """Extrait le texte des pages [start, end) - exécuté dans un processus worker.
+
+    Chaque worker ouvre le fichier lui-même : rien de PyPDF2 ne transite entre processus.
+    """
+    with open(filepath, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return start, [pdf_reader.pages[page_num].extract_text() for page_num in range(start, end)]
+
+
+def split_page_range(total_pages, workers, chunks_per_worker=4):
+    """Découpe [0, total_pages) en tranches contiguës (plusieurs par worker pour équilibrer la charge)"""
+    chunk_count = max(1, min(total_pages, workers * chunks_per_worker))
+    chunk_size, remainder = divmod(total_pages, chunk_count)
+    ranges = []
+    start = 0
+    for i in range(chunk_count):
+        end = start + chunk_size + (1 if i < remainder else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def iter_chunks_in_pool(filepath, total_pages, workers):
+    """Générateur des (début, textes) de chaque tranche, dans l'ordre où le pool les termine"""
+    # 'spawn' : l'application a des threads actifs, un fork pourrait hériter de verrous tenus
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [
+            executor.submit(extract_pages_text_range, filepath, start, end)
+            for start, end in split_page_range(total_pages, workers)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def extract_pages_text(filepath, total_pages, workers=1, min_pages=200, pdf_reader=None, on_progress=None):
+    """Retourne le texte de chaque page, dans l'ordre des pages.
+
+    - workers <= 1 ou fichier de moins de min_pages pages : extraction en série
+      (avec le pdf_reader déjà ouvert s'il est fourni)
+    - sinon : tranches de pages réparties sur un pool de processus, dans un
+      processus d'extraction dédié (voir main)
+    on_progress(pages_extraites) est appelé au fil de l'eau.
+    """
+    if workers <= 1 or total_pages < min_pages:
+        if pdf_reader is None:
+            return extract_pages_text_range(filepath, 0, total_pages)[1]
+        texts = []
+        for page_num in range(total_pages):
+            texts.append(pdf_reader.pages[page_num].extract_text())
+            if on_progress:
+                on_progress(page_num + 1)
+        return texts
+
+    texts = [None] * total_pages
+    done_pages = 0
+    command = [sys.executable, os.path.abspath(__file__), filepath, str(total_pages), str(workers)]
+    # stderr dans un fichier : avertissements PyPDF2 en quantité sans bloquer le tube de sortie
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as errors:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors,
+                              text=True, encoding='utf-8') as process:
+            for line in process.stdout:
+                start, chunk_texts = json.loads(line)
+                texts[start:start + len(chunk_texts)] = chunk_texts
+                done_pages += len(chunk_texts)
+                if on_progress:
+                    on_progress(done_pages)
+        if process.returncode != 0 or done_pages != total_pages:
+            errors.seek(0)
+            raise RuntimeError(f"Extraction parallèle interrompue (code {process.returncode}) : "
+                               f"{errors.read()[-2000:].strip()}")
+    return texts
+
+
+def main(argv=None):
+    """Processus d'extraction : une ligne JSON [début, textes] par tranche terminée sur la sortie standard"""
+    filepath, total_pages, workers = (argv or sys.argv[1:])[:3]
+    for start, chunk_texts in iter_chunks_in_pool(filepath, int(total_pages), int(workers)):
+        sys.stdout.write(json.dumps([start, chunk_texts]) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# pdf_streaming.py
+"""Lecture au fil de l'eau d'un PDF de paie, bloc d'employé par bloc d'employé.
+
+pdf_reader.pages construit un PageObject pour chaque page dès le premier accès
+(aplatissement de tout l'arbre des pages), et le PdfReader garde en cache
+chaque objet lu : la mémoire d'un traitement croît avec le nombre de pages.
+Ici l'arbre des pages est parcouru paresseusement, une page à la fois, et le
+cache du lecteur est vidé à chaque fin de bloc : seules les pages du bloc en
+cours sont en mémoire.
+
+Un bloc est une suite de pages consécutives portant le même nom d'employé
+(les pages sans nom sont ignorées, comme en mode standard). Reste en mémoire
+la table des références croisées du PDF (quelques dizaines d'octets par objet).
+
+Module volontairement sans dépendance à Flask, comme pdf_extraction.
+"""
+from collections import namedtuple
+from contextlib import nullcontext
+
+from PyPDF2 import PageObject
+from PyPDF2.generic import IndirectObject, NameObject
+
+from page_parser import parse_page
+
+# Attributs hérités des nœuds /Pages par les pages (PDF 1.7, 7.7.3.4)
+INHERITABLE_ATTRIBUTES = tuple(NameObject(name) for name in ('/Resources', '/MediaBox', '/CropBox', '/Rotate'))
+
+# Pages consécutives d'un employé : numéros à partir de 0, PageObject prêts pour un PdfWriter
+EmployeeBlock = namedtuple('EmployeeBlock', ['nom', 'matricule', 'periode', 'premiere_page', 'derniere_page', 'pages'])
+
+
+def count_pages(pdf_reader):
+    """Nombre de pages lu sur la racine de l'arbre (/Count), sans construire les pages"""
+    return int(pdf_reader.trailer['/Root'].get_object()['/Pages'].get_object()['/Count'])
+
+
+def _is_pages_node(node):
+    return node.get('/Type') == '/Pages' or ('/Type' not in node and '/Kids' in node)
+
+
+def iter_pages(pdf_reader, start=0):
+    """Générateur des (numéro, PageObject) à partir de la page start, dans l'ordre du document.
+
+    Les sous-arbres entièrement avant start sont sautés grâce à leur /Count,
+    sans lire leurs pages (reprise d'un traitement en milieu de fichier).
+    """
+    page_num = 0
+
+    def walk(reference, inherited):
+        nonlocal page_num
+        node = reference.get_object()
+        if _is_pages_node(node):
+            count = node.get('/Count')
+            if count is not None and page_num + int(count) <= start:
+                page_num += int(count)
+                return
+            inherited = dict(inherited)
+            for attribute in INHERITABLE_ATTRIBUTES:
+                if attribute in node:
+                    inherited[attribute] = node[attribute]
+            for kid in node.get('/Kids', []):
+                yield from walk(kid, inherited)
+            return
+
+        if page_num >= start:
+            # Comme PdfReader._flatten : attributs hérités recopiés sur la page
+            for attribute, value in inherited.items():
+                if attribute not in node:
+                    node[attribute] = value
+            page = PageObject(pdf_reader, reference if isinstance(reference, IndirectObject) else None)
+            page.update(node)
+            yield page_num, page
+        page_num += 1
+
+    yield from walk(pdf_reader.trailer['/Root'].get_object()['/Pages'], {})
+
+
+def iter_employee_blocks(pdf_reader, start_page=0, metrics=None, on_page=None):
+    """Générateur des EmployeeBlock du PDF, chacun produit dès que sa dernière page est lue.
+
+    Le bloc produit doit être exploité (PDF individuel écrit) avant de demander
+    le suivant : le cache d'objets du lecteur est alors vidé. Matricule et
+    période manquants sur la première page sont complétés par les suivantes.
+    metrics (ProcessingMetrics, facultatif) : temps d'extraction et d'analyse ;
+    on_page(numéro, PageInfo) est appelé pour chaque page lue.
+    """
+    stage = metrics.stage if metrics else (lambda name: nullcontext())
+    block = None
+    for page_num, page in iter_pages(pdf_reader, start_page):
+        with stage('extraction'):
+            page_text = page.extract_text()
+        with stage('analyse'):
+            info = parse_page(page_text)
+        if on_page:
+            on_page(page_num, info)
+        if not info.nom:
+            continue
+
+        if block is not None and block.nom == info.nom:
+            block.pages.append(page)
+            block = block._replace(derniere_page=page_num)
+            if not block.matricule and info.matricule:
+                block = block._replace(matricule=info.matricule)
+            if not block.periode and info.periode:
+                block = block._replace(periode=info.periode)
+            continue
+
+        if block is not None:
+            yield block
+            # Bloc écrit : ses pages et les objets lus pour elles peuvent être libérés
+            pdf_reader.resolved_objects.clear()
+        block = EmployeeBlock(info.nom, info.matricule, info.periode, page_num, page_num, [page])
+
+    if block is not None:
+        yield block
+        pdf_reader.resolved_objects.clear()
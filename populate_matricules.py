@@ -1,5 +1,5 @@
 # populate_matricules.py
-from app import create_app
+from app import create_app, employee_directory
 from models import db, Employee
 
 def populate_missing_matricules():
@@ -23,6 +23,8 @@ def populate_missing_matricules():
                 updated_count += 1
                 print(f"📝 {emp.nom_employe} -> {temp_matricule}")
             
+            # Version de l'annuaire incrémentée : les workers en cours rechargent leur copie
+            employee_directory.stage_changes(employees_without_matricule)
             db.session.commit()
             print(f"✅ {updated_count} matricules temporaires générés")
             
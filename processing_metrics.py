@@ -0,0 +1,105 @@
+# processing_metrics.py
+"""Mesures d'une exécution de process_pdf : durée par étape, compteurs et pic mémoire.
+
+Les durées sont cumulées par étape (time.perf_counter), les compteurs par nom ;
+le tout est enregistré en fin d'exécution dans MetriquesTraitement.
+
+Le pic mémoire vient de tracemalloc, qui est global au processus : il est
+démarré par la première mesure en cours et arrêté par la dernière. Avec
+plusieurs traitements simultanés dans un même processus, le pic relevé est
+celui du processus depuis le début de la première mesure en cours (un
+majorant) ; la mémoire des processus d'extraction parallèle (pdf_extraction)
+n'y figure pas.
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Étapes mesurées -> colonne de MetriquesTraitement
+STAGES = {
+    'extraction': 'duree_extraction_ms',
+    'analyse': 'duree_analyse_ms',
+    'employes': 'duree_employes_ms',
+    'generation_pdf': 'duree_generation_pdf_ms',
+    'enregistrement': 'duree_enregistrement_ms',
+}
+
+COUNTERS = ('pages_analysees', 'octets_lus', 'octets_ecrits', 'fiches_generees', 'liens_crees')
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started_here = False  # tracemalloc démarré par ce module (à arrêter par la dernière mesure)
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_started_here
+    with _tracing_lock:
+        if _tracing_users == 0:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                _tracing_started_here = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users, _tracing_started_here
+    with _tracing_lock:
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        _tracing_users = max(0, _tracing_users - 1)
+        if _tracing_users == 0 and _tracing_started_here:
+            tracemalloc.stop()
+            _tracing_started_here = False
+        return peak
+
+
+class ProcessingMetrics:
+    """Collecte des mesures d'une exécution ; start() puis stop() avant to_row()"""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.durations = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.peak_memory = None
+        self.started_at = None
+        self.finished_at = None
+        self._start = None
+        self._elapsed = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        if self.trace_memory:
+            _start_tracing()
+        return self
+
+    def stop(self):
+        """Arrête le chronomètre global et relève le pic mémoire (idempotent)"""
+        if self._elapsed is None and self._start is not None:
+            self._elapsed = time.perf_counter() - self._start
+            self.finished_at = time.time()
+            if self.trace_memory:
+                self.peak_memory = _stop_tracing()
+        return self
+
+    @contextmanager
+    def stage(self, name):
+        """Chronomètre une étape ; plusieurs passages dans la même étape s'additionnent"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] += time.perf_counter() - started
+
+    def add(self, counter, value=1):
+        self.counters[counter] += value
+
+    def to_row(self):
+        """Colonnes de MetriquesTraitement (durées en millisecondes)"""
+        row = {column: int(self.durations[name] * 1000) for name, column in STAGES.items()}
+        row.update(self.counters)
+        row['duree_totale_ms'] = int((self._elapsed or 0) * 1000)
+        row['pic_memoire_octets'] = self.peak_memory
+        return row
@@ -0,0 +1,34 @@
+# rebuild_statistics.py
+"""Recalcule les compteurs journaliers (statistiques_journalieres) depuis les tables brutes.
+
+À lancer après la migration qui crée la table (reprise de l'historique), puis
+en cas de dérive (traitement interrompu entre l'enregistrement et la finalisation...).
+Seules les métriques des traitements sont recalculées ; accès, téléchargements
+et nettoyages n'ont pas d'historique brut et sont conservés tels quels.
+"""
+from app import create_app
+from models import db
+from daily_stats import rebuild_daily_stats, daily_totals, REBUILDABLE_METRICS
+
+
+def rebuild_statistics():
+    app = create_app('development')
+    with app.app_context():
+        try:
+            print("🔄 Recalcul des statistiques journalières...")
+            written = rebuild_daily_stats()
+            print(f"✅ {written} compteur(s) jour/métrique réécrit(s)")
+
+            for metrique, total in daily_totals(REBUILDABLE_METRICS).items():
+                print(f"   {metrique}: {total}")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Erreur lors du recalcul: {str(e)}")
+
+
+if __name__ == '__main__':
+    print("🚀 PayFlow - Reconstruction des statistiques")
+    print("=" * 50)
+
+    rebuild_statistics()
@@ -0,0 +1,74 @@
+# resume_treatment.py
+"""Reprise d'un traitement interrompu (processus arrêté, échec en cours de route).
+
+    python resume_treatment.py 20250115143000_k3x9q      # exécute la reprise ici
+    python resume_treatment.py 20250115143000_k3x9q --en-file   # la confie aux workers
+    python resume_treatment.py --liste
+
+Le traitement reprend à son dernier point de reprise : plan de découpage relu,
+employés déjà présents dans le manifeste (fiche, lien et email validés) ignorés.
+Exécuté ici seulement si un créneau MAX_CONCURRENT_JOBS est libre, sinon laissé en file.
+"""
+import argparse
+import time
+
+import app as payflow
+from models import Traitement
+
+
+def list_resumable():
+    candidates = Traitement.query.filter(
+        Traitement.statut.in_(('echec', 'en_cours'))
+    ).order_by(Traitement.date_creation.desc()).all()
+    resumable = [t for t in candidates if payflow.is_treatment_resumable(t)]
+    if not resumable:
+        print("✅ Aucun traitement interrompu")
+    for traitement in resumable:
+        print(f"   {traitement.timestamp_folder}  {traitement.statut:<8}  "
+              f"{traitement.pdfs_generes or 0}/{traitement.nombre_employes_detectes or '?'} fiches  "
+              f"{traitement.fichier_original}")
+
+
+def resume(timestamp, queue_only=False):
+    traitement = Traitement.query.filter_by(timestamp_folder=timestamp).first()
+    if not traitement:
+        print(f"❌ Traitement {timestamp} non trouvé")
+        return False
+    if not payflow.requeue_treatment_for_resume(traitement):
+        print(f"❌ Traitement {timestamp} non interrompu ({traitement.statut}) ou PDF source supprimé")
+        return False
+    if queue_only:
+        print(f"📥 Traitement {timestamp} remis en file, repris par le prochain worker disponible")
+        return True
+
+    # Comme un worker : un créneau MAX_CONCURRENT_JOBS (tout le cluster) avant d'exécuter ici
+    slot = payflow.job_slots.try_acquire(payflow.db.engine)
+    if not slot:
+        print(f"📥 Aucun créneau de traitement libre : {timestamp} reste en file, "
+              f"repris par le prochain worker disponible")
+        return True
+    worker_id = payflow.worker_identity()
+    with slot:
+        if payflow.claim_next_job(worker_id, traitement_id=traitement.id) is None:
+            print(f"⏭️ Traitement {timestamp} déjà réservé par un worker")
+            return True
+        start = time.time()
+        payflow.run_processing_job(traitement.id, worker_id)
+    traitement = payflow.db.session.get(Traitement, traitement.id)
+    print(f"{'✅' if traitement.statut in ('termine', 'partiel') else '❌'} Traitement {timestamp} : "
+          f"{traitement.statut}, {traitement.nombre_employes_traites or 0} fiches, repris en {time.time() - start:.1f}s")
+    return traitement.statut in ('termine', 'partiel')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reprise d'un traitement interrompu")
+    parser.add_argument('timestamp', nargs='?', help="dossier du traitement (aaaammjjhhmmss_xxxxx)")
+    parser.add_argument('--en-file', action='store_true', help="remettre en file pour les workers au lieu d'exécuter ici")
+    parser.add_argument('--liste', action='store_true', help="lister les traitements interrompus")
+    args = parser.parse_args()
+
+    with payflow.app.app_context():
+        if args.liste or not args.timestamp:
+            list_resumable()
+        else:
+            resume(args.timestamp, queue_only=args.en_file)
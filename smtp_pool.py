@@ -0,0 +1,202 @@
+# smtp_pool.py
+"""Pool de connexions SMTP authentifiées réutilisées pendant tout un traitement.
+
+Évite une poignée de main TCP + STARTTLS + LOGIN par fiche de paie : quelques
+sessions restent ouvertes, sont reconnectées en cas de coupure et recyclées
+après max_messages_per_connection envois (limite courante des relais).
+"""
+import logging
+import smtplib
+import ssl
+import threading
+import time
+
+# Erreurs de transport : la connexion elle-même est inutilisable. Pas OSError :
+# toutes les exceptions smtplib en héritent, refus du serveur compris.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, ssl.SSLError)
+
+# Refus du message par le serveur (destinataire, expéditeur, contenu) : la session reste valide
+MESSAGE_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+# « Service non disponible, fermeture du canal » : le serveur coupe la session
+SMTP_CLOSING_CODE = 421
+
+
+class _PooledConnection:
+    def __init__(self, smtp, number):
+        self.smtp = smtp
+        self.number = number
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """Pool thread-safe de sessions SMTP (au plus `size` connexions ouvertes)"""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 size=3, max_messages_per_connection=100, timeout=30, logger=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = max(1, size)
+        self.max_messages_per_connection = max(1, max_messages_per_connection)
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger('payflow.smtp')
+
+        self._idle = []  # sessions libres (LIFO : la plus récente est réutilisée en premier)
+        self._lock = threading.Condition()
+        self._open_count = 0
+        self._closed = False
+        self._stats = {
+            'connections_opened': 0,
+            'connections_recycled': 0,
+            'reconnects': 0,
+            'messages_sent': 0,
+            'failures': 0,
+        }
+        self._sends_per_connection = {}
+
+    # ---- Cycle de vie ----
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Ferme toutes les sessions inactives (QUIT)"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._discard(connection, polite=True)
+
+    # ---- Envoi ----
+
+    def send(self, from_addr, to_addrs, message):
+        """Envoie un message (str) ; une reconnexion puis un nouvel essai si la session est tombée.
+
+        Les refus du message (destinataire, expéditeur, contenu) sont levés sans
+        nouvel essai, la session retournant au pool ; une erreur imprévue ferme
+        la session sans nouvel essai.
+        """
+        for attempt in (1, 2):
+            try:
+                connection = self._acquire()
+            except Exception:
+                self._count('failures')
+                raise
+            try:
+                connection.smtp.sendmail(from_addr, to_addrs, message)
+            except MESSAGE_ERRORS as e:
+                if getattr(e, 'smtp_code', None) != SMTP_CLOSING_CODE:
+                    self._count('failures')
+                    self._release(connection)
+                    raise
+                lost = e
+            except CONNECTION_ERRORS as e:
+                lost = e
+            except Exception:
+                self._count('failures')
+                self._discard(connection)
+                raise
+            else:
+                lost = None
+
+            if lost is not None:
+                self._discard(connection)
+                if attempt == 2:
+                    self._count('failures')
+                    raise lost
+                self.logger.warning(f"Session SMTP #{connection.number} perdue ({lost}), reconnexion")
+                self._count('reconnects')
+                continue
+
+            connection.sent += 1
+            with self._lock:
+                self._stats['messages_sent'] += 1
+                self._sends_per_connection[connection.number] = connection.sent
+            self._release(connection)
+            return
+
+    # ---- Métriques ----
+
+    @property
+    def metrics(self):
+        with self._lock:
+            sends = list(self._sends_per_connection.values())
+            metrics = dict(self._stats)
+        metrics['sends_per_connection'] = sends
+        metrics['avg_sends_per_connection'] = round(sum(sends) / len(sends), 1) if sends else 0
+        return metrics
+
+    # ---- Interne ----
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self._stats['connections_opened'] += 1
+            number = self._stats['connections_opened']
+            self._sends_per_connection[number] = 0
+        return _PooledConnection(smtp, number)
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._open_count < self.size:
+                    self._open_count += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise smtplib.SMTPException("Aucune session SMTP disponible dans le pool")
+                self._lock.wait(remaining)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._open_count -= 1
+                self._lock.notify()
+            raise
+
+    def _release(self, connection):
+        if connection.sent >= self.max_messages_per_connection:
+            with self._lock:
+                self._stats['connections_recycled'] += 1
+            self._discard(connection, polite=True)
+            return
+        with self._lock:
+            if not self._closed:
+                self._idle.append(connection)
+                self._lock.notify()
+                return
+        self._discard(connection, polite=True)
+
+    def _discard(self, connection, polite=False):
+        try:
+            if polite:
+                connection.smtp.quit()
+            else:
+                connection.smtp.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._open_count -= 1
+            self._lock.notify()
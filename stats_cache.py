@@ -0,0 +1,63 @@
+# stats_cache.py
+"""Cache mémoire à durée de vie courte pour les statistiques des tableaux de bord.
+
+Une valeur est calculée au plus une fois par TTL et par processus, même si
+plusieurs administrateurs rafraîchissent la page en même temps : les requêtes
+concurrentes attendent le premier calcul au lieu de le refaire. Les écritures de
+l'application vident le cache du processus ; la durée de vie borne le retard
+vu par les autres processus.
+"""
+import threading
+import time
+
+
+class TTLCache:
+    """Cache thread-safe {clé: valeur} avec expiration"""
+
+    def __init__(self, ttl_seconds=30):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = {}       # clé -> (expire_a, valeur)
+        self._key_locks = {}     # clé -> verrou de calcul
+        self._generation = 0     # incrémenté à chaque invalidation
+
+    def get_or_compute(self, key, compute):
+        """Valeur en cache, ou calculée par compute() (une seule fois pour les appels concurrents)"""
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            value = self._get(key)
+            if value is not None:
+                return value
+            generation = self._generation
+            value = compute()
+            with self._lock:
+                # Invalidé pendant le calcul : la valeur est servie mais pas conservée
+                if generation == self._generation and self.ttl_seconds > 0:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            return value
+
+    def invalidate(self, key=None):
+        """Oublie une clé, ou tout le cache"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
@@ -1,6 +1,7 @@
 # sync_filesystem_to_db.py
-from app import create_app
-from models import db, Traitement, Employee
+from app import create_app, parse_timestamp_folder
+from models import db, Traitement, Employee, TraitementEmploye, DownloadLink, FichierGenere
+import hashlib
 import os
 from datetime import datetime
 
@@ -15,6 +16,14 @@ def format_file_size(size_bytes):
         i += 1
     return f"{size_bytes:.1f} {size_names[i]}"
 
+def list_pdf_files(folder):
+    """(chemin, nom) des PDF d'un dossier, triés par nom"""
+    return [
+        (os.path.join(folder, filename), filename)
+        for filename in sorted(os.listdir(folder))
+        if filename.endswith('.pdf')
+    ]
+
 def migrate_existing_treatments():
     """Migre l'historique des traitements depuis le système de fichiers vers PostgreSQL"""
     
@@ -33,7 +42,7 @@ def migrate_existing_treatments():
             # Lister tous les dossiers timestampés
             folders = [f for f in os.listdir(uploads_path) 
                       if os.path.isdir(os.path.join(uploads_path, f)) 
-                      and len(f) == 14 and f.isdigit()]  # Format YYYYMMDDHHMMSS
+                      and parse_timestamp_folder(f)]  # Format YYYYMMDDHHMMSS[_xxxxx]
             
             print(f"📂 {len(folders)} dossiers de traitement trouvés")
             
@@ -44,7 +53,7 @@ def migrate_existing_treatments():
             for folder in sorted(folders):  # Tri chronologique
                 try:
                     # Parse du timestamp
-                    timestamp = datetime.strptime(folder, '%Y%m%d%H%M%S')
+                    timestamp = parse_timestamp_folder(folder)
                     
                     # Vérifier si ce traitement existe déjà
                     existing = Traitement.query.filter_by(timestamp_folder=folder).first()
@@ -125,6 +134,84 @@ def migrate_existing_treatments():
             print(f"❌ Erreur critique migration: {str(e)}")
             db.session.rollback()
 
+def file_sha256(file_path):
+    """Empreinte sha256 d'un fichier, lu par blocs"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def backfill_generated_files_manifest():
+    """Reconstitue le manifeste (fichiers_generes) des traitements antérieurs à sa création.
+    
+    Seul endroit où les dossiers output sont encore parcourus : une fois le
+    manifeste rempli, l'historique et les détails de traitement n'en ont plus besoin.
+    """
+    
+    app = create_app('development')
+    with app.app_context():
+        try:
+            output_path = app.config['OUTPUT_FOLDER']
+            
+            print("\n🔄 Reconstitution du manifeste des fichiers générés")
+            
+            with_manifest = db.session.query(FichierGenere.traitement_id).distinct()
+            traitements = Traitement.query.filter(
+                ~Traitement.id.in_(with_manifest)
+            ).order_by(Traitement.date_creation).all()
+            
+            backfilled_treatments = 0
+            backfilled_files = 0
+            
+            for traitement in traitements:
+                output_folder_path = os.path.join(output_path, traitement.timestamp_folder)
+                if not os.path.isdir(output_folder_path):
+                    continue
+                
+                # Employé de chaque fichier connu par les liens / liaisons du traitement
+                employees_by_file = {
+                    nom_fichier: employe_id
+                    for nom_fichier, employe_id in db.session.query(
+                        DownloadLink.nom_fichier, DownloadLink.employe_id
+                    ).filter(DownloadLink.traitement_id == traitement.id)
+                }
+                for nom_fichier, employe_id in db.session.query(
+                    TraitementEmploye.nom_fichier_genere, TraitementEmploye.employe_id
+                ).filter(TraitementEmploye.traitement_id == traitement.id):
+                    employees_by_file.setdefault(nom_fichier, employe_id)
+                
+                rows = []
+                for file_path, filename in list_pdf_files(output_folder_path):
+                    # Nom de fichier : NOM_EMPLOYE_YYYY_MM.pdf
+                    stem = filename[:-len('.pdf')]
+                    parts = stem.rsplit('_', 2)
+                    has_period = len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit()
+                    rows.append({
+                        'traitement_id': traitement.id,
+                        'employe_id': employees_by_file.get(filename),
+                        'nom_employe_extrait': (parts[0] if has_period else stem).replace('_', ' '),
+                        'periode': f"{parts[1]}_{parts[2]}" if has_period else None,
+                        'nom_fichier': filename,
+                        'chemin_fichier': file_path,
+                        'taille_fichier': os.path.getsize(file_path),
+                        'empreinte_sha256': file_sha256(file_path),
+                        'date_creation': traitement.date_creation
+                    })
+                
+                if rows:
+                    db.session.execute(db.insert(FichierGenere), rows)
+                    db.session.commit()
+                    backfilled_treatments += 1
+                    backfilled_files += len(rows)
+                    print(f"✅ {traitement.timestamp_folder}: {len(rows)} fichier(s) ajouté(s) au manifeste")
+            
+            print(f"\n📊 Manifeste: {backfilled_files} fichier(s) pour {backfilled_treatments} traitement(s)")
+            
+        except Exception as e:
+            print(f"❌ Erreur reconstitution manifeste: {str(e)}")
+            db.session.rollback()
+
 def verify_migration():
     """Vérifie que la migration s'est bien déroulée"""
     
@@ -158,6 +245,7 @@ if __name__ == '__main__':
     print("=" * 50)
     
     migrate_existing_treatments()
+    backfill_generated_files_manifest()
     
     print("\n" + "=" * 50)
     if verify_migration():
@@ -0,0 +1,105 @@
+# tests/conftest.py
+"""Fixtures communes : application sur une base SQLite jetable, dossiers temporaires.
+
+app.py crée son application à l'import (logs/ relatif au dossier courant) et lit
+email_config.py, fichier local non versionné : la session de tests travaille dans
+un dossier temporaire et fournit un email_config minimal s'il est absent.
+"""
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix='payflow-tests-')
+os.environ['DEV_DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'payflow.db')}"
+os.environ.setdefault('FLASK_ENV', 'development')
+os.chdir(WORKDIR)
+
+try:
+    import email_config  # noqa: F401
+except ImportError:
+    email_config = types.ModuleType('email_config')
+    email_config.GMAIL_CONFIG = {'smtp_server': '127.0.0.1', 'smtp_port': 25, 'username': 'tests@payflow.local',
+                                 'password': None, 'use_tls': False}
+    sys.modules['email_config'] = email_config
+
+import app as payflow  # noqa: E402
+from models import db, Employee  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Application sur une base vide ; aucun worker ni expéditeur d'emails en arrière-plan.
+
+    La configuration est restaurée après chaque test (réglages modifiés par un test).
+    """
+    saved_config = dict(payflow.app.config)
+    payflow.app.config.update(
+        TESTING=True,
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        OUTPUT_FOLDER=str(tmp_path / 'output'),
+        PROCESSING_IN_APP_WORKERS=False,
+        PROCESSING_TRACE_MEMORY=False,
+        PDF_EXTRACTION_WORKERS=1,
+        FILE_SERVING_MODE='direct',
+        DASHBOARD_CACHE_TTL_SEC=0,
+    )
+    monkeypatch.setattr(payflow, 'start_outbox_senders', lambda: None)
+    with payflow.app.app_context():
+        db.drop_all()
+        db.create_all()
+        payflow.employee_directory.invalidate()
+        yield payflow.app
+        db.session.remove()
+    payflow.app.config.clear()
+    payflow.app.config.update(saved_config)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_employee(app):
+    """Crée un employé actif (commit, annuaire mis à jour comme par l'administration)"""
+    def add(nom, matricule, email=None):
+        employee = Employee(nom_employe=nom, matricule=matricule, email=email or f'{matricule}@exemple.com',
+                            statut='actif', source_creation='tests')
+        db.session.add(employee)
+        changes = payflow.employee_directory.stage_changes([employee])
+        db.session.commit()
+        payflow.employee_directory.apply(changes)
+        return employee
+    return add
+
+
+@pytest.fixture
+def payroll_pdf(tmp_path):
+    """Écrit un PDF de paie synthétique ; retourne (chemin, employés générés)"""
+    from benchmarks.payroll_pdf import write_payroll_pdf
+
+    def write(pages=12, pages_per_employee=(1, 3), seed=7, name='paie.pdf'):
+        path = str(tmp_path / name)
+        return path, write_payroll_pdf(path, pages, pages_per_employee, seed)
+    return write
+
+
+@pytest.fixture
+def process(app):
+    """Met un PDF en file et l'exécute comme un worker ; retourne le Traitement"""
+    from models import Traitement
+
+    def run(path):
+        timestamp_folder = payflow.reserve_timestamp_folder()
+        traitement = payflow.enqueue_processing_job(path, timestamp_folder)
+        traitement_id = payflow.claim_next_job('tests', traitement_id=traitement.id)
+        payflow.run_processing_job(traitement_id, 'tests')
+        db.session.expire_all()
+        return db.session.get(Traitement, traitement_id)
+    return run
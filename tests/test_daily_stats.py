@@ -0,0 +1,74 @@
+# tests/test_daily_stats.py
+"""Compteurs journaliers : totaux du tableau de bord alimentés par les événements"""
+from datetime import datetime
+
+import app as payflow
+import daily_stats
+from models import db, Traitement, StatistiqueJournaliere
+
+
+def test_dashboard_totals_separate_employees_from_files_of_completed_treatments(app, payroll_pdf, process, add_employee):
+    path, employees = payroll_pdf(pages=6)
+    for employee in employees:
+        add_employee(employee.nom, employee.matricule)
+    assert process(path).statut == 'termine'
+
+    stats = payflow.calculate_stats_from_db()
+    assert stats['total_employees'] == stats['total_files_generated'] == len(employees)
+
+    # Traitement partiel : ses employés comptent, pas ses fiches
+    db.session.add(Traitement(timestamp_folder='20240101_000000', statut='partiel', nombre_pages=3,
+                              nombre_employes_traites=2, date_creation=datetime.utcnow(), date_fin=datetime.utcnow()))
+    db.session.commit()
+    daily_stats.rebuild_daily_stats()
+
+    stats = payflow.calculate_stats_from_db()
+    assert stats['total_treatments'] == 2
+    assert stats['total_employees'] == len(employees) + 2
+    assert stats['total_files_generated'] == len(employees)
+
+
+def live_counters():
+    db.session.expire_all()
+    return {
+        (row.jour, row.metrique): row.valeur
+        for row in StatistiqueJournaliere.query.filter(
+            StatistiqueJournaliere.metrique.in_(daily_stats.REBUILDABLE_METRICS)
+        )
+        if row.valeur
+    }
+
+
+def test_treatment_resumed_after_failure_counts_only_in_its_final_status(app, payroll_pdf, add_employee, monkeypatch):
+    app.config['PERSISTENCE_BATCH_SIZE'] = 1
+    path, employees = payroll_pdf(pages=6)
+    for employee in employees:
+        add_employee(employee.nom, employee.matricule)
+    original = payflow.checkpoint_treatment_results
+    calls = []
+
+    def fail_on_second_batch(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("panne de base")
+        return original(*args, **kwargs)
+    monkeypatch.setattr(payflow, 'checkpoint_treatment_results', fail_on_second_batch)
+
+    traitement = payflow.enqueue_processing_job(path, payflow.reserve_timestamp_folder())
+    payflow.run_processing_job(payflow.claim_next_job('tests', traitement_id=traitement.id), 'tests')
+    db.session.expire_all()
+    assert traitement.statut == 'echec'
+    assert payflow.compute_v12_dashboard_stats()['failed_treatments'] == 1
+
+    assert payflow.requeue_treatment_for_resume(traitement)
+    payflow.run_processing_job(payflow.claim_next_job('tests', traitement_id=traitement.id), 'tests')
+    db.session.expire_all()
+    assert traitement.statut == 'termine'
+
+    stats = payflow.compute_v12_dashboard_stats()
+    assert stats['successful_treatments'] == 1 and stats['failed_treatments'] == 0
+    assert payflow.calculate_stats_from_db()['success_rate'] == 100
+    live = live_counters()
+    assert live[(traitement.date_fin.date(), daily_stats.FICHES_GENEREES)] == len(employees)
+    daily_stats.rebuild_daily_stats()
+    assert live_counters() == live
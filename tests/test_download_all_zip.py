@@ -0,0 +1,39 @@
+# tests/test_download_all_zip.py
+"""Archive « Télécharger tout » envoyée en flux"""
+import io
+import os
+import zipfile
+
+from models import FichierGenere
+from zip_stream import stream_zip
+
+
+def test_stream_zip_skips_file_missing_at_read_time(tmp_path):
+    present = tmp_path / 'present.pdf'
+    present.write_bytes(b'%PDF-1.4 contenu')
+    missing = []
+
+    archive = b''.join(stream_zip(
+        [(str(tmp_path / 'disparu.pdf'), 'disparu.pdf'), (str(present), 'present.pdf')],
+        on_missing=lambda path, error: missing.append(path)
+    ))
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == ['present.pdf']
+    assert missing == [str(tmp_path / 'disparu.pdf')]
+
+
+def test_download_all_omits_files_deleted_from_disk(client, payroll_pdf, process):
+    path, employees = payroll_pdf(pages=6, pages_per_employee=(1, 1))
+    traitement = process(path)
+    files = FichierGenere.query.filter_by(traitement_id=traitement.id).order_by(FichierGenere.nom_fichier).all()
+    os.remove(files[0].chemin_fichier)
+
+    response = client.get(f'/admin/treatment/{traitement.timestamp_folder}/download-all')
+
+    assert response.status_code == 200
+    assert f'_{len(files) - 1}files.zip' in response.headers['Content-Disposition']
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == [f.nom_fichier for f in files[1:]]
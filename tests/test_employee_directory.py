@@ -0,0 +1,92 @@
+# tests/test_employee_directory.py
+"""Annuaire des employés en mémoire : index par nom (homonymes) et fraîcheur entre processus"""
+from employee_directory import EmployeeDirectory
+from models import db, Employee
+
+
+def edit(directory, employee, **fields):
+    """Modification comme par l'administration : version incrémentée, cache mis à jour après commit"""
+    for field, value in fields.items():
+        setattr(employee, field, value)
+    changes = directory.stage_changes([employee])
+    db.session.commit()
+    directory.apply(changes)
+
+
+def test_homonyms_are_ambiguous_by_name(app, add_employee):
+    add_employee('KOUASSI JEAN', '1001')
+    add_employee('Kouassi  Jean', '1002')
+    directory = EmployeeDirectory()
+    directory.ensure_fresh()
+
+    assert directory.get_by_name('KOUASSI JEAN') is None
+    assert directory.get_by_matricule('1002').nom_employe == 'Kouassi  Jean'
+
+
+def test_renaming_first_homonym_keeps_the_other_reachable(app, add_employee):
+    first = add_employee('DIALLO AWA', '2001')
+    add_employee('DIALLO AWA', '2002')
+    directory = EmployeeDirectory()
+    directory.ensure_fresh()
+
+    edit(directory, first, nom_employe='DIALLO AWA MARIE')
+
+    assert directory.get_by_name('DIALLO AWA').matricule == '2002'
+    assert directory.get_by_name('diallo awa marie').matricule == '2001'
+
+
+def test_soft_deleted_homonym_is_ignored_by_name(app, add_employee):
+    first = add_employee('TRAORE LUC', '3001')
+    add_employee('TRAORE LUC', '3002')
+    directory = EmployeeDirectory()
+    directory.ensure_fresh()
+
+    edit(directory, first, statut='supprime')
+
+    assert directory.get_by_name('TRAORE LUC').matricule == '3002'
+    assert directory.get_by_name('TRAORE LUC', active_only=False) is None
+
+
+def test_other_process_writes_trigger_reload(app, add_employee):
+    directory = EmployeeDirectory()
+    directory.ensure_fresh()
+    other_process = EmployeeDirectory()
+    other_process.ensure_fresh()
+
+    add_employee('MOREAU PAUL', '4001')  # écrit via l'annuaire du processus de l'application
+    employee = Employee(nom_employe='LEROY SOPHIE', matricule='4002', email='4002@exemple.com', statut='actif')
+    db.session.add(employee)
+    changes = other_process.stage_changes([employee])
+    db.session.commit()
+    other_process.apply(changes)
+
+    directory.ensure_fresh()
+    assert directory.get_by_matricule('4001') and directory.get_by_matricule('4002')
+
+
+def test_version_row_is_created_then_incremented(app):
+    from employee_directory import VERSION_KEY
+    from models import VersionCache
+    directory = EmployeeDirectory()
+
+    first = directory.stage_changes([])
+    db.session.commit()
+    second = directory.stage_changes([])
+    db.session.commit()
+
+    assert (first.version, second.version) == (1, 2)
+    assert VersionCache.query.filter_by(cle=VERSION_KEY).count() == 1
+
+
+def test_populate_matricules_invalidates_running_directories(app, add_employee):
+    from populate_matricules import populate_missing_matricules
+    employee = add_employee('NGUYEN ADAMA', '5001')
+    employee.matricule = ''
+    db.session.commit()
+    directory = EmployeeDirectory()
+    directory.ensure_fresh()
+
+    populate_missing_matricules()
+
+    directory.ensure_fresh()
+    assert directory.get_by_matricule(f'TEMP{employee.id:04d}').nom_employe == 'NGUYEN ADAMA'
@@ -0,0 +1,42 @@
+# tests/test_employee_import.py
+"""Import CSV d'employés : format avec matricule et ancien format nom_employe,email"""
+import io
+import os
+
+import pytest
+
+from employee_import import import_employees_csv
+from models import db, Employee
+
+
+def test_import_with_matricule_creates_and_updates(app, add_employee):
+    add_employee('DUPONT JEAN', '2001', 'ancien@example.com')
+    csv_text = "matricule,nom_employe,email\n2001,DUPONT JEAN,nouveau@example.com\n2002,MARTIN PAUL,paul@example.com\n"
+
+    report = import_employees_csv(io.StringIO(csv_text))
+
+    assert (report.crees, report.mis_a_jour, report.erreurs) == (1, 1, [])
+    db.session.expire_all()
+    assert Employee.query.filter_by(matricule='2001').one().email == 'nouveau@example.com'
+
+
+def test_legacy_csv_without_matricule_gets_temporary_matricules(app, add_employee):
+    add_employee('POKAM MARCEL JOEL', '1001')
+    with open(os.path.join(os.path.dirname(__file__), os.pardir, 'employees.csv'), encoding='utf-8-sig', newline='') as repo_csv:
+        header = repo_csv.readline()
+    assert header.strip() == 'nom_employe,email'
+    csv_text = (header + "POKAM MARCEL JOEL,autre@example.com\nBAIMO DANIEL,daniel@example.com\n"
+                "KONAN AWA,awa@example.com\nBAIMO DANIEL,double@example.com\n")
+
+    report = import_employees_csv(io.StringIO(csv_text))
+
+    assert (report.lignes, report.crees, report.ignores) == (4, 2, 1)
+    assert [erreur.ligne for erreur in report.erreurs] == [5]
+    created = Employee.query.filter(Employee.nom_employe.in_(['BAIMO DANIEL', 'KONAN AWA'])).all()
+    assert sorted(e.matricule for e in created) == sorted(f"TEMP{e.id:04d}" for e in created)
+    assert Employee.query.filter_by(nom_employe='POKAM MARCEL JOEL').one().matricule == '1001'
+
+
+def test_csv_without_name_columns_is_rejected(app):
+    with pytest.raises(ValueError, match='matricule'):
+        import_employees_csv(io.StringIO("email\nx@example.com\n"))
@@ -0,0 +1,43 @@
+# tests/test_generated_filenames.py
+"""Noms des fiches générées : uniques dans un traitement même si deux noms d'employés s'assainissent pareil"""
+import os
+
+import pytest
+
+import app as payflow
+from benchmarks import payroll_pdf as payroll_pdf_module
+from models import FichierGenere
+
+# "DUPONT J." et "DUPONT J" donnent tous deux DUPONT J_2025_08.pdf une fois assainis
+COLLIDING_NAMES = ['DUPONT J.', 'DUPONT J', 'MARTIN PAUL', 'DUPONT J/']
+
+
+@pytest.fixture
+def colliding_pdf(payroll_pdf, monkeypatch):
+    monkeypatch.setattr(payroll_pdf_module, '_employee_name', lambda index: COLLIDING_NAMES[index])
+    return payroll_pdf(pages=4, pages_per_employee=(1, 1))
+
+
+def test_allocate_output_filename_adds_matricule_then_counter():
+    taken = set()
+    assert payflow.allocate_output_filename('DUPONT J.', '2001', '2025_08', taken) == 'DUPONT J_2025_08.pdf'
+    assert payflow.allocate_output_filename('DUPONT J', '2002', '2025_08', taken) == 'DUPONT J_2002_2025_08.pdf'
+    assert payflow.allocate_output_filename('DUPONT J/', None, '2025_08', taken) == 'DUPONT J_2_2025_08.pdf'
+    assert payflow.allocate_output_filename('DUPONT-J', None, '2025_08', taken) == 'DUPONT-J_2025_08.pdf'
+    assert len(taken) == 4
+
+
+@pytest.mark.parametrize('streaming_min_pages', [0, 1], ids=['standard', 'flux'])
+def test_colliding_names_each_get_their_own_file(app, colliding_pdf, process, add_employee, streaming_min_pages):
+    app.config['PROCESSING_STREAMING_MIN_PAGES'] = streaming_min_pages
+    path, employees = colliding_pdf
+    for employee in employees:
+        add_employee(employee.nom, employee.matricule)
+
+    traitement = process(path)
+
+    assert traitement.statut == 'termine'
+    files = FichierGenere.query.filter_by(traitement_id=traitement.id).all()
+    assert sorted(f.nom_employe_extrait for f in files) == sorted(COLLIDING_NAMES)
+    assert len({f.nom_fichier for f in files}) == len({f.chemin_fichier for f in files}) == len(COLLIDING_NAMES)
+    assert all(os.path.getsize(f.chemin_fichier) == f.taille_fichier for f in files)
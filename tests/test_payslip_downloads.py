@@ -0,0 +1,80 @@
+# tests/test_payslip_downloads.py
+"""Téléchargement des fiches : comptage uniquement des fichiers reçus en entier"""
+import os
+from datetime import datetime
+
+import pytest
+
+from models import db, DownloadLink
+
+
+@pytest.fixture
+def download_link(app, payroll_pdf, process, add_employee):
+    """Lien d'un employé dont le matricule a déjà été vérifié"""
+    path, employees = payroll_pdf(pages=2, pages_per_employee=(2, 2))
+    add_employee(employees[0].nom, employees[0].matricule)
+    traitement = process(path)
+    link = DownloadLink.query.filter_by(traitement_id=traitement.id).one()
+    link.date_premier_acces = datetime.utcnow()
+    db.session.commit()
+    return link
+
+
+def download_count(link):
+    db.session.expire_all()
+    return db.session.get(DownloadLink, link.id).nombre_telechargements
+
+
+def test_full_download_is_counted(client, download_link):
+    response = client.get(f'/download/file/{download_link.token}')
+
+    assert response.status_code == 200
+    assert len(response.get_data()) == os.path.getsize(download_link.chemin_fichier)
+    assert download_count(download_link) == 1
+
+
+@pytest.mark.parametrize('byte_range', ['bytes=-100', 'bytes=0-99', 'bytes=100-'])
+def test_partial_ranges_are_not_counted(client, download_link, byte_range):
+    response = client.get(f'/download/file/{download_link.token}', headers={'Range': byte_range})
+
+    assert response.status_code == 206
+    response.get_data()
+    assert download_count(download_link) == 0
+
+
+def test_range_covering_whole_file_is_counted(client, download_link):
+    response = client.get(f'/download/file/{download_link.token}', headers={'Range': 'bytes=0-'})
+
+    assert response.status_code == 206
+    response.get_data()
+    assert download_count(download_link) == 1
+
+
+def test_conditional_get_is_not_counted(client, download_link):
+    response = client.get(f'/download/file/{download_link.token}',
+                          headers={'If-None-Match': f'"{download_link.empreinte_sha256}"'})
+
+    assert response.status_code == 304
+    assert download_count(download_link) == 0
+
+
+@pytest.mark.parametrize('mode, header', [('x-accel-redirect', 'X-Accel-Redirect'), ('x-sendfile', 'X-Sendfile')])
+def test_offloaded_download_is_not_counted_at_request_time(app, client, download_link, mode, header):
+    app.config['FILE_SERVING_MODE'] = mode
+
+    response = client.get(f'/download/file/{download_link.token}')
+
+    assert response.status_code == 200 and header in response.headers
+    assert download_count(download_link) == 0
+
+
+def test_verification_reports_completed_downloads_only(client, download_link):
+    verify = lambda: client.post(f'/download/{download_link.token}/verify',
+                                 data={'matricule': download_link.matricule_requis}).json
+    assert verify()['download_count'] == 0
+
+    client.get(f'/download/file/{download_link.token}', headers={'Range': 'bytes=-100'}).get_data()
+    assert verify()['download_count'] == 0
+
+    client.get(f'/download/file/{download_link.token}').get_data()
+    assert verify()['download_count'] == 1
@@ -0,0 +1,20 @@
+# tests/test_pdf_extraction.py
+"""Extraction du texte : pool de processus lancé depuis un processus d'extraction dédié"""
+import pytest
+
+from pdf_extraction import extract_pages_text, extract_pages_text_range
+
+
+def test_parallel_extraction_matches_serial(payroll_pdf):
+    path, _ = payroll_pdf(pages=40)
+    progress = []
+
+    texts = extract_pages_text(path, 40, workers=2, min_pages=1, on_progress=progress.append)
+
+    assert texts == extract_pages_text_range(path, 0, 40)[1]
+    assert progress[-1] == 40 and progress == sorted(progress)
+
+
+def test_parallel_extraction_failure_is_raised(tmp_path):
+    with pytest.raises(RuntimeError, match='Extraction parallèle interrompue'):
+        extract_pages_text(str(tmp_path / 'absent.pdf'), 10, workers=2, min_pages=1)
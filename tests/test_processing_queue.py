@@ -0,0 +1,89 @@
+# tests/test_processing_queue.py
+"""File de traitement : mise en file à l'upload, réservation par un worker, progression"""
+import io
+import os
+from datetime import datetime, timedelta
+
+import app as payflow
+from models import db, Traitement, FichierGenere, DownloadLink, EmailOutbox
+
+
+def upload(client, path, **form):
+    with open(path, 'rb') as pdf:
+        data = dict(form, file=(io.BytesIO(pdf.read()), 'paie.pdf'))
+    return client.post('/upload', data=data, content_type='multipart/form-data',
+                       headers={'Accept': 'application/json'})
+
+
+def test_upload_queues_job_and_worker_completes_it(client, payroll_pdf, add_employee):
+    path, employees = payroll_pdf(pages=12)
+    for employee in employees:
+        add_employee(employee.nom, employee.matricule)
+
+    response = upload(client, path)
+    assert response.status_code == 202
+    timestamp = response.json['timestamp']
+    progress = client.get(response.json['progress_url']).json
+    assert progress['statut'] == 'en_attente' and progress['etape'] == 'en_file'
+
+    traitement_id = payflow.claim_next_job('tests')
+    assert traitement_id == Traitement.query.filter_by(timestamp_folder=timestamp).one().id
+    assert payflow.claim_next_job('tests') is None  # déjà réservé
+    payflow.run_processing_job(traitement_id, 'tests')
+
+    progress = client.get(f'/api/traitements/{timestamp}/progression').json
+    assert progress['statut'] == 'termine' and progress['termine']
+    assert progress['pages_analysees'] == progress['pages_total'] == 12
+    assert progress['employes_detectes'] == progress['pdfs_generes'] == len(employees)
+    assert FichierGenere.query.count() == len(employees)
+    assert DownloadLink.query.count() == EmailOutbox.query.count() == len(employees)
+
+
+def test_progress_of_unknown_treatment_is_404(client):
+    response = client.get('/api/traitements/inconnu/progression')
+    assert response.status_code == 404 and response.json['success'] is False
+
+
+def start_job_then_lose_worker(client, path, heartbeat_age):
+    """Upload réservé par un worker dont le dernier signe de vie date de heartbeat_age"""
+    timestamp = upload(client, path).json['timestamp']
+    traitement = Traitement.query.filter_by(timestamp_folder=timestamp).one()
+    assert payflow.claim_next_job('worker-perdu', traitement_id=traitement.id) == traitement.id
+    traitement.date_heartbeat = traitement.date_maj = datetime.utcnow() - heartbeat_age
+    db.session.commit()
+    return traitement
+
+
+def test_duplicate_of_live_job_follows_it(app, client, payroll_pdf):
+    path, _ = payroll_pdf(pages=4)
+    traitement = start_job_then_lose_worker(client, path, timedelta(seconds=1))
+
+    response = upload(client, path)
+
+    assert response.json['doublon'] and response.json['timestamp'] == traitement.timestamp_folder
+    db.session.expire_all()
+    assert traitement.statut == 'en_cours' and traitement.traite_par == 'worker-perdu'
+
+
+def test_duplicate_of_stale_job_requeues_it(app, client, payroll_pdf):
+    path, _ = payroll_pdf(pages=4)
+    traitement = start_job_then_lose_worker(
+        client, path, timedelta(seconds=app.config['PROCESSING_STALE_AFTER_SEC'] + 60))
+
+    response = upload(client, path)
+
+    assert response.json['doublon'] and response.json['timestamp'] == traitement.timestamp_folder
+    db.session.expire_all()
+    assert traitement.statut == 'en_attente'
+    assert payflow.claim_next_job('tests') == traitement.id
+
+
+def test_duplicate_of_stale_job_without_source_pdf_is_ignored(app, client, payroll_pdf):
+    path, _ = payroll_pdf(pages=4)
+    traitement = start_job_then_lose_worker(
+        client, path, timedelta(seconds=app.config['PROCESSING_STALE_AFTER_SEC'] + 60))
+    os.remove(traitement.chemin_fichier)
+
+    response = upload(client, path)
+
+    assert response.status_code == 202 and response.json['timestamp'] != traitement.timestamp_folder
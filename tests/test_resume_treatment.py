@@ -0,0 +1,55 @@
+# tests/test_resume_treatment.py
+"""Reprise en ligne de commande : limite MAX_CONCURRENT_JOBS respectée"""
+import pytest
+
+import app as payflow
+import resume_treatment
+from models import db, Traitement
+
+
+@pytest.fixture
+def failed_treatment(app, payroll_pdf, add_employee, monkeypatch):
+    path, employees = payroll_pdf(pages=4)
+    for employee in employees:
+        add_employee(employee.nom, employee.matricule)
+    traitement = payflow.enqueue_processing_job(path, payflow.reserve_timestamp_folder())
+    traitement_id = payflow.claim_next_job('tests', traitement_id=traitement.id)
+    with monkeypatch.context() as patch:
+        patch.setattr(payflow, 'finalize_processing', lambda *args: 1 / 0)
+        payflow.run_processing_job(traitement_id, 'tests')
+    db.session.expire_all()
+    traitement = db.session.get(Traitement, traitement_id)
+    assert traitement.statut == 'echec'
+    return traitement
+
+
+def test_resume_without_free_slot_leaves_treatment_queued(failed_treatment, monkeypatch):
+    monkeypatch.setattr(payflow.job_slots, 'try_acquire', lambda engine: None)
+    monkeypatch.setattr(payflow, 'run_processing_job', lambda *args: pytest.fail("exécuté sans créneau"))
+
+    assert resume_treatment.resume(failed_treatment.timestamp_folder)
+
+    db.session.expire_all()
+    assert failed_treatment.statut == 'en_attente'
+
+
+def test_resume_runs_inside_a_slot_and_releases_it(failed_treatment, monkeypatch):
+    slots = []
+    acquire = payflow.job_slots.try_acquire
+
+    def tracked_acquire(engine):
+        slot = acquire(engine)
+        slots.append(slot)
+        return slot
+    monkeypatch.setattr(payflow.job_slots, 'try_acquire', tracked_acquire)
+
+    assert resume_treatment.resume(failed_treatment.timestamp_folder)
+
+    db.session.expire_all()
+    assert failed_treatment.statut == 'termine'
+    assert len(slots) == 1 and slots[0] is not None
+    # Créneau rendu : tous de nouveau disponibles
+    held = [payflow.job_slots.try_acquire(db.engine) for _ in range(payflow.app.config['MAX_CONCURRENT_JOBS'])]
+    assert all(held)
+    for slot in held:
+        slot.release()
@@ -0,0 +1,81 @@
+# tests/test_smtp_pool.py
+"""Pool SMTP : un refus du serveur garde la session, une coupure la remplace"""
+import smtplib
+
+import pytest
+
+import smtp_pool
+from smtp_pool import SMTPConnectionPool
+
+
+class StubSMTP:
+    """smtplib.SMTP factice : chaque sendmail consomme la prochaine réponse prévue (None = accepté)"""
+
+    responses = []
+    sessions = []
+
+    def __init__(self, host, port, timeout=None):
+        self.closed = False
+        StubSMTP.sessions.append(self)
+
+    def sendmail(self, from_addr, to_addrs, message):
+        assert not self.closed
+        response = StubSMTP.responses.pop(0) if StubSMTP.responses else None
+        if response is not None:
+            raise response
+
+    def quit(self):
+        self.closed = True
+
+    close = quit
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    StubSMTP.responses = []
+    StubSMTP.sessions = []
+    monkeypatch.setattr(smtp_pool.smtplib, 'SMTP', StubSMTP)
+    with SMTPConnectionPool('smtp.exemple.com', 25, use_tls=False, size=1) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize('refusal', [
+    smtplib.SMTPRecipientsRefused({'x@exemple.com': (550, b'Mailbox unavailable')}),
+    smtplib.SMTPSenderRefused(553, b'Sender rejected', 'rh@exemple.com'),
+    smtplib.SMTPDataError(554, b'Message rejected'),
+])
+def test_refusal_keeps_session_and_is_not_retried(pool, refusal):
+    StubSMTP.responses = [refusal]
+
+    with pytest.raises(type(refusal)):
+        pool.send('rh@exemple.com', ['x@exemple.com'], 'message')
+    pool.send('rh@exemple.com', ['y@exemple.com'], 'message')
+
+    metrics = pool.metrics
+    assert len(StubSMTP.sessions) == 1 and not StubSMTP.sessions[0].closed
+    assert metrics['connections_opened'] == 1
+    assert metrics['reconnects'] == 0
+    assert metrics['failures'] == 1 and metrics['messages_sent'] == 1
+
+
+@pytest.mark.parametrize('disconnect', [
+    smtplib.SMTPServerDisconnected('Connection unexpectedly closed'),
+    ConnectionResetError(104, 'Connection reset by peer'),
+    smtplib.SMTPSenderRefused(421, b'Service not available, closing channel', 'rh@exemple.com'),
+])
+def test_disconnect_reconnects_and_retries_once(pool, disconnect):
+    StubSMTP.responses = [disconnect]
+
+    pool.send('rh@exemple.com', ['x@exemple.com'], 'message')
+
+    metrics = pool.metrics
+    assert len(StubSMTP.sessions) == 2 and StubSMTP.sessions[0].closed
+    assert metrics['reconnects'] == 1 and metrics['messages_sent'] == 1 and metrics['failures'] == 0
+
+
+def test_second_disconnect_is_raised(pool):
+    StubSMTP.responses = [smtplib.SMTPServerDisconnected('coupure'), smtplib.SMTPServerDisconnected('coupure')]
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        pool.send('rh@exemple.com', ['x@exemple.com'], 'message')
+    assert pool.metrics['failures'] == 1
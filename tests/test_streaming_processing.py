@@ -0,0 +1,153 @@
+# tests/test_streaming_processing.py
+"""Mode flux : employés dont les pages reviennent plus loin dans le fichier, échecs d'écriture, reprises"""
+import hashlib
+import io
+import json
+import os
+
+import pytest
+from PyPDF2 import PdfReader
+
+import app as payflow
+from benchmarks import payroll_pdf as payroll_pdf_module
+from models import db, FichierGenere, DownloadLink, EmailOutbox
+
+
+@pytest.fixture
+def streaming(app):
+    app.config['PROCESSING_STREAMING_MIN_PAGES'] = 1
+    return app
+
+
+@pytest.fixture
+def interleaved_pdf(payroll_pdf, add_employee, monkeypatch):
+    """PDF d'une page par bloc dont les noms suivent `names` (un nom peut revenir) ; employés ajoutés à l'annuaire"""
+    def write(names):
+        monkeypatch.setattr(payroll_pdf_module, '_employee_name', lambda index: names[index])
+        path, blocks = payroll_pdf(pages=len(names), pages_per_employee=(1, 1))
+        first_blocks = {}
+        for block in blocks:
+            first_blocks.setdefault(block.nom, block)
+        for block in first_blocks.values():
+            add_employee(block.nom, block.matricule)
+        return path
+    return write
+
+
+def test_failed_append_to_pending_file_marks_employee_failed(streaming, interleaved_pdf, process, monkeypatch):
+    path = interleaved_pdf(['ALPHA ONE', 'BRAVO TWO', 'ALPHA ONE', 'CHARLIE THREE', 'ALPHA ONE'])
+    monkeypatch.setattr(payflow, 'append_to_individual_pdf', lambda *args, **kwargs: None)
+
+    traitement = process(path)
+
+    assert traitement.statut == 'partiel'
+    assert traitement.nombre_employes_detectes == 3 and traitement.nombre_employes_traites == 2
+    assert {f.nom_employe_extrait for f in FichierGenere.query} == {'BRAVO TWO', 'CHARLIE THREE'}
+    assert DownloadLink.query.count() == EmailOutbox.query.count() == 2
+    output_dir = os.path.dirname(FichierGenere.query.first().chemin_fichier)
+    assert not any(name.startswith('ALPHA ONE') for name in os.listdir(output_dir))
+    assert json.loads(traitement.plan_decoupage)[payflow.STREAMING_PLAN_KEY]['echecs'] == ['ALPHA ONE']
+
+
+class Crash(BaseException):
+    """Arrêt brutal du worker : non intercepté par process_pdf, le traitement reste en_cours"""
+
+
+def crash_once(function):
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        if not calls:
+            calls.append(args)
+            raise Crash()
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def resume(traitement):
+    """Remet en file un traitement interrompu et l'exécute comme un worker"""
+    assert payflow.requeue_treatment_for_resume(traitement)
+    traitement_id = payflow.claim_next_job('tests', traitement_id=traitement.id)
+    payflow.run_processing_job(traitement_id, 'tests')
+    db.session.expire_all()
+    return db.session.get(payflow.Traitement, traitement_id)
+
+
+def start_and_crash(path):
+    traitement = payflow.enqueue_processing_job(path, payflow.reserve_timestamp_folder())
+    traitement_id = payflow.claim_next_job('tests', traitement_id=traitement.id)
+    with pytest.raises(Crash):
+        payflow.run_processing_job(traitement_id, 'tests')
+    db.session.rollback()
+    traitement = db.session.get(payflow.Traitement, traitement_id)
+    assert traitement.statut == 'en_cours'
+    return traitement
+
+
+def assert_payslip(name, page_count):
+    generated_file = FichierGenere.query.filter_by(nom_employe_extrait=name).one()
+    with open(generated_file.chemin_fichier, 'rb') as pdf:
+        data = pdf.read()
+    assert len(PdfReader(io.BytesIO(data)).pages) == page_count
+    assert generated_file.taille_fichier == len(data)
+    assert generated_file.empreinte_sha256 == hashlib.sha256(data).hexdigest()
+    assert not [f for f in os.listdir(os.path.dirname(generated_file.chemin_fichier)) if f.endswith('.tmp')]
+
+
+@pytest.fixture
+def resumable(streaming):
+    streaming.config['PERSISTENCE_BATCH_SIZE'] = 1  # chaque employé enregistré dès son premier bloc
+    streaming.config['PROCESSING_STALE_AFTER_SEC'] = 0
+    return streaming
+
+
+@pytest.mark.parametrize('crash_point', ['before_commit', 'before_replace'])
+def test_resume_after_crash_while_completing_persisted_file(resumable, interleaved_pdf, monkeypatch, crash_point):
+    path = interleaved_pdf(['ALPHA ONE', 'BRAVO TWO', 'ALPHA ONE', 'CHARLIE THREE'])
+    if crash_point == 'before_commit':
+        monkeypatch.setattr(payflow, 'update_generated_file', crash_once(payflow.update_generated_file))
+    else:
+        monkeypatch.setattr(payflow.os, 'replace', crash_once(os.replace))
+
+    traitement = start_and_crash(path)
+    traitement = resume(traitement)
+
+    assert traitement.statut == 'termine'
+    assert traitement.nombre_employes_detectes == traitement.nombre_employes_traites == 3
+    assert_payslip('ALPHA ONE', 2)
+    assert_payslip('BRAVO TWO', 1)
+    assert DownloadLink.query.count() == EmailOutbox.query.count() == 3
+
+
+def test_resume_after_crash_between_batches(resumable, interleaved_pdf, monkeypatch):
+    path = interleaved_pdf(['ALPHA ONE', 'BRAVO TWO', 'CHARLIE THREE', 'ALPHA ONE', 'DELTA FOUR'])
+    calls = []
+    original = payflow.checkpoint_treatment_results
+
+    def crash_on_third_batch(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 3:
+            raise Crash()
+        return original(*args, **kwargs)
+    monkeypatch.setattr(payflow, 'checkpoint_treatment_results', crash_on_third_batch)
+
+    traitement = start_and_crash(path)
+    assert FichierGenere.query.count() == 2
+    traitement = resume(traitement)
+
+    assert traitement.statut == 'termine' and traitement.nombre_employes_traites == 4
+    assert_payslip('ALPHA ONE', 2)
+    assert_payslip('CHARLIE THREE', 1)
+    assert DownloadLink.query.count() == EmailOutbox.query.count() == 4
+
+
+def test_failed_append_to_persisted_file_fails_treatment(resumable, interleaved_pdf, process, monkeypatch):
+    path = interleaved_pdf(['ALPHA ONE', 'BRAVO TWO', 'ALPHA ONE'])
+    monkeypatch.setattr(payflow, 'append_to_individual_pdf', lambda *args, **kwargs: None)
+
+    traitement = process(path)
+
+    # Fiche déjà envoyée : pas de perte silencieuse, le traitement reprendra à ce bloc
+    assert traitement.statut == 'echec'
+    assert json.loads(traitement.plan_decoupage)[payflow.STREAMING_PLAN_KEY]['page_reprise'] == 2
+    assert_payslip('ALPHA ONE', 1)
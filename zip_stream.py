@@ -0,0 +1,77 @@
+# zip_stream.py
+"""Archive ZIP produite au fil de l'eau, sans jamais tenir l'archive en mémoire.
+
+zipfile écrit dans un tampon non positionnable (pas de seek) : il passe alors en
+mode « data descriptor » et chaque morceau écrit peut être envoyé au client
+immédiatement. La mémoire utilisée reste de l'ordre de chunk_size, quelle que
+soit la taille de l'archive.
+"""
+import zipfile
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+COMPRESSION_MODES = {
+    'stored': zipfile.ZIP_STORED,      # PDF déjà compressés : aucun CPU dépensé
+    'deflated': zipfile.ZIP_DEFLATED,
+}
+
+
+class _ChunkSink:
+    """Tampon en écriture seule : accumule les octets écrits par zipfile jusqu'au prochain drain()"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files, compression='stored', chunk_size=DEFAULT_CHUNK_SIZE, on_missing=None):
+    """Générateur des octets d'une archive ZIP.
+
+    files : itérable de (chemin sur disque, nom dans l'archive)
+    compression : 'stored' (défaut) ou 'deflated'
+    Un fichier illisible au moment de l'ajouter (supprimé entre-temps) est omis
+    et signalé à on_missing(chemin, erreur) : l'archive déjà commencée reste valide.
+    """
+    compress_type = COMPRESSION_MODES.get(compression, zipfile.ZIP_STORED)
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, 'w', compression=compress_type) as zip_file:
+        for file_path, arcname in files:
+            # Avant toute écriture de l'entrée : l'omettre ne laisse rien d'incomplet
+            try:
+                zip_info = zipfile.ZipInfo.from_file(file_path, arcname)
+                source = open(file_path, 'rb')
+            except OSError as e:
+                if on_missing:
+                    on_missing(file_path, e)
+                continue
+            zip_info.compress_type = compress_type
+            with source, zip_file.open(zip_info, 'w') as dest:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            # En-tête local / data descriptor de fin d'entrée
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Répertoire central, écrit à la fermeture de l'archive
+    data = sink.drain()
+    if data:
+        yield data